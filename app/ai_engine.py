@@ -1,4 +1,3 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from app.models import AIAnalysisResult
@@ -8,17 +7,19 @@ from pydantic import BaseModel, Field
 from typing import List, Literal
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableParallel
-from app.vector_store import get_retriever    
+from app.vector_store import get_retriever, search_notes
+from app.llm_registry import get_llm
+from app.cache import PromptCache
+from app.config import AI_CACHE_TTL_SECONDS, AI_CACHE_MAX_ENTRIES, AI_CACHE_MONGO, PRIORITY_LOCAL_TIER
+from app.priority_classifier import classify_locally
+from app import metrics
+from app.database import ai_cache_collection
 
 load_dotenv()
 
 # --- 1. SETUP THE MODEL ---
-# FIXED: Changed 'gemini-2.5-flash' (doesn't exist) to 'gemini-1.5-flash'
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    temperature=0.7,
-    google_api_key=os.getenv("GOOGLE_API_KEY")
-)
+# Shared client from the registry (same connection pool as the chat graph)
+llm = get_llm(temperature=0.7)
 
 # --- 2. THE STANDARD NOTE ANALYZER (Was missing in your file) ---
 
@@ -62,15 +63,36 @@ prompt = ChatPromptTemplate.from_messages([
 # Create the chain for standard notes
 chain = prompt | llm | parser
 
-async def analyze_text(text: str) -> AIAnalysisResult:
+# Content-addressed cache: the key includes a hash of the prompt + model, so
+# editing system_prompt invalidates old results automatically.
+analysis_cache = PromptCache(
+    "analyze_text",
+    prompt_text=system_prompt + parser.get_format_instructions() + llm.model,
+    maxsize=AI_CACHE_MAX_ENTRIES,
+    ttl=AI_CACHE_TTL_SECONDS,
+    collection=ai_cache_collection if AI_CACHE_MONGO else None
+)
+
+async def analyze_text(text: str, raise_errors: bool = False) -> AIAnalysisResult:
+    # raise_errors=True lets the background ingest pipeline retry instead of
+    # silently storing the fallback below.
+    cached = await analysis_cache.get(text)
+    if cached is not None:
+        # Fresh object every time: callers mutate it (manual override)
+        return AIAnalysisResult(**cached)
+
     try:
         result = await chain.ainvoke({
             "user_text": text,
             "format_instructions": parser.get_format_instructions()
         })
+        # Only successful analyses are cached (never the fallback below)
+        await analysis_cache.set(text, result.model_dump())
         return result
     except Exception as e:
         print(f"❌ AI ANALYSIS ERROR: {e}")
+        if raise_errors:
+            raise
         # Fallback if AI fails
         return AIAnalysisResult(
             stream_type="Activity",
@@ -152,7 +174,30 @@ priority_prompt = ChatPromptTemplate.from_messages([
 
 priority_chain = priority_prompt | llm | priority_parser
 
+priority_cache = PromptCache(
+    "detect_priority",
+    prompt_text=priority_system_prompt + llm.model,
+    maxsize=AI_CACHE_MAX_ENTRIES,
+    ttl=AI_CACHE_TTL_SECONDS,
+    collection=ai_cache_collection if AI_CACHE_MONGO else None
+)
+
 async def detect_priority(text: str) -> str:
+    # 1. Local tier: keyword rules / trained model answer in microseconds
+    if PRIORITY_LOCAL_TIER:
+        label, confidence, source = classify_locally(text)
+        if label:
+            metrics.incr(f"priority.local_{source}")
+            print(f"⚡ Priority ({source}, {confidence:.2f}): '{text}' -> {label}")
+            return label
+
+    # 2. Cached LLM answer
+    cached = await priority_cache.get(text)
+    if cached is not None:
+        return cached
+
+    # 3. Fall back to Gemini
+    metrics.incr("priority.llm")
     try:
         # Get response
         raw_result = await priority_chain.ainvoke({"text": text})
@@ -167,6 +212,7 @@ async def detect_priority(text: str) -> str:
         
         if cleaned_result in valid_options:
             print(f"✅ Priority Detected: '{text}' -> {cleaned_result}")
+            await priority_cache.set(text, cleaned_result)
             return cleaned_result
         else:
             print(f"⚠️ AI returned weird format: '{raw_result}'. Defaulting to Medium.")
@@ -273,12 +319,9 @@ def get_chat_chain(user_id: str):
 # WRAPPER FUNCTION (Called by main.py)
 async def chat_with_langchain(question: str, user_id: str, user_profile: str):
     try:
-        # 1. Get the retriever for this specific user
-        retriever = get_retriever(user_id)
-        
-        # 2. Retrieve documents manually (for full control)
+        # 1. Retrieve documents manually for this specific user (for full control)
         # (We do this manually so we can verify what it found in the logs)
-        docs = retriever.invoke(question)
+        docs = await search_notes(user_id, question)
         context_text = "\n\n".join(f"- [{d.metadata['date']}] {d.page_content}" for d in docs)
         
         # 3. Run the Chain
@@ -1,11 +1,19 @@
+import time
 from typing import TypedDict
 from datetime import datetime
 from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
+from app.llm_registry import get_llm
 from langchain_core.messages import HumanMessage, SystemMessage
-from app.vector_store import get_retriever
+from langchain_core.runnables import RunnableConfig
+from langchain_core.callbacks.manager import adispatch_custom_event
+from app.vector_store import search_notes
+from app.search import hybrid_documents
 from app.tools import create_event_tool 
 from app.database import events_collection 
+from app.event_times import event_window, window_fields
+from app.intent import classify_intent
+from app.config import INTENT_LLM_FALLBACK, RETRIEVAL_MODE
+from app import metrics
 
 # 1. DEFINE THE STATE
 class ShadowState(TypedDict):
@@ -16,35 +24,71 @@ class ShadowState(TypedDict):
     answer: str
     image: str | None
     chat_history: str
+    intent: str
+    started_at: float
+    memory_version: int
+    tool_called: bool
+    persona: str
 
 # 2. DEFINE THE NODES
 
-def retrieve_node(state: ShadowState):
+async def route_node(state: ShadowState):
     """
-    Worker 1: Fetches relevant documents from Pinecone.
+    Worker 0: Classifies intent so scheduling / small-talk turns skip retrieval.
+    """
+    started_at = time.perf_counter()
+    intent, source = await classify_intent(state["question"], use_llm=INTENT_LLM_FALLBACK)
+    print(f"--- GRAPH: ROUTED -> {intent} ({source}) ---")
+
+    metrics.incr(f"chat.route.{intent}")
+    metrics.incr(f"chat.route_source.{source}")
+    metrics.observe("chat.route_decision_seconds", time.perf_counter() - started_at)
+    return {"intent": intent, "started_at": started_at}
+
+def pick_route(state: ShadowState) -> str:
+    return "retrieve" if state["intent"] == "memory" else "generate"
+
+async def retrieve_node(state: ShadowState):
+    """
+    Worker 1: Fetches relevant documents (vector store, or hybrid keyword + vector).
     """
     print("--- GRAPH: RETRIEVING MEMORIES ---")
     question = state["question"]
     user_id = state["user_id"]
     
-    retriever = get_retriever(user_id)
-    docs = retriever.invoke(question)
+    search = hybrid_documents if RETRIEVAL_MODE == "hybrid" else search_notes
+    docs = await search(
+        user_id, question,
+        memory_version=state.get("memory_version"),
+        persona=state.get("persona")
+    )
     
-    context_text = "\n\n".join(f"- [{d.metadata['date']}] {d.page_content}" for d in docs)
+    context_text = "\n\n".join(
+        f"- [{d.metadata['date']}] {d.page_content}"
+        + (f" (logged {d.metadata['recurring']} times)" if d.metadata.get("recurring") else "")
+        for d in docs
+    )
     
     return {"context": context_text}
 
-async def generate_node(state: ShadowState):
+async def generate_node(state: ShadowState, config: RunnableConfig):
     """
     Worker 2: Generates Answer OR Creates Event (Handles Text + Vision + Tools)
     """
     print("--- GRAPH: GENERATING ---")
-    
-    # Use 1.5-flash (Standard)
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3)
-    
-    # A. BIND TOOLS (This is the missing link!)
-    llm_with_tools = llm.bind_tools([create_event_tool])
+    try:
+        return await _generate(state, config)
+    finally:
+        # End-to-end latency per route (route decision -> answer)
+        if state.get("started_at"):
+            metrics.observe(
+                f"chat.route.{state.get('intent', 'memory')}.seconds",
+                time.perf_counter() - state["started_at"]
+            )
+
+async def _generate(state: ShadowState, config: RunnableConfig):    
+    # A. TOOL-BOUND MODEL (built once by the registry, reused every turn)
+    llm_with_tools = get_llm(temperature=0.3, tools=[create_event_tool])
     
     # B. Current Date Injection (Crucial for "next Friday")
     current_time = datetime.now().strftime("%A, %Y-%m-%d")
@@ -108,11 +152,28 @@ async def generate_node(state: ShadowState):
                 "time": args["time"],
                 "type": args.get("type", "Personal"),
                 "user_id": state["user_id"],
-                "created_at": datetime.utcnow()
+                "created_at": datetime.utcnow(),
+                **window_fields(event_window(args["date"], args["time"]))
             }
-            await events_collection.insert_one(new_event)
+            result = await events_collection.insert_one(new_event)
+
+            # Structured event for streaming clients (/chat/stream)
+            await adispatch_custom_event(
+                "event_created",
+                {
+                    "_id": str(result.inserted_id),
+                    "title": new_event["title"],
+                    "date": new_event["date"],
+                    "time": new_event["time"],
+                    "type": new_event["type"],
+                },
+                config=config
+            )
             
-            return {"answer": f"✅ I've scheduled '{args['title']}' for {args['date']} at {args['time']}."}
+            return {
+                "answer": f"✅ I've scheduled '{args['title']}' for {args['date']} at {args['time']}.",
+                "tool_called": True
+            }
         # --- THE FIX STARTS HERE ---
     # G. Clean the Response (Handle List vs String)
     final_content = response.content
@@ -136,10 +197,13 @@ async def generate_node(state: ShadowState):
 def build_shadow_graph():
     workflow = StateGraph(ShadowState)
     
+    workflow.add_node("route", route_node)
     workflow.add_node("retrieve", retrieve_node)
     workflow.add_node("generate", generate_node)
     
-    workflow.set_entry_point("retrieve")
+    workflow.set_entry_point("route")
+    # Only "memory" questions pay for an embedding + vector search
+    workflow.add_conditional_edges("route", pick_route, {"retrieve": "retrieve", "generate": "generate"})
     workflow.add_edge("retrieve", "generate")
     workflow.add_edge("generate", END)
     
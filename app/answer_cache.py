@@ -0,0 +1,109 @@
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from app import metrics
+from app.config import (
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_PER_USER,
+)
+
+# --- SEMANTIC ANSWER CACHE (in front of shadow_graph) ---
+# If a user asks (nearly) the same memory question again and no memory was
+# written or deleted since, reuse the previous answer instead of running
+# retrieve + generate. Entries are scoped per user and per `scope` (persona
+# profile + today's date, both part of the prompt), and are only valid for
+# the memory_version they were produced under.
+
+SIMILARITY_BUCKETS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0]
+
+def _scope_key(scope: str) -> str:
+    return hashlib.sha1(scope.encode("utf-8")).hexdigest()[:12]
+
+def _normalize(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+class SemanticAnswerCache:
+    def __init__(self, threshold: float, ttl: float, max_per_user: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self._entries: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, user_id: str, vector, memory_version: int, scope: str) -> Tuple[Optional[str], float]:
+        """
+        Returns (answer or None, best cosine similarity seen).
+        """
+        scope = _scope_key(scope)
+        now = time.monotonic()
+        with self._lock:
+            entries = [
+                e for e in self._entries.get(user_id, ())
+                if e["memory_version"] == memory_version and e["scope"] == scope
+                and now - e["created"] < self.ttl
+            ]
+        if not entries:
+            metrics.incr("answer_cache.misses")
+            return None, 0.0
+
+        # One matrix-vector product over this user's cached questions
+        matrix = np.stack([e["vector"] for e in entries])
+        sims = matrix @ _normalize(vector)
+        best = int(sims.argmax())
+        best_sim = float(sims[best])
+        metrics.observe("answer_cache.best_similarity", best_sim, buckets=SIMILARITY_BUCKETS)
+
+        if best_sim >= self.threshold:
+            metrics.incr("answer_cache.hits")
+            return entries[best]["answer"], best_sim
+        metrics.incr("answer_cache.misses")
+        return None, best_sim
+
+    def store(self, user_id: str, vector, memory_version: int, scope: str, answer: str):
+        with self._lock:
+            entries = self._entries.get(user_id)
+            if entries is None:
+                entries = self._entries[user_id] = deque(maxlen=self.max_per_user)
+            # Older memory versions can never hit again
+            stale = [e for e in entries if e["memory_version"] != memory_version]
+            for e in stale:
+                entries.remove(e)
+            entries.append({
+                "vector": _normalize(vector),
+                "memory_version": memory_version,
+                "scope": _scope_key(scope),
+                "answer": answer,
+                "created": time.monotonic(),
+            })
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        hits = metrics.get_counter("answer_cache.hits")
+        misses = metrics.get_counter("answer_cache.misses")
+        with self._lock:
+            users = len(self._entries)
+            size = sum(len(e) for e in self._entries.values())
+        return {
+            "threshold": self.threshold,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "users": users,
+            "entries": size,
+        }
+
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    ttl=ANSWER_CACHE_TTL_SECONDS,
+    max_per_user=ANSWER_CACHE_MAX_PER_USER
+)
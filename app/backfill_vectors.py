@@ -0,0 +1,186 @@
+"""
+Re-embeds historic memories (IDEA, or RANT with impact > 6) from
+notes_collection into the vector backend.
+
+Use it after changing EMBEDDING_MODEL / VECTOR_BACKEND, or to repair vectors
+whose writes failed. Notes are streamed in _id order with a cursor, embedded
+in batches under a rate limit, and upserted (idempotent: the note id is the
+vector id). The last processed _id is checkpointed in MongoDB after every
+batch, so an interrupted run resumes where it stopped.
+
+Usage:
+    python -m app.backfill_vectors [--batch-size 64] [--rate 20] [--user-id ID]
+    python -m app.backfill_vectors --dry-run
+    python -m app.backfill_vectors --status
+    python -m app.backfill_vectors --restart
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from app.config import EMBEDDING_MODEL, VECTOR_BACKEND
+from app.database import notes_collection, migrations_collection
+from app.ingest import should_embed, embed_filter
+from app.vector_store import (
+    embeddings,
+    backend,
+    note_metadata,
+    run_in_vector_pool,
+    bump_memory_version,
+    close_vector_pool,
+)
+
+def checkpoint_id(user_id=None) -> str:
+    # One checkpoint per (backend, model): switching either starts a fresh pass
+    scope = f":{user_id}" if user_id else ""
+    return f"vector-backfill:{VECTOR_BACKEND}:{EMBEDDING_MODEL}{scope}"
+
+async def load_checkpoint(user_id=None) -> dict:
+    doc = await migrations_collection.find_one({"_id": checkpoint_id(user_id)})
+    return doc or {
+        "_id": checkpoint_id(user_id),
+        "last_id": None,
+        "scanned": 0,
+        "embedded": 0,
+        "failed_batches": 0,
+        "done": False,
+        "started_at": datetime.now(timezone.utc),
+    }
+
+async def save_checkpoint(checkpoint: dict):
+    checkpoint["updated_at"] = datetime.now(timezone.utc)
+    await migrations_collection.replace_one({"_id": checkpoint["_id"]}, checkpoint, upsert=True)
+
+class RateLimiter:
+    """
+    Spaces calls so that on average no more than `per_second` items go out.
+    """
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self.next_at = time.monotonic()
+
+    async def wait(self, items: int):
+        now = time.monotonic()
+        if self.next_at > now:
+            await asyncio.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + items * self.interval
+
+async def embed_batch(notes, max_attempts: int = 4):
+    """
+    One embedding call for the whole batch, then one upsert per user.
+    Retries with exponential backoff (quota errors are the usual failure).
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            vectors = await run_in_vector_pool(embeddings.embed_documents, [n["raw_text"] for n in notes])
+            by_user = defaultdict(list)
+            for note, vector in zip(notes, vectors):
+                by_user[note["user_id"]].append((note, vector))
+            for user_id, rows in by_user.items():
+                await run_in_vector_pool(
+                    backend.upsert,
+                    user_id,
+                    [str(note["_id"]) for note, _ in rows],
+                    [vector for _, vector in rows],
+                    [note_metadata(
+                        user_id, note["created_at"].strftime("%Y-%m-%d"), note["raw_text"],
+                        note["ai_metadata"].get("impact_score"),
+                        (note.get("recurrence") or {}).get("count") or 0 # keep "logged N times"
+                    ) for note, _ in rows]
+                )
+                await bump_memory_version(user_id)
+            return
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            delay = 2 ** attempt
+            print(f"🔁 BACKFILL: batch failed ({e}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+async def backfill(args):
+    if args.restart:
+        await migrations_collection.delete_one({"_id": checkpoint_id(args.user_id)})
+    checkpoint = await load_checkpoint(args.user_id)
+    if args.status:
+        print({key: value for key, value in checkpoint.items() if key != "_id"})
+        return
+
+    query = embed_filter()
+    if args.user_id:
+        query["user_id"] = args.user_id
+    if checkpoint["last_id"] is not None:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+    total = await notes_collection.count_documents(query)
+    print(f"🧠 BACKFILL: {total} notes to (re-)embed with {EMBEDDING_MODEL} -> {VECTOR_BACKEND}"
+          f"{' (dry run)' if args.dry_run else ''}")
+
+    cursor = notes_collection.find(
+        query, {"raw_text": 1, "user_id": 1, "created_at": 1, "ai_metadata": 1, "recurrence.count": 1}
+    ).sort("_id", 1).batch_size(args.batch_size)
+
+    limiter = RateLimiter(args.rate)
+    started, processed = time.monotonic(), 0
+    batch = []
+
+    async def flush():
+        nonlocal processed
+        notes = [
+            n for n in batch
+            # Historic IDEAs may have no impact_score (IDEAs embed regardless)
+            if should_embed(n["ai_metadata"].get("stream_type"), n["ai_metadata"].get("impact_score", 0))
+            and n.get("created_at")
+        ]
+        if notes and not args.dry_run:
+            await limiter.wait(len(notes))
+            try:
+                await embed_batch(notes)
+            except Exception as e:
+                # Don't advance past a batch we couldn't write: stop and resume later
+                checkpoint["failed_batches"] += 1
+                await save_checkpoint(checkpoint)
+                raise RuntimeError(f"Batch after {checkpoint['last_id']} failed: {e}") from e
+        checkpoint["last_id"] = batch[-1]["_id"]
+        checkpoint["scanned"] += len(batch)
+        checkpoint["embedded"] += len(notes)
+        processed += len(batch)
+        if not args.dry_run:
+            await save_checkpoint(checkpoint)
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        print(f"   {processed:>7}/{total:<7} scanned  {checkpoint['embedded']:>7} embedded  "
+              f"{processed / elapsed:7.1f} notes/s")
+        batch.clear()
+
+    async for note in cursor:
+        batch.append(note)
+        if len(batch) >= args.batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    if not args.dry_run:
+        checkpoint["done"] = True
+        await save_checkpoint(checkpoint)
+    elapsed = time.monotonic() - started
+    print(f"✅ BACKFILL: {processed} notes in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.1f} notes/s), {checkpoint['embedded']} embedded in total")
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.backfill_vectors", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=64, help="Notes per embedding call")
+    parser.add_argument("--rate", type=float, default=20.0, help="Max notes embedded per second (0 = unlimited)")
+    parser.add_argument("--user-id", help="Only backfill this user's notes")
+    parser.add_argument("--dry-run", action="store_true", help="Scan and count only; write nothing")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and start over")
+    parser.add_argument("--status", action="store_true", help="Print the checkpoint and exit")
+    args = parser.parse_args()
+    try:
+        asyncio.run(backfill(args))
+    finally:
+        close_vector_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,750 @@
+"""
+Performance benchmarks for Shadow's hot paths.
+
+Usage:
+    python -m app.benchmarks <name> [options]
+    python -m app.benchmarks --help
+"""
+import argparse
+import asyncio
+import functools
+import statistics
+import time
+
+BENCHMARKS = {}
+
+def benchmark(name: str, help_text: str, configure=None):
+    """
+    Registers `fn(args)` as `python -m app.benchmarks <name>`.
+    `configure(parser)` optionally adds CLI options.
+    """
+    def decorator(fn):
+        BENCHMARKS[name] = (fn, help_text, configure)
+        return fn
+    return decorator
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+    }
+
+def _print_latency(label: str, seconds, unit: str = "ms"):
+    scale = {"ms": 1e3, "us": 1e6}[unit]
+    stats = _percentiles(seconds)
+    print(
+        f"{label:<28} n={stats['n']:<6} "
+        f"mean={stats['mean'] * scale:9.2f}{unit} "
+        f"p50={stats['p50'] * scale:9.2f}{unit} "
+        f"p95={stats['p95'] * scale:9.2f}{unit} "
+        f"p99={stats['p99'] * scale:9.2f}{unit}"
+    )
+
+# --- 1. PRIORITY: local tier vs Gemini ---
+
+async def _bench_priority(args):
+    from app.database import quick_notes_collection
+    from app.ai_engine import priority_chain
+    from app.priority_classifier import classify_locally, train_from_db
+
+    if args.train:
+        await train_from_db(quick_notes_collection)
+
+    cursor = quick_notes_collection.find(
+        {"is_encrypted": {"$ne": True}}, {"content": 1}
+    ).sort("updated_at", -1).limit(args.limit)
+    texts = [doc["content"] async for doc in cursor if doc.get("content")]
+    if not texts:
+        print("No quick notes to benchmark against.")
+        return
+
+    local_times, local_answers = [], []
+    for text in texts:
+        start = time.perf_counter()
+        label, _, _ = classify_locally(text)
+        local_times.append(time.perf_counter() - start)
+        local_answers.append(label)
+
+    llm_times, llm_answers = [], []
+    for text in texts[:args.llm_samples]:
+        start = time.perf_counter()
+        raw = await priority_chain.ainvoke({"text": text})
+        llm_times.append(time.perf_counter() - start)
+        llm_answers.append(raw.strip().replace(".", "").title())
+
+    _print_latency("local tier", local_times, unit="us")
+    _print_latency("gemini", llm_times)
+
+    answered = [i for i, label in enumerate(local_answers) if label]
+    print(f"local coverage: {len(answered)}/{len(texts)} ({len(answered) / len(texts):.0%}) answered without Gemini")
+
+    compared = [i for i in answered if i < len(llm_answers)]
+    if compared:
+        agree = sum(local_answers[i] == llm_answers[i] for i in compared)
+        print(f"agreement with gemini on locally-answered notes: {agree}/{len(compared)} ({agree / len(compared):.0%})")
+
+def _configure_priority(parser):
+    parser.add_argument("--limit", type=int, default=500, help="Quick notes to classify locally")
+    parser.add_argument("--llm-samples", type=int, default=50, help="How many of them to also send to Gemini")
+    parser.add_argument("--train", action="store_true", help="Train the local model from Mongo first")
+
+@benchmark("priority", "Latency + agreement of the local priority tier vs Gemini", _configure_priority)
+def bench_priority(args):
+    asyncio.run(_bench_priority(args))
+
+# --- 2. LLM CLIENT SETUP: per-request construction vs registry ---
+
+@benchmark(
+    "llm-setup",
+    "Per-request cost of building a tool-bound Gemini client vs the registry",
+    lambda p: p.add_argument("--iterations", type=int, default=200)
+)
+def bench_llm_setup(args):
+    import os
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from app.llm_registry import get_llm
+    from app.tools import create_event_tool
+
+    before = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        # What generate_node used to do on every chat turn
+        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3,
+                                     google_api_key=os.getenv("GOOGLE_API_KEY"))
+        llm.bind_tools([create_event_tool])
+        before.append(time.perf_counter() - start)
+
+    get_llm(temperature=0.3, tools=[create_event_tool]) # first build isn't per-request
+    after = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        get_llm(temperature=0.3, tools=[create_event_tool])
+        after.append(time.perf_counter() - start)
+
+    _print_latency("new client per request", before, unit="us")
+    _print_latency("registry lookup", after, unit="us")
+
+# --- 3. LOCAL VECTOR INDEX: IVF vs brute force ---
+
+def _configure_local_index(parser):
+    parser.add_argument("--size", type=int, default=50000, help="Vectors in one user's partition")
+    parser.add_argument("--dim", type=int, default=768, help="embedding-001 is 768-d")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--spread", type=float, default=0.8, help="Noise around each topic (higher = harder)")
+
+@benchmark("local-index", "Recall@k + latency of the local IVF index vs brute force", _configure_local_index)
+def bench_local_index(args):
+    import numpy as np
+    from app.local_index import IVFIndex, _normalize_rows, _top_k
+
+    # Synthetic but clustered, like real embeddings (topics), not uniform noise
+    rng = np.random.default_rng(42)
+    def around(centers, count):
+        noise = rng.standard_normal((count, args.dim)).astype(np.float32) / np.sqrt(args.dim)
+        return _normalize_rows(centers[rng.integers(0, len(centers), size=count)] + args.spread * noise)
+    topics = _normalize_rows(rng.standard_normal((max(8, args.size // 500), args.dim)).astype(np.float32))
+    matrix = around(topics, args.size)
+    queries = around(topics, args.queries)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(matrix)
+    print(f"IVF build: {time.perf_counter() - start:.2f}s ({ivf.nlist} lists, {args.size} x {args.dim})")
+
+    exact, brute = [], []
+    for q in queries:
+        start = time.perf_counter()
+        exact.append(set(_top_k(matrix @ q, args.k).tolist()))
+        brute.append(time.perf_counter() - start)
+    _print_latency("brute force", brute)
+
+    for nprobe in args.nprobe:
+        found, latencies = 0, []
+        for q, truth in zip(queries, exact):
+            start = time.perf_counter()
+            candidates = ivf.candidates(q, nprobe)
+            top = candidates[_top_k(matrix[candidates] @ q, args.k)]
+            latencies.append(time.perf_counter() - start)
+            found += len(truth & set(top.tolist()))
+        recall = found / (args.k * len(queries))
+        _print_latency(f"ivf nprobe={nprobe} r@{args.k}={recall:.3f}", latencies)
+
+# --- 4. RETRIEVAL RE-RANKING: eval harness ---
+
+def _configure_rerank(parser):
+    parser.add_argument("--dataset", help="JSONL of {user_id, question, relevant_ids, persona?} "
+                                          "to evaluate against the real vector store")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=300, help="Synthetic mode only")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic mode only")
+
+def _synthetic_rerank_eval(args):
+    import numpy as np
+    from datetime import date, timedelta
+    from langchain_core.documents import Document
+    from app.rerank import rerank, profile_for, PERSONA_PROFILES
+
+    # Memories = topics x near-duplicate groups x copies (the same rant logged again and again)
+    rng = np.random.default_rng(7)
+    def unit(x):
+        return x / np.linalg.norm(x, axis=-1, keepdims=True)
+    today = date.today()
+    topics = unit(rng.standard_normal((20, args.dim)))
+    rows, docs = [], []
+    for t, topic in enumerate(topics):
+        for g in range(6):
+            group = unit(topic + 0.9 * unit(rng.standard_normal(args.dim)))
+            for _ in range(int(rng.integers(1, 6))):
+                rows.append(unit(group + 0.05 * unit(rng.standard_normal(args.dim))))
+                docs.append(Document(page_content="", metadata={
+                    "topic": t, "group": (t, g),
+                    "date": (today - timedelta(days=int(rng.integers(0, 365)))).strftime("%Y-%m-%d"),
+                    "impact": int(rng.integers(1, 11)),
+                }))
+    matrix = np.asarray(rows, dtype=np.float32)
+
+    personas = [None] + list(PERSONA_PROFILES)
+    results = {"plain top-k": ([], [], [], [])}
+    results.update({f"rerank {p or 'default'}": ([], [], [], []) for p in personas})
+    for _ in range(args.queries):
+        t = int(rng.integers(0, len(topics)))
+        query = unit(topics[t] + 0.5 * unit(rng.standard_normal(args.dim))).astype(np.float32)
+        scores = matrix @ query
+
+        def record(name, picked, seconds):
+            relevant, groups, ages, latency = results[name]
+            relevant.append(sum(d.metadata["topic"] == t for d in picked) / args.k)
+            groups.append(len({d.metadata["group"] for d in picked}))
+            ages.append(np.mean([(today - date.fromisoformat(d.metadata["date"])).days for d in picked]))
+            latency.append(seconds)
+
+        start = time.perf_counter()
+        top = np.argsort(-scores)[:args.k]
+        record("plain top-k", [docs[i] for i in top], time.perf_counter() - start)
+
+        for persona in personas:
+            fetch = np.argsort(-scores)[:profile_for(persona)["fetch_k"]]
+            candidates = [(docs[i], float(scores[i]), matrix[i]) for i in fetch]
+            start = time.perf_counter()
+            picked = rerank(query, candidates, args.k, persona, today)
+            record(f"rerank {persona or 'default'}", picked, time.perf_counter() - start)
+
+    print(f"{args.queries} synthetic queries, {len(docs)} memories, k={args.k}")
+    for name, (relevant, groups, ages, latency) in results.items():
+        print(f"{name:<22} on-topic={np.mean(relevant):.3f}  distinct={np.mean(groups):.2f}/{args.k}  "
+              f"age={np.mean(ages):5.0f}d  rank p50={_percentiles(latency)['p50'] * 1e6:7.1f}us")
+
+async def _dataset_rerank_eval(args):
+    import json
+    from app import vector_store
+
+    with open(args.dataset) as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    for enabled in (False, True):
+        vector_store.RERANK_ENABLED = enabled
+        recalls, latencies = [], []
+        for case in cases:
+            start = time.perf_counter()
+            docs = await vector_store.search_notes(
+                case["user_id"], case["question"], k=args.k, persona=case.get("persona")
+            )
+            latencies.append(time.perf_counter() - start)
+            relevant = set(case["relevant_ids"])
+            recalls.append(len(relevant & {d.id for d in docs}) / max(1, min(len(relevant), args.k)))
+        label = "rerank" if enabled else "plain top-k"
+        print(f"{label:<12} recall@{args.k}={statistics.fmean(recalls):.3f}")
+        _print_latency(f"{label} search_notes", latencies)
+
+@benchmark("rerank", "Quality + latency of MMR/recency re-ranking vs plain top-k", _configure_rerank)
+def bench_rerank(args):
+    if args.dataset:
+        asyncio.run(_dataset_rerank_eval(args))
+    else:
+        _synthetic_rerank_eval(args)
+
+# --- 5. HYBRID SEARCH: keyword + vector + RRF on a synthetic corpus ---
+
+def _configure_hybrid(parser):
+    parser.add_argument("--entries", type=int, default=100_000, help="Synthetic entries for one user")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256, help="Synthetic vector size")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--db", default="shadow_bench", help="Scratch database (dropped afterwards)")
+
+async def _bench_hybrid(args):
+    import tempfile
+    import numpy as np
+    from app.database import client
+    from app.local_index import LocalVectorIndex
+    from app.search import ensure_text_index, keyword_search, reciprocal_rank_fusion
+
+    rng = np.random.default_rng(3)
+    vocabulary = [f"w{i}" for i in range(20_000)]
+    # Zipf-ish word frequencies, like real text
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    # A real ObjectId: otherwise bump_memory_version skips its users update
+    user_id = str(ObjectId())
+    collection = client[args.db].notes
+    await collection.drop()
+
+    print(f"Building {args.entries} entries ...")
+    words = rng.choice(len(vocabulary), size=(args.entries, 12), p=weights)
+    docs = [{
+        "user_id": user_id,
+        "raw_text": " ".join(vocabulary[w] for w in row),
+        "ai_metadata": {"summary": " ".join(vocabulary[w] for w in row[:4]), "tags": [vocabulary[row[0]]]},
+    } for row in words]
+    for start in range(0, len(docs), 10_000):
+        await collection.insert_many(docs[start:start + 10_000])
+    start = time.perf_counter()
+    await ensure_text_index(collection)
+    print(f"Text index build: {time.perf_counter() - start:.1f}s")
+
+    # Vectors: each entry's embedding is near the mean of its word vectors
+    word_vectors = rng.standard_normal((len(vocabulary), args.dim)).astype(np.float32)
+    vectors = word_vectors[words].mean(axis=1)
+    ids = [str(doc["_id"]) for doc in docs]
+    with tempfile.TemporaryDirectory() as root:
+        index = LocalVectorIndex(root, ivf_threshold=args.entries + 1) # brute force: exact vector ranking
+        for start in range(0, len(ids), 10_000):
+            index.upsert(user_id, ids[start:start + 10_000], vectors[start:start + 10_000],
+                         [{"text": ""}] * len(ids[start:start + 10_000]))
+
+        latencies = {"keyword": [], "vector": [], "fusion": [], "hybrid": []}
+        found = {"keyword": 0, "vector": 0, "hybrid": 0}
+        for _ in range(args.queries):
+            # Ask for a random entry: 2 of its words (rarest first) + a noisy version of its vector
+            target = int(rng.integers(0, args.entries))
+            query_words = sorted(set(words[target]), reverse=True)[:2]
+            query_text = " ".join(vocabulary[w] for w in query_words)
+            query_vector = vectors[target] + 0.5 * rng.standard_normal(args.dim).astype(np.float32)
+
+            started = time.perf_counter()
+            keyword_task = asyncio.create_task(keyword_search(user_id, query_text, args.k * 2, collection))
+            t0 = time.perf_counter()
+            vector_ids = [d.id for d, _ in await asyncio.to_thread(index.query, user_id, query_vector, args.k * 2)]
+            latencies["vector"].append(time.perf_counter() - t0)
+            keyword_ids = [str(d["_id"]) for d in await keyword_task]
+            latencies["keyword"].append(time.perf_counter() - started)
+            t0 = time.perf_counter()
+            fused = [doc_id for doc_id, _ in reciprocal_rank_fusion([keyword_ids, vector_ids])[:args.k]]
+            latencies["fusion"].append(time.perf_counter() - t0)
+            latencies["hybrid"].append(time.perf_counter() - started)
+
+            found["keyword"] += ids[target] in keyword_ids[:args.k]
+            found["vector"] += ids[target] in vector_ids[:args.k]
+            found["hybrid"] += ids[target] in fused
+
+    await collection.database.client.drop_database(args.db)
+    print(f"{args.queries} queries over {args.entries} entries, k={args.k}")
+    for name in ("keyword", "vector", "hybrid"):
+        print(f"  {name:<8} hit@{args.k}={found[name] / args.queries:.3f}")
+    for name, samples in latencies.items():
+        _print_latency(name, samples, unit="ms" if name != "fusion" else "us")
+
+@benchmark("hybrid-search", "Keyword + vector + RRF latency/hit-rate on a synthetic per-user corpus", _configure_hybrid)
+def bench_hybrid(args):
+    asyncio.run(_bench_hybrid(args))
+
+# --- 6. PAGINATION: keyset vs skip() at increasing page depth ---
+
+def _configure_pagination(parser):
+    parser.add_argument("--entries", type=int, default=100_000, help="Synthetic entries for one user")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--depths", default="1,10,100,1000", help="Comma-separated page numbers to time")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--db", default="shadow_bench", help="Scratch database (dropped afterwards)")
+
+async def _bench_pagination(args):
+    from datetime import datetime, timedelta, timezone
+    from app.database import client
+    from app.models import NoteDB
+    from app.pagination import fetch_page, encode_cursor, lean_response
+    from app.routers.entries import ENTRY_LIST_PROJECTION, ENTRY_DEFAULTS
+
+    # A real ObjectId: otherwise bump_memory_version skips its users update
+    user_id = str(ObjectId())
+    collection = client[args.db].notes
+    await collection.drop()
+    print(f"Building {args.entries} entries ...")
+    now = datetime.now(timezone.utc)
+    docs = [{
+        "user_id": user_id,
+        "raw_text": f"entry {i} " + "lorem ipsum " * 20,
+        "type": "user_note",
+        "created_at": now - timedelta(minutes=i),
+        "analysis_status": "done",
+        "analysis_error": None,
+        "ai_metadata": {"stream_type": "LOG", "impact_score": 3, "summary": f"entry {i}", "tags": ["bench"]},
+    } for i in range(args.entries)]
+    for start in range(0, len(docs), 10_000):
+        await collection.insert_many(docs[start:start + 10_000])
+    await collection.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+
+    # docs are newest first, so the row before page p is docs[(p - 1) * size - 1]
+    depths = [int(d) for d in args.depths.split(",") if (int(d) - 1) * args.page_size < args.entries]
+    print(f"{args.entries} entries, page size {args.page_size}")
+    for depth in depths:
+        offset = (depth - 1) * args.page_size
+        cursor = encode_cursor(docs[offset - 1]["created_at"], docs[offset - 1]["_id"]) if offset else None
+        keyset, skip = [], []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            await fetch_page(collection, {"user_id": user_id}, "created_at", True, args.page_size, cursor,
+                             ENTRY_LIST_PROJECTION)
+            keyset.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            await collection.find({"user_id": user_id}).sort("created_at", -1).skip(offset) \
+                .limit(args.page_size).to_list(length=args.page_size)
+            skip.append(time.perf_counter() - started)
+        _print_latency(f"page {depth} keyset", keyset)
+        _print_latency(f"page {depth} skip", skip)
+
+    # Response building for one page: per-document models vs lean json
+    page, _ = await fetch_page(collection, {"user_id": user_id}, "created_at", True, args.page_size, None,
+                               ENTRY_LIST_PROJECTION)
+    validated, lean = [], []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        [NoteDB.model_validate(doc).model_dump_json(by_alias=True) for doc in page]
+        validated.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        lean_response(page, None, ENTRY_DEFAULTS)
+        lean.append(time.perf_counter() - started)
+    _print_latency("serialize pydantic", validated, unit="us")
+    _print_latency("serialize lean", lean, unit="us")
+    await client.drop_database(args.db)
+
+@benchmark("pagination", "Keyset vs skip() page latency by depth, and lean vs model serialization", _configure_pagination)
+def bench_pagination(args):
+    asyncio.run(_bench_pagination(args))
+
+# --- 7. ROUND-TRIPS: Mongo commands per mutation endpoint ---
+
+def _configure_round_trips(parser):
+    parser.add_argument("--repeat", type=int, default=20, help="Calls per endpoint")
+    parser.add_argument("--db", default="shadow_bench", help="Scratch database (dropped afterwards)")
+
+async def _bench_round_trips(args):
+    from collections import Counter
+    from pymongo import monitoring
+
+    class CommandCounter(monitoring.CommandListener):
+        IGNORED = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue", "buildInfo"}
+
+        def __init__(self):
+            self.commands = Counter()
+
+        def started(self, event):
+            if event.command_name not in self.IGNORED and event.database_name == args.db:
+                self.commands[event.command_name] += 1
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    counter = CommandCounter()
+    # Global listeners only apply to clients created afterwards: register before app.database is imported
+    monitoring.register(counter)
+    from bson import ObjectId
+    from fastapi import HTTPException
+    from app import ingest, vector_store, dedup
+    from app.database import client
+    from app.models import NoteCreate, EventCreate, QuickNoteCreate, QuickNoteUpdate
+    from app.routers import entries, events, notes
+
+    # Point the routers at the scratch database
+    db = client[args.db]
+    entries.notes_collection = db.notes
+    events.events_collection = db.events
+    notes.quick_notes_collection = db.quick_notes
+    # ...and the writes the entry endpoints make through other modules
+    entries.users_collection = vector_store.users_collection = db.users
+    vector_store.vector_tombstones_collection = db.vector_tombstones
+    dedup.notes_collection = db.notes
+    dedup.memory_fingerprints_collection = db.memory_fingerprints
+    # Write-behind entries only need to reach the queue; nothing analyzes them here
+    ingest._queue = asyncio.Queue()
+
+    # A real ObjectId: otherwise bump_memory_version skips its users update
+    user_id = str(ObjectId())
+    state = {}
+
+    async def create_entry():
+        doc = await entries.create_entry(NoteCreate(raw_text="went for a run", user_id=user_id), background=True)
+        state["entry"] = doc
+        state.setdefault("entries", []).append(doc)
+
+    async def update_entry():
+        doc = state["entry"]
+        updated = await entries.update_entry(str(doc["_id"]), QuickNoteUpdate(stream_type="Activity",
+                                                                             version=doc.get("version", 0)))
+        doc["version"] = updated["version"]
+
+    async def delete_entry():
+        await entries.delete_entry(str(state["entries"].pop()["_id"]))
+
+    async def create_event():
+        await events.create_event(EventCreate(title="Standup", date="2030-01-01", time="10:00 AM",
+                                              type="Work", user_id=user_id))
+
+    async def create_quick_note():
+        state["note"] = await notes.create_quick_note(QuickNoteCreate(content="buy milk", priority="High",
+                                                                      user_id=user_id))
+
+    async def update_quick_note():
+        note = state["note"]
+        state["note"] = await notes.update_quick_note(str(note["_id"]), QuickNoteUpdate(
+            content="buy oat milk", priority="Low", is_encrypted=False, version=note["version"]
+        ))
+
+    async def update_quick_note_stale():
+        note = state["note"]
+        try:
+            await notes.update_quick_note(str(note["_id"]), QuickNoteUpdate(content="x", version=note["version"] - 1))
+        except HTTPException as e:
+            assert e.status_code == 409, e.status_code
+
+    endpoints = [
+        ("POST /entries (write-behind)", create_entry),
+        ("PUT /entries/{id}", update_entry),
+        ("DELETE /entries/{id}", delete_entry),
+        ("POST /events", create_event),
+        ("POST /quick-notes/", create_quick_note),
+        ("PUT /quick-notes/{id}", update_quick_note),
+        ("PUT /quick-notes/{id} (409)", update_quick_note_stale),
+    ]
+    await client.drop_database(args.db)
+    print(f"{'endpoint':<30} {'round-trips':>11}  commands")
+    latencies = {}
+    for name, call in endpoints:
+        counter.commands.clear()
+        latencies[name] = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            await call()
+            latencies[name].append(time.perf_counter() - started)
+        total = sum(counter.commands.values())
+        breakdown = ", ".join(f"{command}={count / args.repeat:g}" for command, count in counter.commands.items())
+        print(f"{name:<30} {total / args.repeat:>11.2f}  {breakdown}")
+    print()
+    for name, samples in latencies.items():
+        _print_latency(name, samples)
+    await client.drop_database(args.db)
+
+@benchmark("round-trips", "Mongo round-trips and latency per mutation endpoint (scratch database)", _configure_round_trips)
+def bench_round_trips(args):
+    asyncio.run(_bench_round_trips(args))
+
+# --- 8. CALENDAR SYNC: full vs incremental sync against the fake Calendar API ---
+
+def _configure_calendar_sync(parser):
+    parser.add_argument("--events", type=int, default=2000, help="Events in the fake calendar")
+    parser.add_argument("--changes", type=int, default=50, help="Edits + cancellations + additions per incremental sync")
+    parser.add_argument("--db", default="shadow_bench", help="Scratch database (dropped afterwards)")
+
+async def _bench_calendar_sync(args):
+    import random
+    from datetime import datetime, timedelta, timezone
+    from bson import ObjectId
+    from app import calendar_service
+    from app.database import client
+    from app.fake_calendar import FakeCalendar
+
+    db = client[args.db]
+    await client.drop_database(args.db)
+    # Point the sync at the scratch database
+    calendar_service.users_collection = db.users
+    calendar_service.events_collection = db.events
+    user_id = str(ObjectId())
+    await db.users.insert_one({"_id": ObjectId(user_id), "google_token": "{}"})
+
+    calendar = FakeCalendar()
+    now = datetime.now(timezone.utc)
+    ids = [calendar.add_event(f"Event {i}", (now + timedelta(hours=i)).isoformat()) for i in range(args.events)]
+
+    async def run(label: str):
+        requests = calendar.requests
+        started = time.perf_counter()
+        result = await calendar_service.sync_calendar_events(user_id, service=calendar)
+        elapsed = time.perf_counter() - started
+        stored = await db.events.count_documents({"user_id": user_id})
+        print(f"{label:<22} {elapsed * 1e3:9.1f}ms  api_pages={calendar.requests - requests:<4} "
+              f"new={result['new']:<6} updated={result['updated']:<5} deleted={result['deleted']:<5} stored={stored}")
+        return result
+
+    await run("full sync")
+    await run("no-op incremental")
+
+    rng = random.Random(5)
+    third = max(1, args.changes // 3)
+    live = ids[:]
+    rng.shuffle(live)
+    for event_id in live[:third]:
+        calendar.edit_event(event_id, summary="Moved")
+    for event_id in live[third:2 * third]:
+        calendar.cancel_event(event_id)
+    for i in range(third):
+        calendar.add_event(f"New {i}", (now + timedelta(days=1, minutes=i)).isoformat())
+    await run("incremental")
+
+    moved = await db.events.count_documents({"user_id": user_id, "title": "Moved"})
+    stored = await db.events.count_documents({"user_id": user_id})
+    # as many added as cancelled
+    print(f"check: {moved}/{third} edits applied, {stored}/{args.events} events stored")
+
+    calendar.expire_sync_tokens()
+    result = await run("expired token (410)")
+    print(f"check: fell back to full sync = {result['full_sync']}")
+    await client.drop_database(args.db)
+
+@benchmark("calendar-sync", "Full vs incremental Google Calendar sync against an in-memory fake API",
+           _configure_calendar_sync)
+def bench_calendar_sync(args):
+    asyncio.run(_bench_calendar_sync(args))
+
+# --- 9. EVENT DATES: natural-language parsing, inline dateparser vs date_parsing.py ---
+
+def _configure_date_parse(parser):
+    parser.add_argument("--events", type=int, default=2000, help="POST /events calls per mode")
+    parser.add_argument("--baseline-events", type=int, default=40,
+                        help="Calls for the old inline dateparser (all languages, ~200ms each)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight")
+    parser.add_argument("--skip-db", action="store_true", help="Only measure parsing (no MongoDB needed)")
+    parser.add_argument("--db", default="shadow_bench", help="Scratch database (dropped afterwards)")
+
+def _date_inputs(n: int, seed: int = 11):
+    import random
+    rng = random.Random(seed)
+    days = ["today", "tomorrow", "2026-01-16", "2026-03-08", "friday", "monday", "jan 20", "march 3",
+            "in 2 days", "next week", "saturday", "dec 24"]
+    times = ["", " 10am", " at 3pm", " 14:30", " 9.15 am", " at 11:30 PM"]
+    return [rng.choice(days) + rng.choice(times) for _ in range(n)]
+
+def _legacy_parse(text: str):
+    # POST /events before date_parsing.py: every language, on the event loop
+    import re
+    import dateparser
+    clean = re.sub(r'(\d{1,2})\.(\d{2})', r'\1:\2', text)
+    parsed_dt = dateparser.parse(clean, settings={'PREFER_DATES_FROM': 'future'})
+    if not parsed_dt:
+        return None
+    has_time = any(x in text.lower() for x in ["pm", "am", ":", ".", " at "])
+    return parsed_dt.strftime("%Y-%m-%d"), parsed_dt.strftime("%I:%M %p") if has_time else None
+
+async def _run_with_loop_lag(calls, concurrency: int):
+    """
+    Runs `calls` (coroutine factories) `concurrency` at a time. Returns
+    (seconds, worst event-loop stall): a ticker measures how late its 10ms sleeps wake up.
+    """
+    stalls, done = [0.0], asyncio.Event()
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls[0] = max(stalls[0], time.perf_counter() - started - 0.01)
+    slots = asyncio.Semaphore(concurrency)
+    async def one(call):
+        async with slots:
+            await call()
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(one(call) for call in calls))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+    return elapsed, stalls[0]
+
+async def _bench_date_parse(args):
+    from datetime import datetime
+    from app import date_parsing
+
+    inputs = _date_inputs(args.events)
+    baseline = inputs[:args.baseline_events]
+    reference = datetime.now()
+
+    async def legacy_parse(text, reference=None):
+        return _legacy_parse(text)
+
+    # 1. Parsing alone
+    agree = 0
+    for text in baseline:
+        agree += _legacy_parse(text) == await date_parsing.parse_event_date(text, reference)
+    print(f"check: {agree}/{len(baseline)} inputs parsed the same as the old inline dateparser")
+    date_parsing._cache.clear()
+    await date_parsing.warm_date_parser()
+    fast = sum(date_parsing.parse_fast(date_parsing._normalize(t), reference) is not None for t in inputs)
+    print(f"regex fast path covers {fast}/{len(inputs)} inputs\n")
+
+    def report(label, count, elapsed, stall):
+        print(f"{label:<34} {count / elapsed:9.1f}/s  n={count:<6} worst loop stall={stall * 1e3:8.1f}ms")
+
+    print("parses per second")
+    modes = [
+        ("inline dateparser (all languages)", legacy_parse, baseline),
+        ("date service, cold memo", date_parsing.parse_event_date, inputs),
+        ("date service, warm memo", date_parsing.parse_event_date, inputs),
+    ]
+    for label, parse, texts in modes:
+        elapsed, stall = await _run_with_loop_lag([functools.partial(parse, t, reference) for t in texts],
+                                                  args.concurrency)
+        report(label, len(texts), elapsed, stall)
+    if args.skip_db:
+        return
+
+    # 2. POST /events end to end (scratch database)
+    from app.database import client
+    from app.models import EventCreate
+    from app.routers import events
+
+    events.events_collection = client[args.db].events
+    await client.drop_database(args.db)
+    def creates(texts):
+        return [functools.partial(events.create_event, EventCreate(
+            title="Bench", date=t, time=None, type="Work", user_id="bench-user")) for t in texts]
+
+    print("\nevents created per second (POST /events)")
+    service = events.parse_event_date
+    events.parse_event_date = legacy_parse
+    try:
+        elapsed, stall = await _run_with_loop_lag(creates(baseline), args.concurrency)
+        report("inline dateparser (all languages)", len(baseline), elapsed, stall)
+    finally:
+        events.parse_event_date = service
+    date_parsing._cache.clear()
+    for label in ("date service, cold memo", "date service, warm memo"):
+        elapsed, stall = await _run_with_loop_lag(creates(inputs), args.concurrency)
+        report(label, len(inputs), elapsed, stall)
+    await client.drop_database(args.db)
+
+@benchmark("date-parse", "Events created per second: inline dateparser vs regex fast path + memo + worker pool",
+           _configure_date_parse)
+def bench_date_parse(args):
+    asyncio.run(_bench_date_parse(args))
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="name", required=True)
+    for name, (_, help_text, configure) in BENCHMARKS.items():
+        sub_parser = sub.add_parser(name, help=help_text)
+        if configure:
+            configure(sub_parser)
+
+    args = parser.parse_args()
+    BENCHMARKS[args.name][0](args)
+
+if __name__ == "__main__":
+    main()
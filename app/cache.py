@@ -0,0 +1,139 @@
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from app import metrics
+
+# --- 1. IN-MEMORY LRU + TTL ---
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Small thread-safe LRU with a per-entry TTL (ttl=None means no expiry).
+    """
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            return default if item is _MISSING else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# --- 2. CONTENT-ADDRESSED AI RESULT CACHE ---
+
+def normalize_text(text: str) -> str:
+    # "  Gym!! " and "gym" should share an entry
+    text = re.sub(r"\s+", " ", text.casefold()).strip()
+    return text.strip(" .!?,;:")
+
+def hash_text(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+class PromptCache:
+    """
+    Caches LLM results keyed by hash(prompt version + normalized input text).
+
+    The prompt version is a hash of the prompt text (+ model), so editing the
+    prompt automatically invalidates every old entry. Optional second tier in
+    MongoDB survives restarts and is shared between replicas.
+    """
+    def __init__(self, name: str, prompt_text: str, maxsize: int, ttl: float, collection=None):
+        self.name = name
+        self.version = hash_text(prompt_text)[:16]
+        self.ttl = ttl
+        self.collection = collection
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def key(self, text: str) -> str:
+        return hash_text(self.name, self.version, normalize_text(text))
+
+    async def get(self, text: str) -> Optional[Any]:
+        key = self.key(text)
+
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            metrics.incr(f"ai_cache.{self.name}.memory_hits")
+            return value
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"_id": key})
+            except Exception as e:
+                print(f"⚠️ AI Cache read error ({self.name}): {e}")
+                doc = None
+            if doc is not None:
+                age = (datetime.now(timezone.utc) - doc["created_at"]).total_seconds()
+                if age < self.ttl:
+                    metrics.incr(f"ai_cache.{self.name}.mongo_hits")
+                    self.memory.set(key, doc["value"])
+                    return doc["value"]
+
+        metrics.incr(f"ai_cache.{self.name}.misses")
+        return None
+
+    async def set(self, text: str, value: Any):
+        key = self.key(text)
+        self.memory.set(key, value)
+        if self.collection is not None:
+            try:
+                await self.collection.replace_one(
+                    {"_id": key},
+                    {
+                        "kind": self.name,
+                        "version": self.version,
+                        "value": value,
+                        "created_at": datetime.now(timezone.utc),
+                    },
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"⚠️ AI Cache write error ({self.name}): {e}")
+
+    async def prepare(self):
+        """
+        Startup hook: TTL index for the Mongo tier + drop entries written
+        under an older prompt version.
+        """
+        if self.collection is None:
+            return
+        await self.collection.create_index("created_at", expireAfterSeconds=int(self.ttl))
+        result = await self.collection.delete_many(
+            {"kind": self.name, "version": {"$ne": self.version}}
+        )
+        if result.deleted_count:
+            print(f"🧹 AI Cache ({self.name}): purged {result.deleted_count} stale entries")
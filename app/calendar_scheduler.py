@@ -0,0 +1,157 @@
+"""
+Background Google Calendar sync for every connected user (users with a
+google_token), so /events is fresh without anyone pressing "sync".
+
+Each API replica runs this loop. Scheduling state lives on the user in
+`calendar_sync`:
+  next_sync_at   when the user is due (jittered interval, or backoff after errors)
+  lease_owner /  a replica claims a due user with one atomic find_one_and_update;
+  lease_until    others skip the user until the lease is released or expires
+  failures       consecutive failures, drives the exponential backoff
+At most CALENDAR_SYNC_CONCURRENCY syncs run at once per replica. A quota
+error (429 / rateLimitExceeded, shared by the whole Google project) also
+pauses claiming on this replica for QUOTA_PAUSE_SECONDS.
+"""
+import random
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
+
+from app import metrics
+from app.config import (
+    INSTANCE_ID,
+    CALENDAR_SYNC_INTERVAL_SECONDS,
+    CALENDAR_SYNC_CONCURRENCY,
+    CALENDAR_SYNC_LEASE_SECONDS,
+    CALENDAR_SYNC_MAX_BACKOFF_SECONDS,
+)
+from app.database import users_collection
+from app.calendar_service import sync_calendar_events, is_quota_error
+
+TICK_SECONDS = 15
+QUOTA_PAUSE_SECONDS = 120
+LAG_BUCKETS = [60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 24 * 3600]
+
+_task: Optional[asyncio.Task] = None
+_running: Set[asyncio.Task] = set()
+_paused_until = 0.0 # monotonic; set after a quota error
+
+def next_interval(interval: float = CALENDAR_SYNC_INTERVAL_SECONDS) -> float:
+    # +-20% so users connected at the same moment drift apart
+    return interval * random.uniform(0.8, 1.2)
+
+def backoff_seconds(failures: int) -> float:
+    # 1 min, 2 min, 4 min, ... capped, jittered
+    delay = min(CALENDAR_SYNC_MAX_BACKOFF_SECONDS, 60.0 * 2 ** (failures - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+async def claim_due_user(now: datetime) -> Optional[dict]:
+    """
+    Leases one due user to this replica (atomic), or returns None.
+    """
+    return await users_collection.find_one_and_update(
+        {
+            "google_token": {"$exists": True},
+            "$and": [
+                # None also matches "never scheduled" (field missing)
+                {"$or": [{"calendar_sync.next_sync_at": {"$lte": now}}, {"calendar_sync.next_sync_at": None}]},
+                {"$or": [{"calendar_sync.lease_until": {"$lte": now}}, {"calendar_sync.lease_until": None}]},
+            ],
+        },
+        {"$set": {
+            "calendar_sync.lease_owner": INSTANCE_ID,
+            "calendar_sync.lease_until": now + timedelta(seconds=CALENDAR_SYNC_LEASE_SECONDS),
+        }},
+        projection={"calendar_sync": 1},
+        sort=[("calendar_sync.next_sync_at", 1)],
+    )
+
+async def _release(user_id, next_in: float, failures: int):
+    now = datetime.now(timezone.utc)
+    await users_collection.update_one(
+        # Only if we still hold it (an expired lease may have been taken over)
+        {"_id": user_id, "calendar_sync.lease_owner": INSTANCE_ID},
+        {"$set": {
+            "calendar_sync.next_sync_at": now + timedelta(seconds=next_in),
+            "calendar_sync.failures": failures,
+            "calendar_sync.lease_until": None,
+            "calendar_sync.lease_owner": None,
+        }}
+    )
+
+async def sync_user(user: dict):
+    global _paused_until
+    state = user.get("calendar_sync") or {}
+    now = datetime.now(timezone.utc)
+    if state.get("last_synced_at"):
+        # How stale this user's events were when we got to them
+        metrics.observe("calendar_sync.lag_seconds", (now - state["last_synced_at"]).total_seconds(), LAG_BUCKETS)
+
+    started = time.perf_counter()
+    try:
+        await sync_calendar_events(str(user["_id"]))
+    except Exception as e:
+        failures = state.get("failures", 0) + 1
+        delay = backoff_seconds(failures)
+        if is_quota_error(e):
+            # Quota is per Google project, so every user is affected: stop claiming for a bit
+            metrics.incr("calendar_sync.quota_errors")
+            _paused_until = time.monotonic() + QUOTA_PAUSE_SECONDS * random.uniform(1.0, 1.5)
+        else:
+            metrics.incr("calendar_sync.errors")
+        print(f"⚠️ CALENDAR SYNC: {user['_id']} failed ({e}), retrying in {delay:.0f}s")
+        await _release(user["_id"], delay, failures)
+        return
+    finally:
+        metrics.observe("calendar_sync.seconds", time.perf_counter() - started)
+
+    metrics.incr("calendar_sync.synced")
+    await _release(user["_id"], next_interval(), 0)
+
+async def run_due(slots: asyncio.Semaphore):
+    """
+    Claims due users while a pool slot is free; each sync runs as its own task.
+    """
+    while time.monotonic() >= _paused_until:
+        await slots.acquire()
+        try:
+            user = await claim_due_user(datetime.now(timezone.utc))
+        except Exception:
+            slots.release()
+            raise
+        if user is None:
+            slots.release()
+            return
+        task = asyncio.create_task(sync_user(user))
+        _running.add(task)
+        task.add_done_callback(lambda t: (_running.discard(t), slots.release()))
+        metrics.set_gauge("calendar_sync.in_flight", len(_running))
+
+async def _loop():
+    slots = asyncio.Semaphore(CALENDAR_SYNC_CONCURRENCY)
+    while True:
+        try:
+            await run_due(slots)
+        except Exception as e:
+            metrics.incr("calendar_sync.scheduler_errors")
+            print(f"❌ CALENDAR SCHEDULER: {e}")
+        metrics.set_gauge("calendar_sync.in_flight", len(_running))
+        await asyncio.sleep(TICK_SECONDS)
+
+async def start_calendar_scheduler():
+    global _task
+    if CALENDAR_SYNC_INTERVAL_SECONDS > 0:
+        _task = asyncio.create_task(_loop())
+        print(f"📅 CALENDAR SCHEDULER: every ~{CALENDAR_SYNC_INTERVAL_SECONDS:.0f}s, "
+              f"{CALENDAR_SYNC_CONCURRENCY} at a time ({INSTANCE_ID})")
+
+async def stop_calendar_scheduler():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+    # Let in-flight syncs finish (they release their leases)
+    if _running:
+        await asyncio.gather(*_running, return_exceptions=True)
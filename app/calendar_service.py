@@ -1,21 +1,22 @@
 import os
-import json
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime, timedelta, timezone
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from fastapi.responses import RedirectResponse
+from pymongo import UpdateOne, DeleteOne, DeleteMany
+from app import metrics
+from app.config import CALENDAR_SYNC_LOOKBACK_DAYS, CALENDAR_PAGE_SIZE
 from app.database import users_collection, events_collection
+from app.google_clients import SCOPES, calendar_client
+from app.event_times import google_window, window_fields
 from app.models import EventDB
 from bson import ObjectId
-from datetime import datetime
 
 # 1. CONFIGURATION
 # Allow HTTP for localhost testing (Remove this in production!)
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
 CLIENT_SECRETS_FILE = "client_secret.json"
-SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 REDIRECT_URI = "http://localhost:8000/auth/callback"
 
 # 2. OAUTH FLOW HELPER
@@ -26,62 +27,148 @@ def create_flow():
         redirect_uri=REDIRECT_URI
     )
 
-async def sync_calendar_events(user_id: str):
-    # A. Get User's Token (Same as before)
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+# 3. INCREMENTAL SYNC
+# The first sync lists every event from CALENDAR_SYNC_LOOKBACK_DAYS ago on,
+# page by page, and Google hands back a nextSyncToken. Later syncs send
+# only that token and get just what changed since (new, edited, cancelled),
+# again paged. All changes go to Mongo in one unordered bulk_write keyed on
+# (user_id, google_id), then the new token is stored on the user.
+# A 410 means the token expired: drop it and do a full sync.
+#
+# The google client is blocking (httplib2), so every execute() runs in a
+# worker thread. Clients are cached per user (google_clients.py); `service`
+# can be injected instead (e.g. a local fake Calendar API, see fake_calendar.py).
+
+def full_sync_start() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=CALENDAR_SYNC_LOOKBACK_DAYS)
+
+def _http_status(error: Exception):
+    return getattr(getattr(error, "resp", None), "status", None)
+
+def is_quota_error(error: Exception) -> bool:
+    # Google reports quota / rate limits as 429, or 403 with a rateLimitExceeded-style reason
+    status = _http_status(error)
+    return status == 429 or (status == 403 and any(
+        reason in str(error) for reason in ("rateLimitExceeded", "quotaExceeded", "userRateLimitExceeded")
+    ))
+
+def event_fields(g_event: dict) -> dict:
+    """
+    Google event -> the fields we store (date "YYYY-MM-DD", time "02:30 PM" / "All Day").
+    """
+    start_raw = g_event['start'].get('dateTime', g_event['start'].get('date'))
+    if 'T' in start_raw:
+        # Format: 2026-01-16T14:30:00+05:30
+        dt_obj = datetime.fromisoformat(start_raw.replace('Z', '+00:00'))
+        event_date = dt_obj.strftime("%Y-%m-%d") # "2026-01-16"
+        event_time = dt_obj.strftime("%I:%M %p") # "02:30 PM"
+    else:
+        # Format: 2026-01-16 (All Day Event)
+        event_date = start_raw
+        event_time = "All Day"
+    return {
+        "title": g_event.get('summary', 'No Title'),
+        "date": event_date,
+        "time": event_time,
+        **window_fields(google_window(g_event), g_event['start'].get('timeZone')),
+    }
+
+async def fetch_changes(service, sync_token=None):
+    """
+    Pages through events.list. Returns (items, next_sync_token).
+    Raises the client's HttpError (410 when sync_token has expired).
+    """
+    params = {"calendarId": "primary", "singleEvents": True, "maxResults": CALENDAR_PAGE_SIZE}
+    if sync_token:
+        # Google rejects timeMin/orderBy together with a syncToken
+        params["syncToken"] = sync_token
+    else:
+        params["timeMin"] = full_sync_start().isoformat().replace('+00:00', 'Z')
+
+    items, page_token = [], None
+    while True:
+        request = service.events().list(**params, **({"pageToken": page_token} if page_token else {}))
+        page = await asyncio.to_thread(request.execute)
+        items.extend(page.get('items', []))
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            return items, page.get('nextSyncToken')
+
+def change_operations(user_id: str, items, now: datetime, full_sync: bool = False) -> list:
+    operations = []
+    if full_sync:
+        # A full listing only has live events: anything we stored in that
+        # window that isn't listed was deleted while we weren't syncing
+        live = [g_event['id'] for g_event in items if g_event.get('status') != 'cancelled']
+        operations.append(DeleteMany({
+            "user_id": user_id,
+            "google_id": {"$exists": True, "$nin": live},
+            "date": {"$gt": full_sync_start().strftime("%Y-%m-%d")}, # the first day may be partly listed
+        }))
+    for g_event in items:
+        key = {"user_id": user_id, "google_id": g_event['id']}
+        if g_event.get('status') == 'cancelled':
+            operations.append(DeleteOne(key))
+        elif 'start' in g_event:
+            operations.append(UpdateOne(
+                key,
+                {
+                    "$set": {**event_fields(g_event), "updated_at": now},
+                    "$setOnInsert": {"type": "Personal", "created_at": now},
+                },
+                upsert=True
+            ))
+    return operations
+
+async def sync_calendar_events(user_id: str, service=None):
+    # A. Get User's Token + last sync token
+    user = await users_collection.find_one(
+        {"_id": ObjectId(user_id)}, {"google_token": 1, "calendar_sync": 1}
+    )
     if not user or "google_token" not in user:
         return {"error": "User not connected to Google"}
 
-    # B. Build Service (Same as before)
-    creds_data = json.loads(user["google_token"])
-    creds = Credentials.from_authorized_user_info(creds_data, SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
-
-    # C. Fetch Events (Same as before)
-    now = datetime.utcnow().isoformat() + 'Z'
-    events_result = service.events().list(
-        calendarId='primary', timeMin=now,
-        maxResults=10, singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    google_events = events_result.get('items', [])
-
-    # D. Save with Time Formatting
-    count = 0
-    for g_event in google_events:
-        existing = await events_collection.find_one({
-            "user_id": user_id, 
-            "google_id": g_event['id']
-        })
-        
-        if not existing:
-            # 1. Parse Start Time
-            start_raw = g_event['start'].get('dateTime', g_event['start'].get('date'))
-            
-            # 2. Extract Date & Time
-            event_date = start_raw # Default
-            event_time = None
-            
-            if 'T' in start_raw:
-                # Format: 2026-01-16T14:30:00+05:30
-                dt_obj = datetime.fromisoformat(start_raw)
-                event_date = dt_obj.strftime("%Y-%m-%d") # "2026-01-16"
-                event_time = dt_obj.strftime("%I:%M %p") # "02:30 PM"
-            else:
-                # Format: 2026-01-16 (All Day Event)
-                event_date = start_raw
-                event_time = "All Day"
-
-            new_event = {
-                "title": g_event.get('summary', 'No Title'),
-                "date": event_date,
-                "time": event_time, # <--- Saving the clean time string
-                "type": "Personal",
-                "user_id": user_id,
-                "google_id": g_event['id'],
-                "created_at": datetime.utcnow()
-            }
-            await events_collection.insert_one(new_event)
-            count += 1
-            
-    return {"message": f"Synced {count} new events"}
\ No newline at end of file
+    # B. Reuse the user's cached client (one sync per user at a time)
+    if service is None:
+        async with calendar_client(user_id, user["google_token"]) as service:
+            return await _sync_with(service, user_id, user)
+    return await _sync_with(service, user_id, user)
+
+async def _sync_with(service, user_id: str, user: dict):
+    # C. Fetch what changed since the last sync (or everything, the first time)
+    sync_token = (user.get("calendar_sync") or {}).get("sync_token")
+    full_sync = sync_token is None
+    try:
+        items, next_sync_token = await fetch_changes(service, sync_token)
+    except Exception as e:
+        if sync_token and _http_status(e) == 410:
+            print(f"🔁 CALENDAR: sync token expired for {user_id}, doing a full sync")
+            full_sync = True
+            items, next_sync_token = await fetch_changes(service)
+        else:
+            raise
+
+    # D. Apply every change in one round-trip
+    now = datetime.now(timezone.utc)
+    operations = change_operations(user_id, items, now, full_sync)
+    upserted = modified = deleted = 0
+    if operations:
+        result = await events_collection.bulk_write(operations, ordered=False)
+        upserted, modified, deleted = result.upserted_count, result.modified_count, result.deleted_count
+
+    # E. Remember where we are (after the write: a crash just replays the same changes)
+    # Dotted fields: calendar_sync also holds the scheduler's lease (calendar_scheduler.py)
+    await users_collection.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"calendar_sync.sync_token": next_sync_token, "calendar_sync.last_synced_at": now}}
+    )
+    metrics.incr("calendar.syncs")
+    metrics.incr("calendar.changes", len(items))
+
+    return {
+        "message": f"Synced {upserted} new events",
+        "new": upserted,
+        "updated": modified,
+        "deleted": deleted,
+        "full_sync": full_sync,
+    }
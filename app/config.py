@@ -0,0 +1,137 @@
+import os
+import socket
+from uuid import uuid4
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- VECTOR STORE I/O ---
+# Max number of blocking embedding / Pinecone calls running at once.
+# These run on a dedicated thread pool so they never block the event loop.
+VECTOR_IO_WORKERS = int(os.getenv("VECTOR_IO_WORKERS", "4"))
+# Changing this? Re-embed existing memories: python -m app.backfill_vectors
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+
+# --- BACKGROUND INGESTION (POST /entries) ---
+# When enabled, entries are stored immediately with analysis_status="pending"
+# and analyzed/embedded by a worker pool.
+INGEST_BACKGROUND = os.getenv("INGEST_BACKGROUND", "true").lower() == "true"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "1000"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "4"))
+INGEST_BACKOFF_SECONDS = float(os.getenv("INGEST_BACKOFF_SECONDS", "1.0"))
+# A pending note belongs to the replica that queued it for this long; after
+# that (e.g. the replica crashed) another replica's startup recovery may take it
+INGEST_CLAIM_SECONDS = float(os.getenv("INGEST_CLAIM_SECONDS", "900"))
+
+# Identifies this API process in leases / claims shared through MongoDB
+INSTANCE_ID = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
+
+# --- AI RESULT CACHE (analyze_text / detect_priority) ---
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+# Persist cache entries in MongoDB (shared across replicas + restarts)
+AI_CACHE_MONGO = os.getenv("AI_CACHE_MONGO", "false").lower() == "true"
+
+# --- LOCAL PRIORITY CLASSIFIER (in front of detect_priority) ---
+PRIORITY_LOCAL_TIER = os.getenv("PRIORITY_LOCAL_TIER", "true").lower() == "true"
+# Minimum confidence (0-1) for the rule engine / trained model to skip Gemini
+PRIORITY_RULE_CONFIDENCE = float(os.getenv("PRIORITY_RULE_CONFIDENCE", "0.7"))
+PRIORITY_MODEL_CONFIDENCE = float(os.getenv("PRIORITY_MODEL_CONFIDENCE", "0.85"))
+# Don't train the model until we have at least this many labelled notes
+PRIORITY_MODEL_MIN_SAMPLES = int(os.getenv("PRIORITY_MODEL_MIN_SAMPLES", "50"))
+
+# --- LLM CLIENTS ---
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+# Send a tiny request at startup to open the Gemini connection early
+LLM_WARMUP_PING = os.getenv("LLM_WARMUP_PING", "false").lower() == "true"
+
+# --- CHAT INTENT ROUTER ---
+# Ask Gemini when the local heuristics can't classify a chat message. Off by
+# default: unplaced questions are mostly memory questions, which is also the
+# fallback, so the extra round-trip rarely changes the route.
+INTENT_LLM_FALLBACK = os.getenv("INTENT_LLM_FALLBACK", "false").lower() == "true"
+# Give up on the LLM classifier after this long and route to "memory"
+INTENT_LLM_TIMEOUT_SECONDS = float(os.getenv("INTENT_LLM_TIMEOUT_SECONDS", "1.5"))
+
+# --- SEMANTIC ANSWER CACHE (/chat) ---
+# Cosine similarity a new question needs to reuse a cached answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_MAX_PER_USER = int(os.getenv("ANSWER_CACHE_MAX_PER_USER", "50"))
+
+# --- QUERY EMBEDDING + RETRIEVAL CACHES ---
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "600"))
+
+# --- VECTOR BACKEND ---
+# "pinecone" (hosted) or "local" (embedded NumPy index, works offline)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "./vector_data")
+# Users kept in RAM; everyone else is memory-mapped from disk on demand
+LOCAL_VECTOR_HOT_USERS = int(os.getenv("LOCAL_VECTOR_HOT_USERS", "64"))
+# Users with at least this many memories are searched through an IVF index
+LOCAL_VECTOR_IVF_THRESHOLD = int(os.getenv("LOCAL_VECTOR_IVF_THRESHOLD", "20000"))
+LOCAL_VECTOR_NPROBE = int(os.getenv("LOCAL_VECTOR_NPROBE", "8"))
+PINECONE_INDEX = os.getenv("PINECONE_INDEX", "shadow-memory")
+# Also search the old shared namespace until `python -m app.migrate_vectors` has finished
+PINECONE_LEGACY_FALLBACK = os.getenv("PINECONE_LEGACY_FALLBACK", "true").lower() == "true"
+
+# --- EMBEDDING WRITE BUFFER ---
+# Notes to embed are coalesced (across users) into one embed_documents call
+# + bulk upserts, flushed at EMBED_BATCH_SIZE notes or after EMBED_BATCH_DELAY_SECONDS
+EMBED_WRITE_BUFFER = os.getenv("EMBED_WRITE_BUFFER", "true").lower() == "true"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_DELAY_SECONDS = float(os.getenv("EMBED_BATCH_DELAY_SECONDS", "0.2"))
+
+# --- VECTOR CONSISTENCY ---
+# How often the API purges vectors whose note was deleted/reclassified (0 = never)
+VECTOR_SWEEP_INTERVAL_SECONDS = float(os.getenv("VECTOR_SWEEP_INTERVAL_SECONDS", str(6 * 3600)))
+
+# --- RETRIEVAL RE-RANKING (MMR + recency + impact, see rerank.py) ---
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+# Per-persona overrides, e.g. '{"Zen Mode": {"lambda_mult": 0.5}}'
+RERANK_PROFILES_JSON = os.getenv("RERANK_PROFILES_JSON", "")
+
+# --- CHAT RETRIEVAL MODE ---
+# "hybrid" = Mongo text search over every note + vector memories (RRF fused)
+# "vector" = vector memories only (IDEAs / strong RANTs)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# --- NEAR-DUPLICATE MEMORIES (see dedup.py) ---
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+# SimHash bits that may differ for two notes to count as the same memory (max 5: 6 bands)
+DEDUP_MAX_HAMMING = min(5, int(os.getenv("DEDUP_MAX_HAMMING", "5")))
+# Also compare embeddings against recent memories (one extra embedding call per memory)
+DEDUP_EMBEDDING_CHECK = os.getenv("DEDUP_EMBEDDING_CHECK", "false").lower() == "true"
+DEDUP_EMBEDDING_THRESHOLD = float(os.getenv("DEDUP_EMBEDDING_THRESHOLD", "0.95"))
+DEDUP_RECENT_DAYS = int(os.getenv("DEDUP_RECENT_DAYS", "30"))
+
+# --- MONGODB INDEXES (see indexes.py) ---
+# explain() the hot queries at startup and warn about any collection scan
+INDEX_PLAN_CHECK = os.getenv("INDEX_PLAN_CHECK", "true").lower() == "true"
+
+# --- GOOGLE CALENDAR SYNC (see calendar_service.py) ---
+# The first (full) sync starts this many days back; later syncs are incremental
+CALENDAR_SYNC_LOOKBACK_DAYS = int(os.getenv("CALENDAR_SYNC_LOOKBACK_DAYS", "1"))
+CALENDAR_PAGE_SIZE = int(os.getenv("CALENDAR_PAGE_SIZE", "250"))
+# Background sync of every connected user (calendar_scheduler.py); 0 = only on demand
+CALENDAR_SYNC_INTERVAL_SECONDS = float(os.getenv("CALENDAR_SYNC_INTERVAL_SECONDS", "900"))
+CALENDAR_SYNC_CONCURRENCY = int(os.getenv("CALENDAR_SYNC_CONCURRENCY", "4"))
+# A replica's claim on a user expires after this (e.g. if it crashed mid-sync)
+CALENDAR_SYNC_LEASE_SECONDS = float(os.getenv("CALENDAR_SYNC_LEASE_SECONDS", "300"))
+CALENDAR_SYNC_MAX_BACKOFF_SECONDS = float(os.getenv("CALENDAR_SYNC_MAX_BACKOFF_SECONDS", str(6 * 3600)))
+# Per-user Google credentials + Calendar client reuse (google_clients.py)
+GOOGLE_CLIENT_TTL_SECONDS = float(os.getenv("GOOGLE_CLIENT_TTL_SECONDS", "3600"))
+GOOGLE_CLIENT_CACHE_SIZE = int(os.getenv("GOOGLE_CLIENT_CACHE_SIZE", "512"))
+
+# --- EVENT TIMES (see event_times.py) ---
+# Time zone for event times that come without one (IANA name, e.g. "Europe/Berlin")
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
+
+# --- NATURAL-LANGUAGE EVENT DATES (see date_parsing.py) ---
+# Languages dateparser may read; each extra one slows every parse
+DATEPARSER_LANGUAGES = [lang.strip() for lang in os.getenv("DATEPARSER_LANGUAGES", "en").split(",") if lang.strip()]
+DATE_PARSE_WORKERS = int(os.getenv("DATE_PARSE_WORKERS", "2"))
+DATE_PARSE_CACHE_SIZE = int(os.getenv("DATE_PARSE_CACHE_SIZE", "4096"))
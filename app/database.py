@@ -21,6 +21,10 @@ users_collection = db.users
 events_collection = db.events
 notes_collection = db.notes
 quick_notes_collection = db.quick_notes
+ai_cache_collection = db.ai_cache
+migrations_collection = db.migrations
+vector_tombstones_collection = db.vector_tombstones
+memory_fingerprints_collection = db.memory_fingerprints
 
 # 4. Ping Function (Keep existing)
 async def ping_db():
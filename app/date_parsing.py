@@ -0,0 +1,145 @@
+import re
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import Optional, Tuple
+
+import dateparser
+
+from app import metrics
+from app.cache import TTLCache
+from app.config import DATEPARSER_LANGUAGES, DATE_PARSE_WORKERS, DATE_PARSE_CACHE_SIZE
+
+# --- NATURAL-LANGUAGE EVENT DATES ---
+# POST /events accepts "tomorrow 10am", "friday at 3.30pm", ... in the
+# date field. dateparser is slow: with no language list it detects the
+# language on every call (~200ms), and its first call loads locale data. So:
+#   1. common shapes ("today"/"tomorrow"/ISO date + optional time) are read by a regex
+#   2. everything else goes to dateparser, restricted to DATEPARSER_LANGUAGES,
+#      on a small thread pool so the event loop keeps serving requests
+#   3. results are memoized per (text, reference day)
+
+ParsedDate = Tuple[str, Optional[str]] # ("YYYY-MM-DD", "02:30 PM" or None)
+
+_DAY = r"(?P<day>today|tomorrow|\d{4}-\d{2}-\d{2})"
+_TIME = r"(?P<hour>\d{1,2})(?:[:.](?P<minute>\d{2}))?\s*(?P<ampm>am|pm)?"
+_FAST_PATTERNS = [
+    re.compile(rf"^{_DAY}(?:,?\s+(?:at\s+)?{_TIME})?$"), # "tomorrow 10am", "2026-01-16 14:30"
+    re.compile(rf"^(?:at\s+)?{_TIME}\s+{_DAY}$"), # "10am tomorrow"
+]
+# Relative to the current time, not the day: never memoized
+_SUB_DAY = re.compile(r"\b(now|hours?|hrs?|minutes?|mins?|seconds?|secs?)\b")
+
+_MISSING = object()
+_cache = TTLCache(maxsize=DATE_PARSE_CACHE_SIZE)
+_pool = ThreadPoolExecutor(max_workers=DATE_PARSE_WORKERS, thread_name_prefix="dateparser")
+_SETTINGS = {"PREFER_DATES_FROM": "future"}
+
+def _normalize(text: str) -> str:
+    # Convert "11.30" to "11:30" so dateparser understands it
+    text = re.sub(r'(\d{1,2})\.(\d{2})', r'\1:\2', text)
+    return " ".join(text.lower().split())
+
+def parse_fast(text: str, reference: datetime) -> Optional[ParsedDate]:
+    """
+    The regex path. None means "not one of the common shapes" (not "invalid").
+    """
+    for pattern in _FAST_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            break
+    else:
+        return None
+
+    day = match["day"]
+    if day == "today":
+        parsed_day = reference.date()
+    elif day == "tomorrow":
+        parsed_day = reference.date() + timedelta(days=1)
+    else:
+        try:
+            parsed_day = date.fromisoformat(day)
+        except ValueError:
+            return None
+    if match["hour"] is None:
+        return parsed_day.isoformat(), None
+
+    hour, minute, ampm = int(match["hour"]), int(match["minute"] or 0), match["ampm"]
+    if ampm is None and match["minute"] is None:
+        return None # "tomorrow 10": leave the guessing to dateparser
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return parsed_day.isoformat(), datetime(2000, 1, 1, hour, minute).strftime("%I:%M %p")
+
+def parse_with_dateparser(text: str, reference: datetime) -> Optional[ParsedDate]:
+    """
+    Blocking; run it on the pool (parse_event_date does).
+    """
+    started = time.perf_counter()
+    parsed_dt = dateparser.parse(
+        text, languages=DATEPARSER_LANGUAGES, settings={**_SETTINGS, "RELATIVE_BASE": reference}
+    )
+    metrics.observe("date_parse.dateparser_seconds", time.perf_counter() - started)
+    if parsed_dt is None:
+        return None
+    # Only keep a time if the text actually mentioned one
+    has_time = any(x in text for x in ["pm", "am", ":", ".", " at "])
+    return parsed_dt.strftime("%Y-%m-%d"), parsed_dt.strftime("%I:%M %p") if has_time else None
+
+async def parse_event_date(text: str, reference: Optional[datetime] = None) -> Optional[ParsedDate]:
+    """
+    ("YYYY-MM-DD", "02:30 PM" or None) for a natural-language date, or None
+    if it can't be read. `reference` is the user's naive local "now".
+    """
+    reference = reference or datetime.now()
+    text = _normalize(text)
+    if not text:
+        return None
+
+    fast = parse_fast(text, reference)
+    if fast is not None:
+        metrics.incr("date_parse.fast_path")
+        return fast
+
+    memoize = not _SUB_DAY.search(text)
+    key = (text, reference.date())
+    if memoize:
+        cached = _cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            metrics.incr("date_parse.cache_hits")
+            return cached
+
+    metrics.incr("date_parse.dateparser")
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(_pool, functools.partial(parse_with_dateparser, text, reference))
+    if result is None:
+        metrics.incr("date_parse.failed")
+    if memoize:
+        _cache.set(key, result) # unreadable text too: it stays unreadable
+    return result
+
+async def warm_date_parser():
+    """
+    Loads dateparser's locale data and starts every pool thread, so the
+    first POST /events doesn't pay for it.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    reference = datetime.now()
+    # Once (locale data is loaded lazily, not under a lock), then on every thread
+    await loop.run_in_executor(_pool, parse_with_dateparser, "friday at 3pm", reference)
+    await asyncio.gather(*(
+        loop.run_in_executor(_pool, parse_with_dateparser, "in 2 days", reference)
+        for _ in range(DATE_PARSE_WORKERS)
+    ))
+    print(f"🗓️ DATE PARSER: warmed ({', '.join(DATEPARSER_LANGUAGES)}) in "
+          f"{(time.perf_counter() - started) * 1e3:.0f}ms")
+
+def shutdown_date_pool():
+    _pool.shutdown(wait=True)
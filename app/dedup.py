@@ -0,0 +1,203 @@
+import re
+import hashlib
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from bson import ObjectId, Int64
+from pymongo import ReturnDocument
+
+from app import metrics
+from app.cache import normalize_text
+from app.config import (
+    DEDUP_MAX_HAMMING,
+    DEDUP_EMBEDDING_CHECK,
+    DEDUP_EMBEDDING_THRESHOLD,
+    DEDUP_RECENT_DAYS,
+)
+from app.database import notes_collection, memory_fingerprints_collection
+from app.vector_store import embed_query, backend, run_in_vector_pool, update_note_metadata
+
+# --- NEAR-DUPLICATE MEMORIES ---
+# People log the same rant / idea again and again. Instead of storing every
+# copy as a new vector, a near-duplicate is merged into the first one (the
+# "canonical" memory), which keeps a recurrence count.
+#
+# Stage 1: 64-bit SimHash of the text, split into 6 bands of 10-11 bits. Two
+#          fingerprints within Hamming distance 5 always share a band
+#          (pigeonhole), so one indexed {user_id, bands} lookup finds every
+#          candidate and we only compare those.
+# Stage 2 (optional, DEDUP_EMBEDDING_CHECK): cosine similarity against the
+#          user's closest recent memory, for rephrasings SimHash can't see.
+
+BAND_WIDTHS = [11, 11, 11, 11, 10, 10] # sums to 64
+_TOKEN = re.compile(r"\w+")
+
+def _token_hashes(text: str) -> np.ndarray:
+    words = _TOKEN.findall(normalize_text(text))
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "big") for f in features],
+        dtype=np.uint64
+    )
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over word unigrams + bigrams (unsigned int).
+    """
+    hashes = _token_hashes(text)
+    if len(hashes) == 0:
+        return 0
+    # bits[i, j] = bit j of feature i (MSB first); each feature votes +1/-1 per bit
+    bits = np.unpackbits(hashes.byteswap().view(np.uint8).reshape(-1, 8), axis=1)
+    votes = (2 * bits.astype(np.int32) - 1).sum(axis=0)
+    return int("".join("1" if v > 0 else "0" for v in votes), 2)
+
+def band_keys(fingerprint: int):
+    # band index in the high bits, so equal values in different bands don't collide
+    keys, shift = [], 0
+    for band, width in enumerate(BAND_WIDTHS):
+        keys.append((band << 16) | ((fingerprint >> shift) & ((1 << width) - 1)))
+        shift += width
+    return keys
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def _to_int64(fingerprint: int) -> Int64:
+    # BSON has no unsigned 64-bit int; store the two's-complement value
+    return Int64(fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint)
+
+def _from_int64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+async def record_fingerprint(note_id: str, user_id: str, text: str):
+    fingerprint = simhash(text)
+    await memory_fingerprints_collection.update_one(
+        {"_id": note_id},
+        {"$set": {"user_id": user_id, "simhash": _to_int64(fingerprint), "bands": band_keys(fingerprint)}},
+        upsert=True
+    )
+
+async def forget_fingerprint(note_id: str):
+    await memory_fingerprints_collection.delete_one({"_id": note_id})
+
+async def _simhash_match(user_id: str, text: str) -> Optional[str]:
+    fingerprint = simhash(text)
+    cursor = memory_fingerprints_collection.find(
+        {"user_id": user_id, "bands": {"$in": band_keys(fingerprint)}}, {"simhash": 1}
+    )
+    best, best_distance = None, DEDUP_MAX_HAMMING + 1
+    async for doc in cursor:
+        distance = hamming(fingerprint, _from_int64(doc["simhash"]))
+        if distance < best_distance:
+            best, best_distance = doc["_id"], distance
+    return best
+
+async def _embedding_match(user_id: str, text: str) -> Optional[str]:
+    vector = await embed_query(text)
+    hits = await run_in_vector_pool(backend.query, user_id, vector, 3, {"user_id": user_id})
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=DEDUP_RECENT_DAYS)).strftime("%Y-%m-%d")
+    for doc, score in hits:
+        # Pinecone scores are cosine similarities for a cosine index; local ones always are
+        if score >= DEDUP_EMBEDDING_THRESHOLD and doc.metadata.get("date", "") >= cutoff:
+            return doc.id
+    return None
+
+async def find_duplicate(user_id: str, text: str) -> Optional[str]:
+    """
+    Returns the note id of an existing memory this text duplicates, if any.
+    """
+    canonical = await _simhash_match(user_id, text)
+    if canonical:
+        metrics.incr("dedup.simhash_hits")
+        return canonical
+    if DEDUP_EMBEDDING_CHECK:
+        canonical = await _embedding_match(user_id, text)
+        if canonical:
+            metrics.incr("dedup.embedding_hits")
+            return canonical
+    metrics.incr("dedup.misses")
+    return None
+
+async def merge_into(canonical_id: str, note_id: str, canonical_filter: dict) -> bool:
+    """
+    Counts `note_id` as another occurrence of `canonical_id`.
+    `canonical_filter` must match only notes that are still memories; if the
+    canonical one was deleted/reclassified, its fingerprint is dropped and
+    False is returned (the caller then stores the note normally).
+    """
+    now = datetime.now(timezone.utc)
+    canonical = await notes_collection.find_one_and_update(
+        {**canonical_filter, "_id": ObjectId(canonical_id)},
+        {
+            "$inc": {"recurrence.count": 1},
+            "$set": {"recurrence.last_seen": now},
+            "$push": {"recurrence.note_ids": {"$each": [note_id], "$slice": -20}},
+        },
+        projection={"recurrence.count": 1, "user_id": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if canonical is None:
+        await forget_fingerprint(canonical_id)
+        return False
+
+    await notes_collection.update_one({"_id": ObjectId(note_id)}, {"$set": {"duplicate_of": canonical_id}})
+    await sync_recurrence(canonical["user_id"], canonical_id, canonical["recurrence"]["count"])
+    print(f"🔁 DEDUP: {note_id} is a repeat of {canonical_id} (x{canonical['recurrence']['count'] + 1})")
+    return True
+
+async def sync_recurrence(user_id: str, note_id: str, count: int):
+    # Let retrieval say "logged N times" (the first log counts too; 0 = no repeats)
+    try:
+        await update_note_metadata(user_id, note_id, {"recurring": count + 1 if count else 0})
+    except Exception as e:
+        print(f"⚠️ Recurrence count not synced to the vector store for {note_id}: {e}")
+
+async def release_duplicate(canonical_id: str, note_id: str):
+    """
+    Undoes merge_into() for a repeat that was deleted or reclassified.
+    """
+    await notes_collection.update_one({"_id": ObjectId(note_id)}, {"$unset": {"duplicate_of": ""}})
+    canonical = await notes_collection.find_one_and_update(
+        {"_id": ObjectId(canonical_id), "recurrence.count": {"$gt": 0}},
+        {"$inc": {"recurrence.count": -1}, "$pull": {"recurrence.note_ids": note_id}},
+        projection={"recurrence.count": 1, "user_id": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if canonical is not None:
+        await sync_recurrence(canonical["user_id"], canonical_id, canonical["recurrence"]["count"])
+
+async def promote_duplicate(canonical: dict, successor_filter: dict) -> Optional[dict]:
+    """
+    The canonical memory was deleted or reclassified: its oldest repeat that
+    matches `successor_filter` takes over, with the remaining recurrence
+    count, and the other repeats now point to it. Returns the promoted note
+    (the caller stores it as a memory), or None if there are no repeats.
+    """
+    recurrence = canonical.get("recurrence") or {}
+    if not recurrence.get("count"):
+        return None
+    canonical_id = str(canonical["_id"])
+    successor = await notes_collection.find_one_and_update(
+        {**successor_filter, "duplicate_of": canonical_id},
+        {"$unset": {"duplicate_of": ""}},
+        projection={"raw_text": 1, "user_id": 1, "created_at": 1, "ai_metadata.impact_score": 1},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+    if successor is None:
+        return None
+
+    successor_id = str(successor["_id"])
+    successor["recurrence"] = {
+        "count": max(recurrence["count"] - 1, 0),
+        "last_seen": recurrence.get("last_seen"),
+        "note_ids": [n for n in recurrence.get("note_ids", []) if n != successor_id],
+    }
+    await notes_collection.update_one({"_id": successor["_id"]}, {"$set": {"recurrence": successor["recurrence"]}})
+    await notes_collection.update_many({"duplicate_of": canonical_id}, {"$set": {"duplicate_of": successor_id}})
+    # Reclassified (not deleted): it no longer counts the repeats
+    await notes_collection.update_one({"_id": ObjectId(canonical_id)}, {"$unset": {"recurrence": ""}})
+    print(f"🔁 DEDUP: {successor_id} replaces {canonical_id} as the canonical memory "
+          f"(x{successor['recurrence']['count'] + 1})")
+    return successor
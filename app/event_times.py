@@ -0,0 +1,88 @@
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.config import DEFAULT_TIMEZONE
+
+# --- EVENT TIMES ---
+# Events keep their display strings (date "YYYY-MM-DD", time "02:30 PM" /
+# "All Day") but are queried by `start` / `end`: timezone-aware datetimes,
+# stored as UTC, so they sort correctly within a day and a week/month view
+# is one indexed range query on {user_id, start}.
+
+DEFAULT_DURATION = timedelta(hours=1) # events created with only a start time
+# Range queries look back this far for events that started before the window
+# but are still running (keeps the start bound, and so the index, selective)
+MAX_EVENT_SPAN = timedelta(days=31)
+TIME_FORMATS = ("%I:%M %p", "%H:%M")
+
+Window = Tuple[datetime, datetime, bool] # (start, end, all_day), UTC
+
+def zone(name: Optional[str] = None) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+def _parse_time(value: str) -> Optional[time]:
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value.strip().upper(), fmt).time()
+        except ValueError:
+            continue
+    return None
+
+def event_window(date_str: Optional[str], time_str: Optional[str] = None,
+                 tz_name: Optional[str] = None) -> Optional[Window]:
+    """
+    start/end from the stored strings, read in `tz_name` (DEFAULT_TIMEZONE).
+    No time (or "All Day") -> the whole day. None if the date can't be read.
+    """
+    try:
+        day = date.fromisoformat((date_str or "").strip())
+    except ValueError:
+        return None
+    tz = zone(tz_name)
+    at = _parse_time(time_str) if time_str and time_str != "All Day" else None
+    if at is None:
+        start = datetime.combine(day, time.min, tz)
+        return start.astimezone(timezone.utc), (start + timedelta(days=1)).astimezone(timezone.utc), True
+    # Durations in UTC (wall-clock + 1h is wrong across a DST change); whole days stay wall-clock
+    start = datetime.combine(day, at, tz).astimezone(timezone.utc)
+    return start, start + DEFAULT_DURATION, False
+
+def google_window(g_event: dict) -> Optional[Window]:
+    """
+    start/end of a Google Calendar event (dateTime has an offset; all-day
+    events have dates, end exclusive, read in the event's time zone).
+    """
+    start, end = g_event.get('start') or {}, g_event.get('end') or {}
+    if 'dateTime' in start:
+        begin = datetime.fromisoformat(start['dateTime'].replace('Z', '+00:00'))
+        finish = datetime.fromisoformat(end['dateTime'].replace('Z', '+00:00')) if 'dateTime' in end \
+            else begin + DEFAULT_DURATION
+        return begin.astimezone(timezone.utc), finish.astimezone(timezone.utc), False
+    if 'date' in start:
+        tz = zone(start.get('timeZone'))
+        begin = datetime.combine(date.fromisoformat(start['date']), time.min, tz)
+        finish = datetime.combine(date.fromisoformat(end['date']), time.min, tz) if 'date' in end \
+            else begin + timedelta(days=1)
+        return begin.astimezone(timezone.utc), finish.astimezone(timezone.utc), True
+    return None
+
+def window_fields(window: Optional[Window], tz_name: Optional[str] = None) -> dict:
+    if window is None:
+        return {"start": None, "end": None, "all_day": False}
+    start, end, all_day = window
+    return {"start": start, "end": end, "all_day": all_day, "timezone": tz_name or DEFAULT_TIMEZONE}
+
+def parse_bound(value: str, tz_name: Optional[str] = None) -> datetime:
+    """
+    A /events/range bound: "2026-03-01" (midnight) or an ISO datetime;
+    naive values are read in tz_name. Raises ValueError.
+    """
+    value = value.strip().replace('Z', '+00:00')
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=zone(tz_name))
+    return parsed.astimezone(timezone.utc)
@@ -0,0 +1,118 @@
+"""
+In-memory stand-in for the Google Calendar v3 client, for exercising
+calendar_service.sync_calendar_events() without Google:
+
+    calendar = FakeCalendar()
+    calendar.add_event("Standup", "2030-01-01T10:00:00+00:00")
+    await sync_calendar_events(user_id, service=calendar)
+
+Implements only what the sync uses: events().list(...).execute() with
+maxResults / pageToken paging, timeMin on full syncs, and syncToken
+incremental syncs that return edits and cancellations (status "cancelled").
+"""
+import itertools
+from datetime import datetime
+
+class FakeHttpError(Exception):
+    """
+    Shaped like googleapiclient.errors.HttpError (error.resp.status).
+    """
+    class _Resp:
+        def __init__(self, status: int):
+            self.status = status
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(f"{status} {message}")
+        self.resp = self._Resp(status)
+
+class _Request:
+    def __init__(self, run):
+        self._run = run
+
+    def execute(self):
+        return self._run()
+
+class _Events:
+    def __init__(self, calendar: "FakeCalendar"):
+        self._calendar = calendar
+
+    def list(self, **params):
+        return _Request(lambda: self._calendar._list(params))
+
+class FakeCalendar:
+    def __init__(self):
+        self.events_by_id = {}
+        self._changed_at = {} # event id -> change sequence number
+        self._sequence = 0
+        self._ids = itertools.count(1)
+        self._min_valid_token = 0
+        self.requests = 0 # events.list calls executed
+
+    # --- what the sync calls ---
+
+    def events(self):
+        return _Events(self)
+
+    def _list(self, params: dict) -> dict:
+        self.requests += 1
+        if "syncToken" in params:
+            for forbidden in ("timeMin", "timeMax", "orderBy", "updatedMin"):
+                if forbidden in params:
+                    raise FakeHttpError(400, f"{forbidden} can't be used with syncToken")
+            since = int(params["syncToken"])
+            if since < self._min_valid_token:
+                raise FakeHttpError(410, "Sync token is no longer valid, a full sync is required.")
+            ids = [i for i, seq in self._changed_at.items() if seq > since]
+        else:
+            # Full sync: live events only, starting at timeMin
+            ids = [i for i, event in self.events_by_id.items()
+                   if event["status"] != "cancelled" and self._after(event, params.get("timeMin"))]
+
+        offset = int(params.get("pageToken") or 0)
+        limit = int(params.get("maxResults", 250))
+        page = {"items": [dict(self.events_by_id[i]) for i in ids[offset:offset + limit]]}
+        if offset + limit < len(ids):
+            page["nextPageToken"] = str(offset + limit)
+        else:
+            page["nextSyncToken"] = str(self._sequence)
+        return page
+
+    @staticmethod
+    def _after(event: dict, time_min) -> bool:
+        if not time_min:
+            return True
+        start = event["start"].get("dateTime") or event["start"]["date"] + "T00:00:00+00:00"
+        return datetime.fromisoformat(start.replace("Z", "+00:00")) >= \
+            datetime.fromisoformat(time_min.replace("Z", "+00:00"))
+
+    # --- changing the fake calendar ---
+
+    def _touch(self, event_id: str):
+        self._sequence += 1
+        self._changed_at[event_id] = self._sequence
+
+    def add_event(self, summary: str, start: str, all_day: bool = False) -> str:
+        """
+        `start` is an RFC 3339 datetime, or "YYYY-MM-DD" with all_day=True.
+        """
+        event_id = f"fake{next(self._ids)}"
+        self.events_by_id[event_id] = {
+            "id": event_id,
+            "status": "confirmed",
+            "summary": summary,
+            "start": {"date": start} if all_day else {"dateTime": start},
+        }
+        self._touch(event_id)
+        return event_id
+
+    def edit_event(self, event_id: str, **fields):
+        self.events_by_id[event_id].update(fields)
+        self._touch(event_id)
+
+    def cancel_event(self, event_id: str):
+        # Google keeps a stub with status "cancelled" for incremental syncs
+        self.events_by_id[event_id] = {"id": event_id, "status": "cancelled"}
+        self._touch(event_id)
+
+    def expire_sync_tokens(self):
+        self._min_valid_token = self._sequence + 1
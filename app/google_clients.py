@@ -0,0 +1,109 @@
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from bson import ObjectId
+
+from google.oauth2.credentials import Credentials
+from google.auth.exceptions import RefreshError
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from app import metrics
+from app.config import GOOGLE_CLIENT_TTL_SECONDS, GOOGLE_CLIENT_CACHE_SIZE
+from app.database import users_collection
+
+# --- GOOGLE CALENDAR CLIENT CACHE ---
+# Building a Calendar client means parsing the ~130 KB discovery document
+# and, once the access token has expired, a blocking token refresh. Per user
+# we keep the Credentials + service object for GOOGLE_CLIENT_TTL_SECONDS,
+# built from one discovery document parsed at import.
+#
+# The google client (httplib2) is not thread-safe, so a user's service is
+# only used by one task at a time (per-user asyncio.Lock); different users
+# run in parallel. When google-auth refreshed the token during a call, the
+# new token is written back to users.google_token, so the next process /
+# replica doesn't refresh again.
+
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+CALENDAR_DISCOVERY = json.loads(get_static_doc('calendar', 'v3'))
+
+class _Client:
+    __slots__ = ("service", "credentials", "stored_token", "expires_at", "lock")
+
+    def __init__(self, service, credentials: Credentials, stored_token: str):
+        self.service = service
+        self.credentials = credentials
+        self.stored_token = stored_token # google_token JSON as it is in Mongo
+        self.expires_at = time.monotonic() + GOOGLE_CLIENT_TTL_SECONDS
+        self.lock = asyncio.Lock()
+
+_clients: "OrderedDict[str, _Client]" = OrderedDict()
+
+def build_calendar_service(google_token: str):
+    """
+    Uncached (Credentials, service) from a stored google_token. No network
+    I/O: the discovery document is the parsed static copy.
+    """
+    credentials = Credentials.from_authorized_user_info(json.loads(google_token), SCOPES)
+    service = build_from_document(CALENDAR_DISCOVERY, credentials=credentials)
+    return credentials, service
+
+def _get(user_id: str, google_token: str) -> _Client:
+    client = _clients.get(user_id)
+    # A different stored token means the user re-connected: start over
+    if client is not None and client.expires_at > time.monotonic() and client.stored_token == google_token:
+        _clients.move_to_end(user_id)
+        metrics.incr("google_clients.hits")
+        return client
+    if client is not None and client.lock.locked():
+        # Still in use by another task: share it, it's replaced once free
+        return client
+
+    metrics.incr("google_clients.misses")
+    credentials, service = build_calendar_service(google_token)
+    client = _clients[user_id] = _Client(service, credentials, google_token)
+    _clients.move_to_end(user_id)
+    while len(_clients) > GOOGLE_CLIENT_CACHE_SIZE:
+        oldest, entry = next(iter(_clients.items()))
+        if entry.lock.locked():
+            break # evicted on a later call
+        del _clients[oldest]
+    metrics.set_gauge("google_clients.cached", len(_clients))
+    return client
+
+async def _persist_refreshed(user_id, client: _Client):
+    token = client.credentials.to_json()
+    if json.loads(token).get("token") == json.loads(client.stored_token).get("token"):
+        return
+    metrics.incr("google_clients.refreshes")
+    # Only replace the token we started from (not a newer one from a re-connect)
+    await users_collection.update_one(
+        {"_id": ObjectId(user_id), "google_token": client.stored_token},
+        {"$set": {"google_token": token}}
+    )
+    client.stored_token = token
+
+def forget_client(user_id: str):
+    _clients.pop(user_id, None)
+
+@asynccontextmanager
+async def calendar_client(user_id: str, google_token: str):
+    """
+    async with calendar_client(user_id, user["google_token"]) as service:
+        await asyncio.to_thread(service.events().list(...).execute)
+    """
+    client = _get(user_id, google_token)
+    async with client.lock:
+        try:
+            yield client.service
+        except RefreshError:
+            # Revoked / expired refresh token: don't keep a dead client around
+            forget_client(user_id)
+            raise
+        finally:
+            try:
+                await _persist_refreshed(user_id, client)
+            except Exception as e:
+                print(f"⚠️ GOOGLE: refreshed token not saved for {user_id}: {e}")
@@ -0,0 +1,236 @@
+"""
+Declares every MongoDB index Shadow's queries rely on, creates them at
+startup (idempotent: create_index is a no-op for an identical index), and
+checks with explain() that the hot queries actually use one.
+
+Usage:
+    python -m app.indexes            # create missing indexes, then check plans
+    python -m app.indexes --check    # only check plans (exit code 1 if a query scans)
+"""
+import sys
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from app import metrics
+from app.database import (
+    users_collection,
+    events_collection,
+    notes_collection,
+    quick_notes_collection,
+    memory_fingerprints_collection,
+    vector_tombstones_collection,
+)
+
+# --- INDEX DECLARATIONS ---
+# Names are left to MongoDB (e.g. "user_id_1_created_at_-1__id_-1") so an index
+# that already exists under its default name is recognized, not duplicated.
+# Exception: the text index, whose name search.py refers to.
+
+# user_id prefix: every $text query is per user, so MongoDB only walks that
+# user's postings instead of every user's. Replaces the unprefixed "notes_text".
+TEXT_INDEX_NAME = "notes_user_text"
+TEXT_INDEX_FIELDS = [("raw_text", "text"), ("ai_metadata.summary", "text"), ("ai_metadata.tags", "text")]
+TEXT_INDEX_WEIGHTS = {"raw_text": 10, "ai_metadata.summary": 5, "ai_metadata.tags": 3}
+
+NOTES_TEXT_INDEX = IndexModel(
+    [("user_id", ASCENDING)] + TEXT_INDEX_FIELDS,
+    name=TEXT_INDEX_NAME, weights=TEXT_INDEX_WEIGHTS, default_language="english"
+)
+
+INDEXES = {
+    notes_collection: [
+        # Timeline pages (keyset), insights' last 10 notes, daily-recap logs
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # "Is there already a Daily Recap today?"
+        IndexModel([("user_id", ASCENDING), ("ai_metadata.stream_type", ASCENDING), ("created_at", DESCENDING)]),
+        # Startup recovery of write-behind entries; only pending notes are indexed
+        IndexModel([("analysis_status", ASCENDING)],
+                   partialFilterExpression={"analysis_status": "pending"}),
+        # Repeats of a canonical memory (dedup.promote_duplicate); most notes have none
+        IndexModel([("duplicate_of", ASCENDING)], sparse=True),
+        NOTES_TEXT_INDEX,
+    ],
+    events_collection: [
+        # Upcoming events and /events/range windows (keyset on start)
+        IndexModel([("user_id", ASCENDING), ("start", ASCENDING), ("_id", ASCENDING)]),
+        # Calendar sync: "have we stored this Google event already?"
+        IndexModel([("user_id", ASCENDING), ("google_id", ASCENDING)]),
+    ],
+    quick_notes_collection: [
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)]),
+        # Deleting a workspace
+        IndexModel([("user_id", ASCENDING), ("workspace", ASCENDING)]),
+    ],
+    users_collection: [
+        # Login / registration
+        IndexModel([("email", ASCENDING)]),
+        # Insight cooldown is keyed by a user_id field (not _id)
+        IndexModel([("user_id", ASCENDING)], sparse=True),
+        # Background calendar sync: next due user
+        IndexModel([("calendar_sync.next_sync_at", ASCENDING)]),
+    ],
+    memory_fingerprints_collection: [
+        IndexModel([("user_id", ASCENDING), ("bands", ASCENDING)]),
+    ],
+    vector_tombstones_collection: [
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)]),
+    ],
+}
+
+async def ensure_text_index(collection=notes_collection):
+    """
+    A collection can only have one text index: drops any other one (e.g. the
+    old unprefixed "notes_text") before creating NOTES_TEXT_INDEX.
+    """
+    async for index in collection.list_indexes():
+        if "textIndexVersion" in index and index["name"] != TEXT_INDEX_NAME:
+            print(f"📇 INDEX: dropping {collection.name}.{index['name']} (replaced by {TEXT_INDEX_NAME})")
+            await collection.drop_index(index["name"])
+    await collection.create_indexes([NOTES_TEXT_INDEX])
+
+async def ensure_indexes() -> int:
+    """
+    Creates every declared index. Returns how many could not be created
+    (e.g. an index with the same key but other options already exists).
+    """
+    failed = 0
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                if model is NOTES_TEXT_INDEX:
+                    await ensure_text_index(collection)
+                else:
+                    await collection.create_indexes([model])
+            except OperationFailure as e:
+                failed += 1
+                print(f"⚠️ INDEX: {collection.name}.{model.document['name']} not created: {e}")
+    metrics.set_gauge("db.index_failures", failed)
+    return failed
+
+# --- QUERY PLAN CHECKS ---
+# One entry per hot query shape: (name, collection, filter, sort). Values are
+# placeholders; only the shape matters to the planner.
+
+def hot_queries():
+    user_id, today = "index-check", datetime.now(timezone.utc)
+    return [
+        ("entries.list", notes_collection,
+         {"user_id": user_id}, [("created_at", -1), ("_id", -1)]),
+        ("entries.insight_history", notes_collection,
+         {"user_id": user_id}, [("created_at", -1)]),
+        ("entries.daily_recap_exists", notes_collection,
+         {"user_id": user_id, "ai_metadata.stream_type": "Daily Recap", "created_at": {"$gte": today}}, None),
+        ("entries.daily_recap_logs", notes_collection,
+         {"user_id": user_id, "created_at": {"$gte": today}, "ai_metadata.stream_type": {"$ne": "Daily Recap"}},
+         [("created_at", 1)]),
+        ("entries.keyword_search", notes_collection,
+         {"user_id": user_id, "$text": {"$search": "index check"}}, None),
+        ("ingest.recover_pending", notes_collection,
+         {"analysis_status": "pending", "created_at": {"$lt": today},
+          "$or": [{"analysis_claimed_until": None}, {"analysis_claimed_until": {"$lte": today}}]},
+         [("created_at", 1)]),
+        ("dedup.promote_duplicate", notes_collection,
+         {"duplicate_of": "index-check"}, [("created_at", 1)]),
+        ("events.upcoming", events_collection,
+         {"$or": [{"user_id": user_id, "start": {"$gte": today, "$lt": today}, "end": {"$gt": today}},
+                  {"user_id": user_id, "start": None, "date": {"$gte": "index-check"}}]},
+         [("start", 1), ("_id", 1)]),
+        ("events.range", events_collection,
+         {"user_id": user_id, "start": {"$gte": today, "$lt": today}, "end": {"$gt": today}},
+         [("start", 1), ("_id", 1)]),
+        ("calendar.sync_lookup", events_collection,
+         {"user_id": user_id, "google_id": "index-check"}, None),
+        ("quick_notes.list", quick_notes_collection,
+         {"user_id": user_id}, [("updated_at", -1), ("_id", -1)]),
+        ("quick_notes.delete_workspace", quick_notes_collection,
+         {"user_id": user_id, "workspace": "index-check"}, None),
+        ("users.login", users_collection,
+         {"email": "index-check@example.com"}, None),
+        ("users.by_id", users_collection,
+         {"_id": ObjectId()}, None),
+        ("users.insight_cooldown", users_collection,
+         {"user_id": user_id}, None),
+        ("calendar_scheduler.claim_due", users_collection,
+         {"google_token": {"$exists": True}, "calendar_sync.next_sync_at": {"$lte": today}},
+         [("calendar_sync.next_sync_at", 1)]),
+        ("dedup.simhash_candidates", memory_fingerprints_collection,
+         {"user_id": user_id, "bands": {"$in": [1, 2, 3]}}, None),
+        ("vector_store.tombstones", vector_tombstones_collection,
+         {"user_id": user_id}, None),
+        ("vector_sweep.expire_tombstones", vector_tombstones_collection,
+         {"created_at": {"$lt": today}}, None),
+    ]
+
+def plan_stages(explain: dict) -> set:
+    """
+    Every stage name in the winning plan (classic and SBE explain layouts).
+    """
+    stages = set()
+    def walk(node):
+        if isinstance(node, dict):
+            if isinstance(node.get("stage"), str):
+                stages.add(node["stage"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+    walk(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    return stages
+
+async def explain_query(collection, query: dict, sort=None) -> set:
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    return plan_stages(await cursor.explain())
+
+async def assert_uses_index(collection, query: dict, sort=None):
+    """
+    For tests: fails if the query would scan the whole collection.
+    """
+    stages = await explain_query(collection, query, sort)
+    assert "COLLSCAN" not in stages, f"{collection.name} query {query} scans the collection: {sorted(stages)}"
+
+async def check_query_plans(verbose: bool = False) -> list:
+    """
+    explain()s every hot query; logs a warning for each one that scans.
+    Returns the names of the scanning queries.
+    """
+    scanning = []
+    for name, collection, query, sort in hot_queries():
+        try:
+            stages = await explain_query(collection, query, sort)
+        except OperationFailure as e:
+            # e.g. $text without a text index
+            scanning.append(name)
+            print(f"⚠️ QUERY PLAN: {name} cannot run: {e}")
+            continue
+        if "COLLSCAN" in stages:
+            scanning.append(name)
+            print(f"⚠️ QUERY PLAN: {name} scans {collection.name} ({' > '.join(sorted(stages))})")
+        elif verbose:
+            print(f"✅ QUERY PLAN: {name}: {', '.join(sorted(stages))}")
+    metrics.set_gauge("db.scanning_queries", len(scanning))
+    return scanning
+
+async def _main(args) -> int:
+    if not args.check:
+        failed = await ensure_indexes()
+        print(f"📇 INDEXES: {sum(len(m) for m in INDEXES.values()) - failed} ensured, {failed} failed")
+    scanning = await check_query_plans(verbose=True)
+    return 1 if scanning else 0
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.indexes", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="Only explain() the hot queries; create nothing")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args)))
+
+if __name__ == "__main__":
+    main()
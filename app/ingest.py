@@ -0,0 +1,371 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from bson import ObjectId
+
+from app import metrics
+from app.versioning import version_filter, bump_version
+from app.config import (
+    INGEST_WORKERS,
+    INGEST_QUEUE_SIZE,
+    INGEST_MAX_ATTEMPTS,
+    INGEST_BACKOFF_SECONDS,
+    INGEST_CLAIM_SECONDS,
+    INSTANCE_ID,
+    EMBED_BATCH_SIZE,
+    DEDUP_ENABLED,
+)
+from app.database import notes_collection
+from app.models import AIAnalysisResult
+from app.ai_engine import analyze_text
+from app.vector_store import save_note_to_vector_db, forget_notes, write_buffer
+from app.dedup import (
+    find_duplicate, merge_into, record_fingerprint, forget_fingerprint, release_duplicate, promote_duplicate
+)
+from app.search import notes_changed
+
+# --- BACKGROUND INGESTION PIPELINE ---
+# POST /entries stores the raw note with analysis_status="pending" and returns.
+# A small pool of workers then runs the Gemini analysis + conditional embedding
+# and patches the document. Clients poll GET /entries/{id}/status.
+
+_queue: Optional[asyncio.Queue] = None
+_workers = []
+# Notes waiting on the embedding write buffer (see process_entry)
+_handoffs = set()
+_handoff_slots = asyncio.Semaphore(EMBED_BATCH_SIZE * 4)
+
+# --- 1. SHARED RULES (used by the inline path too) ---
+
+def apply_manual_override(ai_response: AIAnalysisResult, manual_stream_type: Optional[str]) -> AIAnalysisResult:
+    # Override AI if user manually selected a type
+    if manual_stream_type and manual_stream_type != "Auto":
+        print(f"🔧 MANUAL OVERRIDE: Changing {ai_response.stream_type} -> {manual_stream_type.upper()}")
+        # Force the type (Convert to UPPERCASE to match backend logic like "IDEA")
+        ai_response.stream_type = manual_stream_type.upper()
+    return ai_response
+
+def should_embed(stream_type: str, impact_score: int) -> bool:
+    # Case 1: Ideas are ALWAYS saved
+    if stream_type == "IDEA":
+        return True
+    # Case 2: Rants are saved ONLY if they are significant
+    if stream_type == "RANT" and impact_score > 6:
+        return True
+    return False
+
+def embed_filter() -> dict:
+    """
+    should_embed() as a MongoDB query (for backfills over notes_collection).
+    """
+    return {
+        "analysis_status": {"$nin": ["pending", "failed"]},
+        "duplicate_of": {"$exists": False}, # merged into another memory (dedup.py)
+        "$or": [
+            {"ai_metadata.stream_type": "IDEA"},
+            {"ai_metadata.stream_type": "RANT", "ai_metadata.impact_score": {"$gt": 6}},
+        ],
+    }
+
+async def remember_note(note_id: str, text: str, user_id: str, date_str: str,
+                        impact_score: Optional[int] = None, raise_errors: bool = False,
+                        check_duplicates: bool = True, repeats: int = 0) -> Optional[str]:
+    """
+    Stores a qualifying note in the Vault, unless it's a near-duplicate of an
+    existing memory: then it's counted on that one instead (no new vector).
+    Returns the canonical note id when merged.
+    """
+    if DEDUP_ENABLED and check_duplicates:
+        try:
+            canonical = await find_duplicate(user_id, text)
+            if canonical and canonical != note_id and await merge_into(canonical, note_id, embed_filter()):
+                return canonical
+        except Exception as e:
+            print(f"⚠️ DEDUP: check failed for {note_id}, storing it normally: {e}")
+
+    stored = await save_note_to_vector_db(
+        note_id, text, user_id, date_str, raise_errors=raise_errors, impact_score=impact_score, repeats=repeats
+    )
+    if stored and DEDUP_ENABLED:
+        try:
+            await record_fingerprint(note_id, user_id, text)
+        except Exception as e:
+            print(f"⚠️ DEDUP: fingerprint not saved for {note_id}: {e}")
+    return None
+
+async def unlink_duplicates(note: dict):
+    """
+    Dedup bookkeeping for a note that stopped being a memory (deleted or
+    reclassified). A repeat is uncounted from its canonical memory; a
+    canonical memory hands its repeats to the oldest one, which is stored in
+    the Vault in its place. `note` needs _id, duplicate_of and recurrence.
+    """
+    try:
+        if note.get("duplicate_of"):
+            await release_duplicate(note["duplicate_of"], str(note["_id"]))
+            return
+        successor = await promote_duplicate(note, embed_filter())
+        if successor is None:
+            return
+        successor_id = str(successor["_id"])
+        await remember_note(
+            successor_id, successor["raw_text"], successor["user_id"],
+            successor["created_at"].strftime("%Y-%m-%d"),
+            impact_score=(successor.get("ai_metadata") or {}).get("impact_score"),
+            check_duplicates=False, # keep its repeats grouped under it
+            repeats=successor["recurrence"]["count"]
+        )
+    except Exception as e:
+        print(f"⚠️ DEDUP: repeats of {note['_id']} not re-linked: {e}")
+
+def pending_analysis(manual_stream_type: Optional[str]) -> AIAnalysisResult:
+    """
+    Placeholder metadata stored until the worker patches the real analysis.
+    """
+    stream_type = "Activity"
+    if manual_stream_type and manual_stream_type != "Auto":
+        stream_type = manual_stream_type.upper()
+    return AIAnalysisResult(
+        stream_type=stream_type,
+        summary="Processing...",
+        impact_score=0,
+        ai_comment="Shadow is analyzing...",
+        tags=[]
+    )
+
+def claim_fields(now: datetime) -> dict:
+    """
+    Marks a pending note as queued on this replica (see _recover_pending).
+    """
+    return {
+        "analysis_claimed_by": INSTANCE_ID,
+        "analysis_claimed_until": now + timedelta(seconds=INGEST_CLAIM_SECONDS),
+    }
+
+CLAIM_RELEASE = {"analysis_claimed_by": "", "analysis_claimed_until": ""}
+
+# --- 2. RETRY HELPER ---
+
+async def _with_retries(label: str, note_id: str, make_call):
+    """
+    Runs `make_call()` with exponential backoff + jitter.
+    Records the attempt count on the note so the client can see progress.
+    """
+    for attempt in range(1, INGEST_MAX_ATTEMPTS + 1):
+        try:
+            return await make_call()
+        except Exception as e:
+            metrics.incr(f"ingest.{label}_errors")
+            await notes_collection.update_one(
+                {"_id": ObjectId(note_id)},
+                {"$set": {"analysis_attempts": attempt, "analysis_error": str(e)}}
+            )
+            if attempt == INGEST_MAX_ATTEMPTS:
+                raise
+            delay = INGEST_BACKOFF_SECONDS * (2 ** (attempt - 1))
+            delay += random.uniform(0, delay / 2)
+            print(f"🔁 INGEST: {label} failed for {note_id} (attempt {attempt}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+# --- 3. THE JOB ---
+
+PATCH_ATTEMPTS = 3 # re-reads when the note changes under the final patch
+
+async def _fail(job: dict, error: Exception):
+    note_id = job["note_id"]
+    print(f"❌ INGEST FAILED for {note_id}: {error}")
+    metrics.incr("ingest.failed")
+    await notes_collection.update_one(
+        {"_id": ObjectId(note_id), "analysis_status": "pending"}, # never un-finish a done note
+        {"$set": {"analysis_status": "failed", "analysis_error": str(error)}, "$unset": CLAIM_RELEASE}
+    )
+
+async def _store_and_finish(job: dict, ai_response: AIAnalysisResult):
+    note_id = job["note_id"]
+    stored, merged_into, forgot = False, None, False
+    try:
+        # The user may change the type while the note is pending (PUT /entries
+        # records it as manual_stream_type). The patch only lands on the
+        # version we read, so such an edit is re-applied, never overwritten.
+        for _ in range(PATCH_ATTEMPTS):
+            note = await notes_collection.find_one(
+                {"_id": ObjectId(note_id), "analysis_status": "pending"},
+                {"version": 1, "manual_stream_type": 1}
+            )
+            if note is None:
+                # Deleted meanwhile, or finished by another replica (a stray
+                # vector is purged by the sweep)
+                metrics.incr("ingest.superseded")
+                return
+            ai_response = apply_manual_override(ai_response, note.get("manual_stream_type"))
+
+            # B. Conditional vector storage (The "Vault")
+            if should_embed(ai_response.stream_type, ai_response.impact_score):
+                if not stored:
+                    print(f"💎 VAULT: Saving {ai_response.stream_type} to Vector DB: '{job['raw_text'][:30]}...'")
+                    merged_into = await _with_retries(
+                        "embedding", note_id,
+                        lambda: remember_note(
+                            note_id, job["raw_text"], job["user_id"], job["date_str"],
+                            impact_score=ai_response.impact_score, raise_errors=True
+                        )
+                    )
+                    stored = True
+            elif stored:
+                # Reclassified by the user after we stored it
+                if merged_into:
+                    await release_duplicate(merged_into, note_id)
+                else:
+                    await forget_notes(job["user_id"], [note_id], bump=False)
+                    await forget_fingerprint(note_id)
+                stored, merged_into, forgot = False, None, True
+            else:
+                print(f"📉 VAULT: Skipping '{ai_response.stream_type}' (Low Signal/Activity).")
+
+            # C. Patch the document
+            result = await notes_collection.update_one(
+                {"_id": ObjectId(note_id), "analysis_status": "pending",
+                 **version_filter(note.get("version", 0))},
+                {
+                    "$set": {"ai_metadata": ai_response.model_dump(), "analysis_status": "done"},
+                    "$unset": {"analysis_error": "", **CLAIM_RELEASE},
+                    **bump_version(),
+                }
+            )
+            if result.modified_count:
+                break
+            metrics.incr("ingest.patch_conflicts")
+        else:
+            raise RuntimeError(f"Entry kept changing during analysis ({PATCH_ATTEMPTS} attempts)")
+        if not stored:
+            # New summary/tags for keyword recall (a vector write has bumped already)
+            await notes_changed(job["user_id"], memory_changed=forgot)
+        metrics.incr("ingest.done")
+    except Exception as e:
+        await _fail(job, e)
+    finally:
+        metrics.observe("ingest.end_to_end_seconds", time.time() - job["enqueued_at"])
+
+async def process_entry(job: dict):
+    started = time.perf_counter()
+    try:
+        # A. AI analysis (Activity vs. Rant vs. Idea)
+        with metrics.timed("ingest.analysis_seconds"):
+            ai_response = await _with_retries(
+                "analysis", job["note_id"],
+                lambda: analyze_text(job["raw_text"], raise_errors=True)
+            )
+        ai_response = apply_manual_override(ai_response, job.get("manual_stream_type"))
+    except Exception as e:
+        await _fail(job, e)
+        metrics.observe("ingest.end_to_end_seconds", time.time() - job["enqueued_at"])
+        return
+    finally:
+        metrics.observe("ingest.job_seconds", time.perf_counter() - started)
+
+    if write_buffer.running and should_embed(ai_response.stream_type, ai_response.impact_score):
+        # Hand the note to the write buffer and move on to the next job, so
+        # notes from several workers can share one embedding batch.
+        await _handoff_slots.acquire() # backpressure if the buffer falls behind
+        task = asyncio.create_task(_store_and_finish(job, ai_response))
+        _handoffs.add(task)
+        task.add_done_callback(_release_handoff)
+        return
+
+    await _store_and_finish(job, ai_response)
+
+def _release_handoff(task: asyncio.Task):
+    _handoffs.discard(task)
+    _handoff_slots.release()
+
+# --- 4. QUEUE + WORKERS ---
+
+async def enqueue_entry(note_id: str, raw_text: str, user_id: str,
+                        created_at: datetime, manual_stream_type: Optional[str] = None):
+    job = {
+        "note_id": note_id,
+        "raw_text": raw_text,
+        "user_id": user_id,
+        "date_str": created_at.strftime("%Y-%m-%d"),
+        "manual_stream_type": manual_stream_type,
+        "enqueued_at": time.time(),
+    }
+    if _queue is None:
+        # Workers not running (e.g. a script) -> process inline
+        await process_entry(job)
+        return
+    # Bounded queue: awaiting here applies backpressure when workers fall behind
+    await _queue.put(job)
+    metrics.set_gauge("ingest.queue_depth", _queue.qsize())
+
+async def _worker(n: int):
+    while True:
+        job = await _queue.get()
+        metrics.set_gauge("ingest.queue_depth", _queue.qsize())
+        try:
+            await process_entry(job)
+        finally:
+            _queue.task_done()
+
+async def _claim_pending(started_at: datetime) -> Optional[dict]:
+    """
+    Atomically takes one note left 'pending' before this process started
+    whose claim is free or expired (its replica died), or returns None.
+    """
+    now = datetime.now(timezone.utc)
+    return await notes_collection.find_one_and_update(
+        {
+            "analysis_status": "pending",
+            # Newer notes were queued by a live process (maybe this one)
+            "created_at": {"$lt": started_at},
+            "$or": [{"analysis_claimed_until": None}, {"analysis_claimed_until": {"$lte": now}}],
+        },
+        {"$set": claim_fields(now)},
+        projection={"raw_text": 1, "user_id": 1, "created_at": 1, "manual_stream_type": 1},
+        sort=[("created_at", 1)],
+    )
+
+async def _recover_pending(started_at: datetime):
+    """
+    Re-queues notes left 'pending' by a previous process (crash / redeploy).
+    Each note is claimed first, so concurrent replicas don't both take it.
+    """
+    count = 0
+    while (doc := await _claim_pending(started_at)) is not None:
+        await enqueue_entry(
+            str(doc["_id"]), doc["raw_text"], doc["user_id"],
+            doc.get("created_at") or datetime.now(timezone.utc),
+            doc.get("manual_stream_type")
+        )
+        count += 1
+    if count:
+        print(f"♻️ INGEST: Re-queued {count} pending entries")
+
+async def start_ingest_workers():
+    global _queue
+    _queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    for n in range(INGEST_WORKERS):
+        _workers.append(asyncio.create_task(_worker(n)))
+    print(f"⚙️ INGEST: Started {INGEST_WORKERS} workers")
+    # In the background so a big backlog can't hold up startup
+    _workers.append(asyncio.create_task(_recover_pending(datetime.now(timezone.utc))))
+
+async def stop_ingest_workers(timeout: float = 30.0):
+    global _queue
+    if _queue is None:
+        return
+    # Drain what we can; anything left stays 'pending' in Mongo for next boot
+    try:
+        await asyncio.wait_for(_queue.join(), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"⚠️ INGEST: Shutdown with {_queue.qsize()} jobs still queued")
+    if _handoffs:
+        # Their vectors are in the write buffer; wait for the final flush
+        await asyncio.wait(set(_handoffs), timeout=timeout)
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
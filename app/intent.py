@@ -0,0 +1,94 @@
+import re
+import asyncio
+from typing import Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from app.llm_registry import get_llm
+from app.config import INTENT_LLM_TIMEOUT_SECONDS
+
+# --- CHAT INTENT ROUTER ---
+# Decides what a chat turn needs before we pay for anything:
+#   "schedule"  -> straight to the tool-calling generate node (no retrieval)
+#   "smalltalk" -> straight to generate (no retrieval)
+#   "memory"    -> retrieve from the vector store, then generate
+# Cheap regex heuristics first; Gemini only for messages they can't place.
+
+INTENTS = ["schedule", "smalltalk", "memory"]
+
+# Only imperative creation counts: "what's on my calendar tomorrow?" is a lookup,
+# and the schedule route skips retrieval and binds the create-event tool.
+_SCHEDULE_COMMAND = re.compile(
+    r"^\s*(please\s+|(can|could|would|will) you\s+(please\s+)?|let'?s\s+|i (need|want) to\s+|i'?d like to\s+)?"
+    r"(schedule|book|reschedule|remind me (?!what|when|where|why|how|who|which|if|whether)|set up|"
+    r"(add|create) (an? |my |the )?(event|meeting|appointment|reminder)|(add|put) .+ (on|in|to) my calendar)\b",
+    re.IGNORECASE
+)
+_QUESTION = re.compile(
+    r"^\s*(did|do|does|what('?s)?|when|where|which|who|is|are|was|were|have|has|am|how|any)\b|\?\s*$",
+    re.IGNORECASE
+)
+_TIME_SIGNAL = re.compile(
+    r"\b(\d{1,2}(:\d{2})?\s*(am|pm)|\d{1,2}:\d{2}|today|tonight|tomorrow|"
+    r"(next |this )?(mon|tues|wednes|thurs|fri|satur|sun)day|next week|"
+    r"\d{4}-\d{2}-\d{2}|at noon|at midnight)\b",
+    re.IGNORECASE
+)
+_SMALLTALK = re.compile(
+    r"^\s*(hi|hello|hey|yo|thanks|thank you|thx|ok|okay|cool|nice|great|bye|"
+    r"good (morning|afternoon|evening|night)|how are you|who are you|what can you do)\b",
+    re.IGNORECASE
+)
+_MEMORY = re.compile(
+    r"\b(remember|recall|remind me what|what did i|did i|have i|my (ideas?|notes?|rants?|logs?|thoughts?)|"
+    r"last (week|month|time)|recent(ly)?|in the past|history|pattern|usually)\b",
+    re.IGNORECASE
+)
+
+def classify_intent_heuristic(question: str) -> Optional[str]:
+    """
+    Returns an intent, or None when the message is ambiguous.
+    """
+    if _SCHEDULE_COMMAND.search(question) and _TIME_SIGNAL.search(question):
+        return "schedule"
+    if _MEMORY.search(question):
+        return "memory"
+    if _SMALLTALK.search(question) and len(question.split()) <= 6:
+        return "smalltalk"
+    if _QUESTION.search(question):
+        return "memory" # lookups ("is anything on tomorrow?") never create events
+    return None
+
+intent_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "Classify the user's message to a personal assistant. Answer with exactly ONE word:\n"
+     "SCHEDULE - they want to create a calendar event or reminder.\n"
+     "MEMORY - they ask about their own past notes, ideas, logs, feelings or habits.\n"
+     "SMALLTALK - greetings, thanks, or questions about the assistant itself."),
+    ("human", "{question}"),
+])
+
+async def classify_intent(question: str, use_llm: bool = True) -> Tuple[str, str]:
+    """
+    Returns (intent, source) where source is "heuristic", "llm" or "default".
+    Falls back to "memory" (retrieve + generate, the old behaviour) when unsure.
+    """
+    intent = classify_intent_heuristic(question)
+    if intent:
+        return intent, "heuristic"
+
+    if use_llm:
+        try:
+            chain = intent_prompt | get_llm(temperature=0.0) | StrOutputParser()
+            answer = await asyncio.wait_for(chain.ainvoke({"question": question}), INTENT_LLM_TIMEOUT_SECONDS)
+            answer = answer.strip().strip(".").lower()
+            if answer in INTENTS:
+                return answer, "llm"
+            print(f"⚠️ Intent router got '{answer}', defaulting to memory.")
+        except asyncio.TimeoutError:
+            print(f"⚠️ Intent router timed out after {INTENT_LLM_TIMEOUT_SECONDS}s, defaulting to memory.")
+        except Exception as e:
+            print(f"❌ Intent router error: {e}")
+
+    return "memory", "default"
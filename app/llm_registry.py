@@ -0,0 +1,66 @@
+import os
+import threading
+from typing import Dict, Sequence, Tuple
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.config import LLM_MODEL
+
+# --- LLM CLIENT REGISTRY ---
+# One place that builds Gemini chat clients. Clients are created once and
+# reused, keyed by (model, temperature, tools):
+# - every temperature of a model is a shallow copy of the first instance, so
+#   they all share its underlying API client (and its HTTP connection pool);
+# - tool-bound variants (`bind_tools`) are built once instead of per request.
+
+_lock = threading.Lock()
+_base_clients: Dict[str, ChatGoogleGenerativeAI] = {}
+_clients: Dict[Tuple, object] = {}
+
+def _base_llm(model: str, temperature: float) -> ChatGoogleGenerativeAI:
+    root = _base_clients.get(model)
+    if root is None:
+        root = _base_clients[model] = ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            google_api_key=os.getenv("GOOGLE_API_KEY")
+        )
+    if root.temperature == temperature:
+        return root
+    # model_copy skips re-validation, so the API client object is shared
+    return root.model_copy(update={"temperature": temperature})
+
+def get_llm(temperature: float = 0.7, tools: Sequence = (), model: str = LLM_MODEL):
+    """
+    Returns a cached chat model (tool-bound if `tools` is given).
+    Safe to call on every request.
+    """
+    key = (model, temperature, tuple(tool.name for tool in tools))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            base_key = (model, temperature, ())
+            llm = _clients.get(base_key)
+            if llm is None:
+                llm = _clients[base_key] = _base_llm(model, temperature)
+            client = _clients[key] = llm.bind_tools(list(tools)) if tools else llm
+            print(f"🔌 LLM Registry: created {model} (temp={temperature}, tools={list(key[2])})")
+    return client
+
+async def warm_llms(specs: Sequence[Tuple[float, Sequence]], ping: bool = False):
+    """
+    Builds the given (temperature, tools) clients up front so the first
+    request doesn't pay for it. `ping=True` also sends a tiny request to
+    open the HTTPS connection (costs a few tokens).
+    """
+    for temperature, tools in specs:
+        get_llm(temperature, tools)
+    if ping:
+        try:
+            await get_llm(specs[0][0]).ainvoke("ping")
+            print("🔥 LLM Registry: connection warmed")
+        except Exception as e:
+            print(f"⚠️ LLM warm-up ping failed: {e}")
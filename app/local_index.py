@@ -0,0 +1,415 @@
+import os
+import re
+import json
+import base64
+import threading
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+from app.vector_backends import VectorBackend, to_document
+
+# --- LOCAL VECTOR INDEX (VECTOR_BACKEND=local) ---
+# Embedded alternative to Pinecone: no network hop, works offline.
+# - One partition per user (a user's query never touches anyone else's data).
+# - Each partition is a contiguous float32 matrix of L2-normalized vectors,
+#   so a brute-force search is a single matrix-vector product.
+# - Partitions live on disk as a .npy + .json snapshot plus an append-only
+#   log of the writes since (log.jsonl). A write appends a few KB to the log;
+#   the snapshot is only rewritten (and the log truncated) once the log has
+#   grown past half the snapshot, or on flush / eviction. Loading replays
+#   the log over the snapshot; replaying an entry twice is harmless.
+# - Cold users are opened memory-mapped (nothing is read until queried); a
+#   bounded LRU of hot users is kept in RAM.
+# - Users with many memories get an IVF index (spherical k-means lists,
+#   search only the `nprobe` closest lists). Writes patch the lists in place
+#   (a row is re-assigned to its closest centroid); the centroids are only
+#   retrained once the partition has grown well past what they were trained on.
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def _encode_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+def _decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+# Never compact a log smaller than this (small partitions: plain appends)
+LOG_MIN_COMPACT_BYTES = 1 << 20
+# Retrain the IVF centroids once the partition is this many times its training size
+IVF_RETRAIN_GROWTH = 4
+
+# --- 1. IVF ---
+
+class IVFIndex:
+    def __init__(self, matrix: np.ndarray, nlist: Optional[int] = None, iterations: int = 8, seed: int = 0):
+        n = len(matrix)
+        self.trained_size = n
+        self.nlist = nlist or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+
+        # Train centroids on a sample (spherical k-means: dot product = cosine)
+        sample = np.asarray(matrix[rng.choice(n, size=min(n, self.nlist * 64), replace=False)])
+        centroids = sample[rng.choice(len(sample), size=self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=self.nlist)
+            empty = counts == 0
+            sums[empty] = centroids[empty] # keep empty clusters where they were
+            centroids = _normalize_rows(sums)
+        self.centroids = centroids.astype(np.float32)
+
+        # Assign every row (chunked to bound memory), then group rows by list
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 8192):
+            assign[start:start + 8192] = np.argmax(matrix[start:start + 8192] @ self.centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        self.lists = [order[offsets[c]:offsets[c + 1]].copy() for c in range(self.nlist)]
+        self.assign = assign.tolist() # row -> list
+
+    def _closest(self, vector: np.ndarray) -> int:
+        return int(np.argmax(self.centroids @ vector))
+
+    def add(self, row: int, vector: np.ndarray):
+        # Appended rows only (row == current size)
+        c = self._closest(vector)
+        self.lists[c] = np.append(self.lists[c], row)
+        self.assign.append(c)
+
+    def move(self, row: int, vector: np.ndarray):
+        old, new = self.assign[row], self._closest(vector)
+        if old != new:
+            self.lists[old] = self.lists[old][self.lists[old] != row]
+            self.lists[new] = np.append(self.lists[new], row)
+            self.assign[row] = new
+
+    def swap_remove(self, row: int):
+        """
+        Mirrors _Partition.delete: `row` goes away and the last row takes its place.
+        """
+        last = len(self.assign) - 1
+        c = self.assign[row]
+        self.lists[c] = self.lists[c][self.lists[c] != row]
+        if row != last:
+            c = self.assign[last]
+            self.lists[c][self.lists[c] == last] = row
+            self.assign[row] = c
+        self.assign.pop()
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, self.nlist)
+        lists = _top_k(self.centroids @ query, nprobe)
+        return np.concatenate([self.lists[c] for c in lists])
+
+# --- 2. ONE USER'S PARTITION ---
+
+class _Partition:
+    def __init__(self, directory: str):
+        self.vectors_path = os.path.join(directory, "vectors.npy")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.log_path = os.path.join(directory, "log.jsonl")
+        self.directory = directory
+        self.lock = threading.RLock()
+        self.ids: List[str] = []
+        self.metadatas: List[dict] = []
+        self.id_to_row = {}
+        self._data: Optional[np.ndarray] = None # may be a read-only memmap
+        self.n = 0
+        self.ivf: Optional[IVFIndex] = None
+        self.users = 0 # callers holding this partition (LocalVectorIndex._use)
+        self.dirty = False # changes not in the snapshot (they are in the log)
+        self.log_bytes = 0
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._data[:self.n]
+
+    def load(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.ids = meta["ids"]
+            self.metadatas = meta["metadatas"]
+            self.id_to_row = {vector_id: row for row, vector_id in enumerate(self.ids)}
+            self.n = len(self.ids)
+            # Memory-mapped: pages are only read from disk when queried
+            self._data = np.load(self.vectors_path, mmap_mode="r")
+        if os.path.exists(self.log_path):
+            self._replay()
+
+    def _replay(self):
+        with open(self.log_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break # torn last line from a crash mid-append
+                if entry["op"] == "upsert":
+                    self.upsert([entry["id"]], _decode_vector(entry["vector"])[None, :], [entry["metadata"]])
+                elif entry["op"] == "delete":
+                    self.delete(entry["ids"])
+                elif entry["op"] == "metadata":
+                    self.update_metadata(entry["id"], entry["metadata"])
+        self.log_bytes = os.path.getsize(self.log_path)
+
+    def append_log(self, entries: List[dict]):
+        os.makedirs(self.directory, exist_ok=True)
+        data = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with open(self.log_path, "a") as f:
+            f.write(data)
+        self.log_bytes += len(data)
+
+    def needs_compaction(self) -> bool:
+        # Rewriting the snapshot costs ~its size: do it once the log is comparable
+        snapshot_bytes = self.n * (self._data.shape[1] * 4 if self._data is not None else 0)
+        return self.log_bytes > max(LOG_MIN_COMPACT_BYTES, snapshot_bytes // 2)
+
+    def save(self):
+        """
+        Writes a full snapshot and truncates the log.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_vectors = self.vectors_path + ".tmp"
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.matrix))
+        tmp_meta = self.meta_path + ".tmp"
+        with open(tmp_meta, "w") as f:
+            json.dump({"ids": self.ids, "metadatas": self.metadatas}, f)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_meta, self.meta_path)
+        # Only now: until the snapshot is in place, the log is the durable copy
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self.dirty = False
+        self.log_bytes = 0
+
+    def _reserve(self, dim: int, extra: int):
+        """
+        Makes sure we own a writable in-RAM buffer with room for `extra` rows.
+        Grows by doubling so appends stay amortized O(1).
+        """
+        capacity = 0 if self._data is None else len(self._data)
+        writable = isinstance(self._data, np.ndarray) and not isinstance(self._data, np.memmap)
+        if writable and self.n + extra <= capacity:
+            return
+        new_capacity = max(16, 2 * (self.n + extra))
+        buffer = np.zeros((new_capacity, dim), dtype=np.float32)
+        if self.n:
+            buffer[:self.n] = self.matrix
+        self._data = buffer
+
+    def upsert(self, ids, vectors: np.ndarray, metadatas):
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        self._reserve(vectors.shape[1], len(ids))
+        for vector_id, vector, metadata in zip(ids, vectors, metadatas):
+            row = self.id_to_row.get(vector_id)
+            if row is None:
+                row = self.n
+                self.ids.append(vector_id)
+                self.metadatas.append(metadata)
+                self.id_to_row[vector_id] = row
+                self.n += 1
+                if self.ivf is not None:
+                    self.ivf.add(row, vector)
+            else:
+                self.metadatas[row] = metadata
+                if self.ivf is not None:
+                    self.ivf.move(row, vector) # it moved in space
+            self._data[row] = vector
+        self.dirty = True
+
+    def delete(self, ids) -> bool:
+        rows = [self.id_to_row[i] for i in ids if i in self.id_to_row]
+        if not rows:
+            return False
+        self._reserve(self._data.shape[1], 0)
+        # Swap-remove keeps the matrix contiguous
+        for row in sorted(rows, reverse=True):
+            last = self.n - 1
+            removed_id = self.ids[row]
+            if self.ivf is not None:
+                self.ivf.swap_remove(row)
+            if row != last:
+                self._data[row] = self._data[last]
+                self.ids[row] = self.ids[last]
+                self.metadatas[row] = self.metadatas[last]
+                self.id_to_row[self.ids[row]] = row
+            self.ids.pop()
+            self.metadatas.pop()
+            del self.id_to_row[removed_id]
+            self.n -= 1
+        self.dirty = True
+        return True
+
+    def update_metadata(self, vector_id: str, metadata: dict) -> bool:
+        row = self.id_to_row.get(vector_id)
+        if row is None:
+            return False
+        self.metadatas[row] = {**self.metadatas[row], **metadata}
+        self.dirty = True
+        return True
+
+    def query(self, vector: np.ndarray, k: int, filter: Optional[dict], ivf_threshold: int, nprobe: int):
+        if self.n == 0:
+            return []
+        query = vector / (np.linalg.norm(vector) or 1.0)
+        matrix = self.matrix
+
+        candidates = None
+        if filter:
+            candidates = np.array([
+                row for row, metadata in enumerate(self.metadatas)
+                if all(metadata.get(key) == value for key, value in filter.items())
+            ], dtype=np.int64)
+        elif self.n >= ivf_threshold:
+            if self.ivf is None or self.n > IVF_RETRAIN_GROWTH * self.ivf.trained_size:
+                self.ivf = IVFIndex(matrix)
+            candidates = self.ivf.candidates(query, nprobe)
+
+        if candidates is None:
+            scores = matrix @ query
+            rows = _top_k(scores, k)
+            row_scores = scores[rows]
+        else:
+            if len(candidates) == 0:
+                return []
+            scores = matrix[candidates] @ query
+            top = _top_k(scores, k)
+            rows, row_scores = candidates[top], scores[top]
+
+        return [(self.ids[r], self.metadatas[r], float(s), matrix[r]) for r, s in zip(rows, row_scores)]
+
+# --- 3. THE BACKEND ---
+
+class LocalVectorIndex(VectorBackend):
+    name = "local"
+
+    def __init__(self, root: str, hot_users: int = 64, ivf_threshold: int = 20000, nprobe: int = 8):
+        self.root = root
+        self.hot_users = hot_users
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._partitions: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _directory(self, user_id: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9_-]", "_", user_id))
+
+    @contextmanager
+    def _use(self, user_id: str):
+        """
+        The user's partition, pinned: it can't be evicted (and later reopened
+        as a second instance on the same log) while the caller works on it.
+        """
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is not None:
+                self._partitions.move_to_end(user_id)
+            else:
+                partition = _Partition(self._directory(user_id))
+                partition.load()
+                self._partitions[user_id] = partition
+            partition.users += 1
+            self._evict()
+        try:
+            yield partition
+        finally:
+            with self._lock:
+                partition.users -= 1
+                self._evict() # what was skipped while pinned
+
+    def _evict(self):
+        # Least-recently-used unpinned users (flushed first; reopened mmap later).
+        # Pinned ones are skipped, so the cache can briefly exceed hot_users.
+        excess = len(self._partitions) - self.hot_users
+        for user_id, partition in list(self._partitions.items()):
+            if excess <= 0:
+                break
+            if partition.users:
+                continue
+            del self._partitions[user_id]
+            with partition.lock:
+                if partition.dirty:
+                    partition.save()
+            excess -= 1
+
+    def _write(self, partition: _Partition, entries: List[dict]):
+        # Durable as soon as it is in the log; the snapshot catches up later
+        partition.append_log(entries)
+        if partition.needs_compaction():
+            partition.save()
+
+    def upsert(self, user_id, ids, vectors, metadatas):
+        metadatas = [{**m, "user_id": user_id} for m in metadatas]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._use(user_id) as partition, partition.lock:
+            partition.upsert(ids, vectors, metadatas)
+            self._write(partition, [
+                {"op": "upsert", "id": vector_id, "vector": _encode_vector(vector), "metadata": metadata}
+                for vector_id, vector, metadata in zip(ids, vectors, metadatas)
+            ])
+
+    def _search(self, user_id, vector, k, filter):
+        filter = {key: value for key, value in (filter or {}).items() if key != "user_id"}
+        with self._use(user_id) as partition, partition.lock:
+            return [
+                (vector_id, metadata, score, np.array(row)) # copy: the buffer may grow/mutate
+                for vector_id, metadata, score, row in partition.query(
+                    np.asarray(vector, dtype=np.float32), k, filter, self.ivf_threshold, self.nprobe
+                )
+            ]
+
+    def query(self, user_id, vector, k=5, filter=None):
+        return [
+            (to_document(vector_id, metadata), score)
+            for vector_id, metadata, score, _ in self._search(user_id, vector, k, filter)
+        ]
+
+    def query_with_vectors(self, user_id, vector, k=5, filter=None):
+        return [
+            (to_document(vector_id, metadata), score, row)
+            for vector_id, metadata, score, row in self._search(user_id, vector, k, filter)
+        ]
+
+    def delete(self, user_id, ids):
+        ids = list(ids)
+        with self._use(user_id) as partition, partition.lock:
+            if partition.delete(ids):
+                self._write(partition, [{"op": "delete", "ids": ids}])
+
+    def update_metadata(self, user_id, vector_id, metadata):
+        with self._use(user_id) as partition, partition.lock:
+            if partition.update_metadata(vector_id, metadata):
+                self._write(partition, [{"op": "metadata", "id": vector_id, "metadata": metadata}])
+
+    def flush(self):
+        with self._lock:
+            partitions = list(self._partitions.values())
+        for partition in partitions:
+            with partition.lock:
+                if partition.dirty:
+                    partition.save()
+
+    def list_user_ids(self):
+        # Directory names are the (sanitized) user ids; ObjectId strings are unchanged
+        return [name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))]
+
+    def list_ids(self, user_id, batch_size=100):
+        with self._use(user_id) as partition, partition.lock:
+            ids = list(partition.ids)
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
@@ -1,10 +1,28 @@
-from fastapi import FastAPI, Response
+import json
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from bson import ObjectId
 
-from app.database import client, ping_db, users_collection
+from app.database import client, ping_db, users_collection, quick_notes_collection
 from app.models import ChatRequest
 from app.ai_graph import shadow_graph
+from app.ai_engine import analysis_cache, priority_cache
+from app.priority_classifier import train_from_db
+from app.config import PRIORITY_LOCAL_TIER, LLM_WARMUP_PING, EMBED_WRITE_BUFFER, INDEX_PLAN_CHECK
+from app.llm_registry import warm_llms
+from app.tools import create_event_tool
+from app.vector_store import shutdown_vector_pool, embed_query, write_buffer
+from app.answer_cache import answer_cache
+from app.intent import classify_intent_heuristic
+from app.ingest import start_ingest_workers, stop_ingest_workers
+from app.vector_sweep import start_vector_sweep, stop_vector_sweep
+from app.calendar_scheduler import start_calendar_scheduler, stop_calendar_scheduler
+from app.migrate_event_times import start_event_time_backfill, stop_event_time_backfill
+from app.indexes import ensure_indexes, check_query_plans
+from app.date_parsing import warm_date_parser, shutdown_date_pool
+from app import metrics
 
 # Import Routers
 from app.routers import user, events, entries, notes
@@ -28,6 +46,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"], # keyset pagination (pagination.py)
 )
 
 # Connect Routers
@@ -39,6 +58,34 @@ app.include_router(notes.router)
 @app.on_event("startup")
 async def startup_db_client():
     await ping_db()
+    await warm_llms([(0.7, ()), (0.3, [create_event_tool])], ping=LLM_WARMUP_PING)
+    await warm_date_parser()
+    await ensure_indexes()
+    if INDEX_PLAN_CHECK:
+        await check_query_plans()
+    await analysis_cache.prepare()
+    await priority_cache.prepare()
+    if PRIORITY_LOCAL_TIER:
+        await train_from_db(quick_notes_collection)
+    if EMBED_WRITE_BUFFER:
+        write_buffer.start()
+    await start_ingest_workers()
+    await start_vector_sweep()
+    await start_calendar_scheduler()
+    await start_event_time_backfill()
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    await stop_vector_sweep()
+    await stop_calendar_scheduler()
+    await stop_event_time_backfill()
+    # Finish queued entry analyses first (they may still write vectors)
+    await stop_ingest_workers()
+    # Flush notes still waiting for an embedding batch
+    await write_buffer.stop()
+    # Let in-flight vector writes finish before the process exits
+    await shutdown_vector_pool()
+    shutdown_date_pool()
 
 @app.get("/")
 async def root():
@@ -46,8 +93,7 @@ async def root():
 
 # --- CHAT & GRAPH (Kept in Main) ---
 
-@app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def build_graph_inputs(request: ChatRequest) -> dict:
     # 1. Fetch User Profile
     user_doc = await users_collection.find_one({"_id": ObjectId(request.user_id)})
     recent_msgs = request.history[-5:] 
@@ -65,25 +111,150 @@ async def chat_endpoint(request: ChatRequest):
     else:
         profile_str = "Standard User"
 
+    return {
+        "question": request.message,
+        "user_id": request.user_id,
+        "user_profile": profile_str,
+        "context": "", 
+        "answer": "",   
+        "image": request.image,
+        "chat_history": history_str,
+        "intent": "",
+        "started_at": 0.0,
+        "memory_version": (user_doc or {}).get("memory_version", 0),
+        "tool_called": False,
+        "persona": ((user_doc or {}).get("profile") or {}).get("shadow_type", "")
+    }
+
+def answer_scope(inputs: dict) -> str:
+    # Everything besides the question + memories that shapes the answer:
+    # the persona and the date the prompt injects ("what's on today?")
+    return f"{inputs['user_profile']}\n{datetime.now().strftime('%Y-%m-%d')}"
+
+async def check_answer_cache(inputs: dict):
+    """
+    Returns (cached answer or None, question embedding or None).
+    Only plain-text memory questions that open a conversation are
+    cacheable: follow-ups are answered in the light of the chat history.
+    """
+    if inputs["image"] or inputs["chat_history"].strip():
+        return None, None
+    if classify_intent_heuristic(inputs["question"]) in ("schedule", "smalltalk"):
+        return None, None
+    try:
+        vector = await embed_query(inputs["question"])
+    except Exception as e:
+        print(f"⚠️ Answer cache embedding failed: {e}")
+        return None, None
+
+    answer, similarity = answer_cache.lookup(
+        inputs["user_id"], vector, inputs["memory_version"], answer_scope(inputs)
+    )
+    if answer is not None:
+        print(f"♻️ Answer cache hit (similarity {similarity:.3f})")
+    return answer, vector
+
+def remember_answer(inputs: dict, vector, result: dict):
+    if vector is None or result.get("intent") != "memory" or result.get("tool_called"):
+        return
+    answer_cache.store(
+        inputs["user_id"], vector, inputs["memory_version"], answer_scope(inputs), result["answer"]
+    )
+
+@app.post("/chat")
+async def chat_endpoint(request: ChatRequest):
+    inputs = await build_graph_inputs(request)
+
+    cached, vector = await check_answer_cache(inputs)
+    if cached is not None:
+        return {"response": cached}
+
     # 2. RUN LANGGRAPH
     try:
-        inputs = {
-            "question": request.message,
-            "user_id": request.user_id,
-            "user_profile": profile_str,
-            "context": "", 
-            "answer": "",   
-            "image": request.image,
-            "chat_history": history_str
-        }
-        
         result = await shadow_graph.ainvoke(inputs)
+        remember_answer(inputs, vector, result)
         return {"response": result["answer"]}
         
     except Exception as e:
         print(f"Graph Error: {e}")
         return {"response": "My brain encountered a graph error."}
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _chunk_text(content) -> str:
+    # Gemini chunks are either a string or a list of content blocks
+    if isinstance(content, list):
+        return "".join(
+            block["text"] for block in content if isinstance(block, dict) and "text" in block
+        )
+    return content or ""
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    Server-Sent Events version of /chat.
+    Events: `token` ({text}), `event_created` ({_id, title, date, time, type}),
+    `done` ({response}) and `error` ({message}).
+    """
+    inputs = await build_graph_inputs(request)
+    cached, vector = await check_answer_cache(inputs)
+
+    async def event_stream():
+        if cached is not None:
+            yield _sse("token", {"text": cached})
+            yield _sse("done", {"response": cached})
+            return
+
+        stream = shadow_graph.astream_events(inputs, version="v2")
+        try:
+            async for event in stream:
+                # Stop the upstream LLM call as soon as the client goes away
+                if await http_request.is_disconnected():
+                    print("🔌 Chat stream: client disconnected, cancelling.")
+                    break
+
+                kind = event["event"]
+                if kind == "on_chat_model_stream" and event["metadata"].get("langgraph_node") == "generate":
+                    text = _chunk_text(event["data"]["chunk"].content)
+                    if text:
+                        yield _sse("token", {"text": text})
+                elif kind == "on_custom_event" and event["name"] == "event_created":
+                    yield _sse("event_created", event["data"])
+                elif kind == "on_chain_end" and not event["parent_ids"]:
+                    # Root graph finished: send the final (cleaned) answer
+                    result = event["data"]["output"]
+                    remember_answer(inputs, vector, result)
+                    yield _sse("done", {"response": result["answer"]})
+        except Exception as e:
+            print(f"Graph Error: {e}")
+            yield _sse("error", {"message": "My brain encountered a graph error."})
+        finally:
+            # Closing the generator cancels any still-running node / LLM request
+            await stream.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/dev/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+@app.get("/dev/answer-cache")
+async def get_answer_cache_stats():
+    return answer_cache.stats()
+
+@app.put("/dev/answer-cache")
+async def tune_answer_cache(threshold: float):
+    # Runtime tuning; watch /dev/metrics -> answer_cache.best_similarity
+    if not 0.0 < threshold <= 1.0:
+        raise HTTPException(status_code=400, detail="threshold must be in (0, 1]")
+    answer_cache.threshold = threshold
+    return answer_cache.stats()
+
 @app.get("/dev/graph")
 async def get_graph_image():
     try:
@@ -0,0 +1,165 @@
+"""
+Backfills `start` / `end` / `all_day` on events stored before they existed,
+from their "YYYY-MM-DD" date and "02:30 PM" / "All Day" time strings
+(read in DEFAULT_TIMEZONE).
+
+Rows synced from Google Calendar get the same best guess, but their
+owners' sync token is also dropped, so the next sync re-lists them and
+overwrites the guess with Google's real start/end.
+
+Events are walked in _id order and updated with one bulk_write per batch;
+the last _id is checkpointed in MongoDB, so an interrupted run resumes.
+Idempotent. The API also runs it in the background at startup until the
+checkpoint says it is done.
+
+Usage:
+    python -m app.migrate_event_times [--batch-size 500] [--pause 0.05]
+    python -m app.migrate_event_times --dry-run
+    python -m app.migrate_event_times --status
+    python -m app.migrate_event_times --restart
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.config import DEFAULT_TIMEZONE
+from app.database import events_collection, migrations_collection, users_collection
+from app.event_times import event_window, window_fields
+
+MIGRATION_ID = "event-times"
+
+_task: Optional[asyncio.Task] = None
+
+async def load_checkpoint() -> dict:
+    doc = await migrations_collection.find_one({"_id": MIGRATION_ID})
+    return doc or {
+        "_id": MIGRATION_ID,
+        "last_id": None,
+        "updated": 0,
+        "unparsable": 0,
+        "google_users": 0,
+        "done": False,
+        "started_at": datetime.now(timezone.utc),
+    }
+
+async def save_checkpoint(checkpoint: dict):
+    checkpoint["updated_at"] = datetime.now(timezone.utc)
+    await migrations_collection.replace_one({"_id": MIGRATION_ID}, checkpoint, upsert=True)
+
+def batch_operations(events) -> tuple:
+    """
+    Returns (UpdateOne list, unparsable count, owners of Google-synced rows) for one batch.
+    """
+    operations, unparsable, google_users = [], 0, set()
+    for event in events:
+        if event.get("google_id"):
+            google_users.add(event.get("user_id"))
+        window = event_window(event.get("date"), event.get("time"), event.get("timezone"))
+        if window is None:
+            unparsable += 1 # e.g. a free-text date dateparser couldn't read
+        operations.append(UpdateOne(
+            {"_id": event["_id"], "start": {"$exists": False}}, # don't touch rows written since
+            {"$set": window_fields(window, event.get("timezone"))}
+        ))
+    return operations, unparsable, google_users
+
+async def resync_google_users(user_ids) -> int:
+    """
+    Drops the calendar sync token (and makes the sync due now), so the next
+    sync is a full one. Returns how many users were reset.
+    """
+    object_ids = [ObjectId(user_id) for user_id in user_ids if user_id and ObjectId.is_valid(user_id)]
+    if not object_ids:
+        return 0
+    result = await users_collection.update_many(
+        {"_id": {"$in": object_ids}, "google_token": {"$exists": True}},
+        {"$unset": {"calendar_sync.sync_token": ""},
+         "$set": {"calendar_sync.next_sync_at": datetime.now(timezone.utc)}}
+    )
+    return result.modified_count
+
+async def migrate(batch_size: int = 500, pause: float = 0.05, dry_run: bool = False) -> dict:
+    checkpoint = await load_checkpoint()
+    query = {"start": {"$exists": False}}
+    if checkpoint["last_id"] is not None:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+
+    started = time.perf_counter()
+    cursor = events_collection.find(
+        query, {"date": 1, "time": 1, "timezone": 1, "user_id": 1, "google_id": 1}
+    ).sort("_id", 1).batch_size(batch_size)
+
+    batch = []
+    async def flush():
+        operations, unparsable, google_users = batch_operations(batch)
+        if not dry_run:
+            result = await events_collection.bulk_write(operations, ordered=False)
+            checkpoint["updated"] += result.modified_count
+            checkpoint["unparsable"] += unparsable
+            checkpoint["google_users"] = checkpoint.get("google_users", 0) + await resync_google_users(google_users)
+            checkpoint["last_id"] = batch[-1]["_id"]
+            await save_checkpoint(checkpoint)
+        print(f"   {len(operations)} events ({unparsable} unparsable, "
+              f"{len(google_users)} Google users to re-sync), up to {batch[-1]['_id']}")
+        batch.clear()
+        await asyncio.sleep(pause) # leave room for live traffic
+
+    async for event in cursor:
+        batch.append(event)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    if not dry_run:
+        checkpoint["done"] = True
+        await save_checkpoint(checkpoint)
+    print(f"✅ EVENT TIMES: {checkpoint['updated']} events backfilled ({DEFAULT_TIMEZONE}), "
+          f"{checkpoint['unparsable']} unparsable, {checkpoint.get('google_users', 0)} Google users re-syncing, "
+          f"{time.perf_counter() - started:.1f}s")
+    return checkpoint
+
+async def _run_in_background():
+    try:
+        await migrate()
+    except Exception as e:
+        print(f"❌ EVENT TIMES backfill failed (resumes on next start): {e}")
+
+async def start_event_time_backfill():
+    global _task
+    checkpoint = await migrations_collection.find_one({"_id": MIGRATION_ID}, {"done": 1})
+    if not (checkpoint and checkpoint.get("done")):
+        _task = asyncio.create_task(_run_in_background())
+
+async def stop_event_time_backfill():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+async def _main(args):
+    if args.restart:
+        await migrations_collection.delete_one({"_id": MIGRATION_ID})
+    if args.status:
+        print({key: value for key, value in (await load_checkpoint()).items() if key != "_id"})
+        return
+    await migrate(args.batch_size, args.pause, args.dry_run)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.migrate_event_times", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="Count what would change; write nothing")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and start over")
+    parser.add_argument("--status", action="store_true", help="Print the checkpoint and exit")
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Online migration: moves vectors from the old shared Pinecone namespace into
+per-user namespaces ("user-<id>").
+
+Safe to run while the app is serving traffic (keep PINECONE_LEGACY_FALLBACK=true
+until it finishes) and safe to interrupt: progress is checkpointed in MongoDB
+after every batch, and re-running resumes from the last checkpoint.
+
+Usage:
+    python -m app.migrate_vectors                   # copy phase
+    python -m app.migrate_vectors --delete-source   # copy, then remove the legacy copies
+    python -m app.migrate_vectors --status
+    python -m app.migrate_vectors --restart         # forget the checkpoint
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from collections import defaultdict
+
+from app.config import PINECONE_INDEX
+from app.database import migrations_collection
+from app.vector_backends import PineconeBackend, LEGACY_NAMESPACE, user_namespace
+
+MIGRATION_ID = "pinecone-namespaces"
+
+async def load_checkpoint() -> dict:
+    doc = await migrations_collection.find_one({"_id": MIGRATION_ID})
+    return doc or {
+        "_id": MIGRATION_ID,
+        "phase": "copy",
+        "token": None,
+        "copied": 0,
+        "skipped": 0,
+        "deleted": 0,
+        "started_at": datetime.now(timezone.utc),
+    }
+
+async def save_checkpoint(checkpoint: dict):
+    checkpoint["updated_at"] = datetime.now(timezone.utc)
+    await migrations_collection.replace_one({"_id": MIGRATION_ID}, checkpoint, upsert=True)
+
+def _list_page(index, limit: int, token):
+    page = index.list_paginated(namespace=LEGACY_NAMESPACE, limit=limit, pagination_token=token)
+    ids = [v.id for v in page.vectors]
+    next_token = page.pagination.next if page.pagination else None
+    return ids, next_token
+
+def _copy_batch(index, ids):
+    """
+    Fetches one page from the legacy namespace and upserts it into each
+    owner's namespace. Returns (copied, skipped).
+    Vectors already in the owner's namespace are skipped too: that copy was
+    written (or re-embedded, or had its metadata updated) by the app since,
+    so the legacy one is older.
+    """
+    fetched = index.fetch(ids=ids, namespace=LEGACY_NAMESPACE).vectors
+    by_user = defaultdict(list)
+    skipped = 0
+    for vector_id, vector in fetched.items():
+        user_id = (vector.metadata or {}).get("user_id")
+        if not user_id:
+            skipped += 1 # can't tell who owns it; leave it where it is
+            continue
+        by_user[user_id].append({"id": vector_id, "values": vector.values, "metadata": vector.metadata})
+    copied = 0
+    for user_id, rows in by_user.items():
+        namespace = user_namespace(user_id)
+        existing = index.fetch(ids=[row["id"] for row in rows], namespace=namespace).vectors
+        rows = [row for row in rows if row["id"] not in existing]
+        skipped += len(existing)
+        if rows:
+            index.upsert(vectors=rows, namespace=namespace)
+            copied += len(rows)
+    return copied, skipped
+
+def _delete_batch(index, ids):
+    """
+    Deletes legacy copies that now exist in their owner's namespace.
+    """
+    fetched = index.fetch(ids=ids, namespace=LEGACY_NAMESPACE).vectors
+    owned = [vector_id for vector_id, v in fetched.items() if (v.metadata or {}).get("user_id")]
+    if owned:
+        index.delete(ids=owned, namespace=LEGACY_NAMESPACE)
+    return len(owned)
+
+def _legacy_count(index) -> int:
+    stats = index.describe_index_stats()
+    namespace = stats.namespaces.get(LEGACY_NAMESPACE)
+    return namespace.vector_count if namespace else 0
+
+def _print_progress(label: str, done: int, total: int, started: float, batch_done: int):
+    elapsed = max(time.monotonic() - started, 1e-9)
+    rate = batch_done / elapsed
+    pct = f"{100 * done / total:5.1f}%" if total else "  n/a"
+    eta = f"{(total - done) / rate:6.0f}s" if rate and total > done else "     -"
+    print(f"🚚 {label:<7} {done:>8}/{total:<8} {pct}  {rate:8.1f} vec/s  ETA {eta}")
+
+async def run_phase(index, checkpoint: dict, phase: str, batch_size: int, pause: float, dry_run: bool):
+    total = await asyncio.to_thread(_legacy_count, index)
+    counter = "copied" if phase == "copy" else "deleted"
+    started, moved_this_run = time.monotonic(), 0
+
+    while True:
+        ids, next_token = await asyncio.to_thread(_list_page, index, batch_size, checkpoint["token"])
+        if not ids:
+            break
+
+        if dry_run:
+            done, skipped = len(ids), 0
+        elif phase == "copy":
+            done, skipped = await asyncio.to_thread(_copy_batch, index, ids)
+        else:
+            done, skipped = await asyncio.to_thread(_delete_batch, index, ids), 0
+
+        checkpoint[counter] += done
+        checkpoint["skipped"] += skipped
+        moved_this_run += done
+        checkpoint["token"] = next_token
+        if not dry_run:
+            await save_checkpoint(checkpoint)
+        _print_progress(phase, checkpoint[counter], total, started, moved_this_run)
+
+        if not next_token:
+            break
+        if pause:
+            await asyncio.sleep(pause) # stay under Pinecone's rate limits
+
+async def migrate(args):
+    if args.restart:
+        await migrations_collection.delete_one({"_id": MIGRATION_ID})
+
+    checkpoint = await load_checkpoint()
+    index = PineconeBackend(PINECONE_INDEX, legacy_fallback=False).index
+    if args.status:
+        print({key: value for key, value in checkpoint.items() if key != "_id"})
+        remaining = await asyncio.to_thread(_legacy_count, index)
+        print(f"   {remaining} vectors left in the legacy namespace")
+        if remaining == 0:
+            print("   Safe to set PINECONE_LEGACY_FALLBACK=false (the API also stops querying it by itself).")
+        return
+
+    if checkpoint["phase"] == "copy":
+        await run_phase(index, checkpoint, "copy", args.batch_size, args.pause, args.dry_run)
+        checkpoint.update(phase="cleanup" if args.delete_source else "copied", token=None)
+        if not args.dry_run:
+            await save_checkpoint(checkpoint)
+
+    if args.delete_source and checkpoint["phase"] in ("copied", "cleanup"):
+        checkpoint.update(phase="cleanup")
+        await run_phase(index, checkpoint, "cleanup", args.batch_size, args.pause, args.dry_run)
+        checkpoint.update(phase="done", token=None)
+        if not args.dry_run:
+            await save_checkpoint(checkpoint)
+
+    print(
+        f"✅ Migration {checkpoint['phase']}: copied={checkpoint['copied']} "
+        f"deleted={checkpoint['deleted']} skipped(no user_id)={checkpoint['skipped']}"
+    )
+    if checkpoint["phase"] in ("copied", "done"):
+        print("   You can now set PINECONE_LEGACY_FALLBACK=false.")
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.migrate_vectors", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100, help="Vectors per list/fetch/upsert round")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--delete-source", action="store_true", help="Remove legacy copies after copying")
+    parser.add_argument("--dry-run", action="store_true", help="List only; write nothing")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and start over")
+    parser.add_argument("--status", action="store_true", help="Print the checkpoint and exit")
+    asyncio.run(migrate(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
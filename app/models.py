@@ -58,6 +58,13 @@ class NoteDB(BaseModel):
     
     # This matches the structure above
     ai_metadata: AIAnalysisResult 
+    # "pending" while the background ingest pipeline is still analyzing it
+    analysis_status: str = "done"
+    # Near-duplicate memories: repeats point at the first note, which counts them
+    duplicate_of: Optional[str] = None
+    recurrence: Optional[Dict[str, Any]] = None
+    # Optimistic concurrency (versioning.py): bumped on every update
+    version: int = 0
     
     model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
@@ -68,10 +75,16 @@ class EventCreate(BaseModel):
     type: Literal["Work", "Personal"]
     user_id: str
     time: Optional[str] = None
+    # IANA zone the date/time were entered in (default: DEFAULT_TIMEZONE)
+    timezone: Optional[str] = None
 
 class EventDB(EventCreate):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Timezone-aware (UTC) bounds used for sorting and range queries (event_times.py)
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    all_day: bool = False
     model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
     google_id: Optional[str] = None
 
@@ -89,6 +102,8 @@ class QuickNoteUpdate(BaseModel):
     stream_type: Optional[str] = None
     workspace: Optional[str] = None
     is_encrypted: Optional[bool] = None
+    # The version the client last saw; a stale one gets 409 (optional)
+    version: Optional[int] = None
 
 class QuickNoteDB(QuickNoteCreate):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
@@ -97,6 +112,7 @@ class QuickNoteDB(QuickNoteCreate):
     model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
     workspace: str = "Main"
     is_encrypted: bool = False
+    version: int = 0
 
 # --- 5. CHAT REQUEST MODEL ---
 class ChatRequest(BaseModel):
@@ -0,0 +1,100 @@
+import json
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+# --- KEYSET PAGINATION FOR LIST ENDPOINTS ---
+# Pages are addressed by the last item's (sort value, _id) instead of skip():
+#   next page = sort_field < last value, or == last value and _id < last _id
+# With a {user_id, sort_field, _id} index (indexes.py) every page is one index seek,
+# so page 1000 costs the same as page 1.
+#
+# The cursor is opaque to clients (base64 JSON) and travels in the
+# X-Next-Cursor response header, so list bodies keep their old shape.
+# Lists are returned through lean_response(): raw projected documents are
+# serialized once, without building one Pydantic model per document.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(value, doc_id) -> str:
+    if isinstance(value, datetime):
+        payload = {"t": "dt", "v": value.isoformat(), "id": str(doc_id)}
+    else:
+        payload = {"t": "raw", "v": value, "id": str(doc_id)}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[object, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = datetime.fromisoformat(payload["v"]) if payload["t"] == "dt" else payload["v"]
+        return value, ObjectId(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(field: str, descending: bool, cursor: Optional[str]) -> dict:
+    if not cursor:
+        return {}
+    value, doc_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    if value is None:
+        # null sorts before every value: the other nulls, then (ascending) the rest
+        after_nulls = [] if descending else [{field: {"$ne": None}}]
+        return {"$or": after_nulls + [{field: None, "_id": {op: doc_id}}]}
+    return {"$or": [{field: {op: value}}, {field: value, "_id": {op: doc_id}}]}
+
+async def fetch_page(collection, query: dict, field: str, descending: bool, limit: int,
+                     cursor: Optional[str] = None, projection: Optional[dict] = None):
+    """
+    Returns (docs, next_cursor). next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    direction = -1 if descending else 1
+    keyset = keyset_filter(field, descending, cursor)
+    full_query = {"$and": [query, keyset]} if keyset else query
+    # Fetch one extra row to know whether there is a next page
+    docs = await collection.find(full_query, projection).sort(
+        [(field, direction), ("_id", direction)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(field), last["_id"])
+    return docs, next_cursor
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+def with_defaults(doc: dict, defaults: dict) -> dict:
+    """
+    Top-level defaults, plus one level of nesting for dict defaults (a nested
+    model's own defaults, e.g. ai_metadata on legacy notes).
+    """
+    filled = {**defaults, **doc}
+    for key, default in defaults.items():
+        if isinstance(default, dict):
+            value = doc.get(key)
+            filled[key] = {**default, **value} if isinstance(value, dict) else default
+    return filled
+
+def lean_response(docs, next_cursor: Optional[str], defaults: Optional[dict] = None) -> Response:
+    """
+    `defaults` fills fields old documents may lack (what the Pydantic model
+    would have added), so the lean body matches the old response.
+    """
+    if defaults:
+        docs = [with_defaults(doc, defaults) for doc in docs]
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    body = json.dumps(docs, default=_json_default, separators=(",", ":"))
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,154 @@
+import re
+import zlib
+import numpy as np
+from typing import List, Optional, Tuple
+
+from app.config import (
+    PRIORITY_RULE_CONFIDENCE,
+    PRIORITY_MODEL_CONFIDENCE,
+    PRIORITY_MODEL_MIN_SAMPLES,
+)
+
+# --- LOCAL PRIORITY TIER ---
+# Answers "High / Medium / Low" in microseconds when it is confident, so
+# detect_priority only pays for a Gemini round-trip on ambiguous text.
+# Tier 1: weighted keyword/regex rules (mirrors the LLM prompt guidelines).
+# Tier 2: optional hashed bag-of-words Naive Bayes trained from stored labels.
+
+LABELS = ["High", "Medium", "Low"]
+
+# --- 1. RULE ENGINE ---
+
+_RULES = [
+    # (label, pattern, weight)
+    ("High", r"\b(outage|crash(ed|ing)?|broken|bug|incident|urgent|asap|emergency)\b", 3.0),
+    ("High", r"\b(deadline|due (today|tonight|tomorrow)|overdue|escalat\w*)\b", 3.0),
+    ("High", r"\b(prod|production|security|breach|data loss|failing|failed)\b", 2.0),
+    ("High", r"\b(sick|hospital|doctor|fever|pain|injur\w*)\b", 3.0),
+    ("High", r"\bclients?\b.*\b(angry|upset|furious|complain\w*)\b", 3.0),
+    ("Medium", r"\b(meeting|sync|standup|stand-up|1:1|one on one|call)\b", 2.5),
+    ("Medium", r"\b(docs?|documentation|email|e-mail|report|review|maintenance|update)\b", 2.0),
+    ("Medium", r"\b(refactor|cleanup|clean up|invoice|timesheet)\b", 2.0),
+    ("Low", r"\b(movie|film|netflix|game|gaming|series)\b", 3.0),
+    ("Low", r"\b(buy|shopping|groceries|grocery|order)\b", 2.5),
+    ("Low", r"\b(learn|read|course|tutorial|watch)\b", 2.0),
+    ("Low", r"\b(maybe|someday|sometime|eventually|if i have time)\b", 2.5),
+]
+_COMPILED = [(label, re.compile(pattern, re.IGNORECASE), weight) for label, pattern, weight in _RULES]
+# One keyword is never enough ("write down the grocery list" is not an outage)
+MIN_SIGNALS = 2
+
+def classify_with_rules(text: str) -> Tuple[Optional[str], float]:
+    """
+    Returns (label, confidence). Confidence is the winning label's share of
+    the total matched weight, scaled down while fewer than MIN_SIGNALS of
+    its rules matched: one hit alone stays below any sensible threshold.
+    """
+    scores = dict.fromkeys(LABELS, 0.0)
+    hits = dict.fromkeys(LABELS, 0)
+    for label, pattern, weight in _COMPILED:
+        if pattern.search(text):
+            scores[label] += weight
+            hits[label] += 1
+
+    total = sum(scores.values())
+    if total == 0:
+        return None, 0.0
+    best = max(scores, key=scores.get)
+    return best, scores[best] / total * min(1.0, hits[best] / MIN_SIGNALS)
+
+# --- 2. HASHED NAIVE BAYES ---
+
+N_FEATURES = 2 ** 14
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+def _features(text: str) -> np.ndarray:
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    # crc32 instead of hash(): stable across processes
+    return np.fromiter(
+        (zlib.crc32(g.encode()) % N_FEATURES for g in grams),
+        dtype=np.int64,
+        count=len(grams)
+    )
+
+class PriorityModel:
+    def __init__(self):
+        self.log_prior: Optional[np.ndarray] = None # (3,)
+        self.log_prob: Optional[np.ndarray] = None  # (3, N_FEATURES)
+        self.n_samples = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.log_prob is not None
+
+    def fit(self, texts: List[str], labels: List[str], alpha: float = 1.0):
+        counts = np.zeros((len(LABELS), N_FEATURES), dtype=np.float64)
+        class_counts = np.zeros(len(LABELS), dtype=np.float64)
+        for text, label in zip(texts, labels):
+            row = LABELS.index(label)
+            np.add.at(counts[row], _features(text), 1.0)
+            class_counts[row] += 1
+
+        smoothed = counts + alpha
+        self.log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).astype(np.float32)
+        self.log_prior = np.log((class_counts + 1.0) / (class_counts.sum() + len(LABELS))).astype(np.float32)
+        self.n_samples = len(texts)
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        if not self.is_trained:
+            return None, 0.0
+        feats = _features(text)
+        if feats.size == 0:
+            return None, 0.0
+        scores = self.log_prior + self.log_prob[:, feats].sum(axis=1)
+        probs = np.exp(scores - scores.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return LABELS[best], float(probs[best])
+
+model = PriorityModel()
+
+async def train_from_db(collection, limit: int = 20000) -> int:
+    """
+    Trains the model from stored quick-note `final_priority` labels.
+    Only notes where the user picked the priority themselves are used
+    (not "Auto"), so the model never learns from its own guesses.
+    Encrypted notes are skipped (their content is ciphertext).
+    """
+    cursor = collection.find(
+        {"is_encrypted": {"$ne": True}, "priority": {"$in": LABELS}, "final_priority": {"$in": LABELS}},
+        {"content": 1, "final_priority": 1}
+    ).sort("updated_at", -1).limit(limit)
+    texts, labels = [], []
+    async for doc in cursor:
+        if doc.get("content"):
+            texts.append(doc["content"])
+            labels.append(doc["final_priority"])
+
+    if len(texts) < PRIORITY_MODEL_MIN_SAMPLES:
+        print(f"📉 PRIORITY MODEL: Only {len(texts)} labels, staying rules-only.")
+        return 0
+
+    model.fit(texts, labels)
+    print(f"🎯 PRIORITY MODEL: Trained on {len(texts)} labelled notes.")
+    return len(texts)
+
+# --- 3. COMBINED LOCAL TIER ---
+
+def classify_locally(text: str) -> Tuple[Optional[str], float, str]:
+    """
+    Returns (label, confidence, source) or (None, best_confidence, source)
+    when neither tier clears its threshold and the LLM should decide.
+    """
+    label, confidence = classify_with_rules(text)
+    if label and confidence >= PRIORITY_RULE_CONFIDENCE:
+        return label, confidence, "rules"
+
+    model_label, model_confidence = model.predict(text)
+    if model_label and model_confidence >= PRIORITY_MODEL_CONFIDENCE:
+        return model_label, model_confidence, "model"
+
+    if model_confidence > confidence:
+        return None, model_confidence, "model"
+    return None, confidence, "rules"
@@ -0,0 +1,102 @@
+import json
+import numpy as np
+from datetime import date, datetime
+from typing import List, Optional, Sequence
+
+from app.config import RERANK_PROFILES_JSON
+
+# --- RETRIEVAL RE-RANKING ---
+# The vector store over-fetches `fetch_k` candidates, then we pick the final
+# k here, all on the candidate matrix in NumPy:
+#   relevance = cosine(question, memory)
+#             + recency_weight * 0.5 ** (age_days / half_life_days)
+#             + impact_weight  * (impact_score - 5) / 5
+#   MMR: repeatedly take the candidate maximizing
+#        lambda_mult * relevance - (1 - lambda_mult) * max similarity to already-picked
+# so five near-identical rants can't fill the whole context.
+
+DEFAULT_PROFILE = {
+    "fetch_k": 20,          # candidates pulled from the vector store
+    "lambda_mult": 0.7,     # 1.0 = pure relevance, 0.0 = pure diversity
+    "half_life_days": 30.0, # a memory's recency bonus halves every N days
+    "recency_weight": 0.1,
+    "impact_weight": 0.05,
+}
+
+# Tunables per persona (profile.shadow_type); missing keys fall back to DEFAULT_PROFILE
+PERSONA_PROFILES = {
+    # Work context moves fast: favour recent, high-impact memories
+    "Career Mode": {"half_life_days": 14.0, "recency_weight": 0.15, "impact_weight": 0.08},
+    # Reflection: older memories matter as much, and variety matters more
+    "Zen Mode": {"half_life_days": 120.0, "recency_weight": 0.05, "lambda_mult": 0.6},
+}
+PERSONA_PROFILES.update(json.loads(RERANK_PROFILES_JSON) if RERANK_PROFILES_JSON else {})
+
+def profile_for(persona: Optional[str]) -> dict:
+    return {**DEFAULT_PROFILE, **PERSONA_PROFILES.get(persona or "", {})}
+
+def _age_days(dates: Sequence[Optional[str]], today: date) -> np.ndarray:
+    ages = np.full(len(dates), np.inf)
+    for i, value in enumerate(dates):
+        try:
+            ages[i] = max(0, (today - datetime.strptime(value, "%Y-%m-%d").date()).days)
+        except (TypeError, ValueError):
+            pass # unknown date -> no recency bonus
+    return ages
+
+def relevance_scores(query: np.ndarray, matrix: np.ndarray, dates, impacts, profile: dict,
+                     today: Optional[date] = None) -> np.ndarray:
+    """
+    Cosine similarity + recency decay + impact boost for every candidate.
+    `matrix` rows and `query` must be L2-normalized.
+    """
+    ages = _age_days(dates, today or date.today())
+    recency = np.power(0.5, ages / profile["half_life_days"])
+    impact = (np.asarray([5 if v is None else v for v in impacts], dtype=np.float32) - 5.0) / 5.0
+    return matrix @ query + profile["recency_weight"] * recency + profile["impact_weight"] * impact
+
+def mmr(matrix: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """
+    Maximal marginal relevance over normalized rows. Returns picked row indices.
+    """
+    n = len(matrix)
+    if n == 0:
+        return []
+    k = min(k, n)
+    similarity = matrix @ matrix.T # n x n, n is small (fetch_k)
+    picked = [int(np.argmax(relevance))]
+    max_sim = similarity[picked[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[picked[0]] = False
+    while len(picked) < k:
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(max_sim, similarity[best], out=max_sim)
+    return picked
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def rerank(query, candidates, k: int, persona: Optional[str] = None, today: Optional[date] = None):
+    """
+    `candidates` is [(Document, score, vector)] from the backend.
+    Returns the final k Documents.
+    """
+    if not candidates:
+        return []
+    profile = profile_for(persona)
+    matrix = _normalize(np.asarray([vector for _, _, vector in candidates], dtype=np.float32))
+    query = _normalize(np.asarray(query, dtype=np.float32))
+    docs = [doc for doc, _, _ in candidates]
+    relevance = relevance_scores(
+        query, matrix,
+        [doc.metadata.get("date") for doc in docs],
+        [doc.metadata.get("impact") for doc in docs],
+        profile, today
+    )
+    return [docs[i] for i in mmr(matrix, relevance, k, profile["lambda_mult"])]
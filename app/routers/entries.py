@@ -1,97 +1,207 @@
-from typing import List
+from typing import List, Literal, Optional
 from datetime import datetime, timezone
 from fastapi import APIRouter, HTTPException
 from bson import ObjectId
+from pymongo.errors import OperationFailure
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.database import notes_collection, users_collection
 from app.models import NoteDB, NoteCreate, QuickNoteUpdate, AIAnalysisResult
 from app.ai_engine import analyze_text, generate_weekly_insight, llm
-from app.vector_store import save_note_to_vector_db
+from app.vector_store import forget_notes, revive_note
+from app.ingest import (
+    apply_manual_override, should_embed, pending_analysis, enqueue_entry, remember_note, claim_fields,
+    unlink_duplicates,
+)
+from app.dedup import forget_fingerprint
+from app.search import hybrid_search, notes_changed
+from app.pagination import fetch_page, lean_response
+from app.versioning import version_filter, bump_version, raise_missing_or_conflict
+from app.config import INGEST_BACKGROUND
 
 router = APIRouter()
 
+# Fields the timeline cards need (skips worker bookkeeping like analysis_error)
+ENTRY_LIST_PROJECTION = {
+    "user_id": 1, "raw_text": 1, "type": 1, "created_at": 1, "ai_metadata": 1,
+    "analysis_status": 1, "duplicate_of": 1, "recurrence.count": 1, "version": 1,
+}
+ENTRY_DEFAULTS = {
+    "type": "user_note", "analysis_status": "done", "version": 0, "duplicate_of": None, "recurrence": None,
+    # Legacy notes may lack ai_metadata or some of its fields
+    "ai_metadata": AIAnalysisResult().model_dump(),
+}
+
 @router.get("/entries", response_model=List[NoteDB])
-async def get_entries(user_id: str = "user_1"):
-    # Fetch notes for this user, sorted by newest first
-    cursor = notes_collection.find({"user_id": user_id}).sort("created_at", -1).limit(50)
-    notes = await cursor.to_list(length=50)
-    return notes    
+async def get_entries(user_id: str = "user_1", limit: int = 50, cursor: Optional[str] = None):
+    # Newest first, one page at a time (next page cursor in the X-Next-Cursor header)
+    notes, next_cursor = await fetch_page(
+        notes_collection, {"user_id": user_id}, "created_at", True, limit, cursor, ENTRY_LIST_PROJECTION
+    )
+    return lean_response(notes, next_cursor, ENTRY_DEFAULTS)
+
+@router.get("/entries/search")
+async def search_entries(user_id: str, q: str, k: int = 20, mode: Literal["hybrid", "keyword", "vector"] = "hybrid"):
+    # Keyword (Mongo $text) + semantic (vector) search, fused with RRF
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    try:
+        results = await hybrid_search(user_id, q, k=min(k, 100), mode=mode)
+    except OperationFailure as e:
+        # e.g. the text index hasn't been built yet
+        raise HTTPException(status_code=503, detail=f"Search unavailable: {e}")
+    return {"query": q, "mode": mode, "results": results}
 
 @router.post("/entries", response_model=NoteDB)
-async def create_entry(note: NoteCreate):
+async def create_entry(note: NoteCreate, background: bool = INGEST_BACKGROUND):
+    created_at = datetime.now(timezone.utc)
+
+    # WRITE-BEHIND MODE: persist the raw note now, analyze it in the background
+    if background:
+        new_note = NoteDB(
+            user_id=note.user_id,
+            raw_text=note.raw_text,
+            ai_metadata=pending_analysis(note.manual_stream_type),
+            analysis_status="pending",
+            created_at=created_at
+        )
+        note_dict = new_note.model_dump(by_alias=True, exclude=["id"])
+        # Kept on the doc so a restarted worker can re-apply the override
+        note_dict["manual_stream_type"] = note.manual_stream_type
+        # Queued on this replica: other replicas' startup recovery leaves it alone
+        note_dict.update(claim_fields(created_at))
+        result = await notes_collection.insert_one(note_dict)
+        note_dict["_id"] = result.inserted_id
+        await notes_changed(note.user_id) # its raw_text is keyword-searchable already
+
+        await enqueue_entry(
+            str(result.inserted_id), note.raw_text, note.user_id,
+            created_at, note.manual_stream_type
+        )
+        return note_dict
+
     # 1. Analyze the text (AI decides: Activity vs. Rant vs. Idea)
     ai_response = await analyze_text(note.raw_text)
     
     # 👇 NEW LOGIC: Override AI if user manually selected a type
-    if note.manual_stream_type and note.manual_stream_type != "Auto":
-        print(f"🔧 MANUAL OVERRIDE: Changing {ai_response.stream_type} -> {note.manual_stream_type.upper()}")
-        # Force the type (Convert to UPPERCASE to match backend logic like "IDEA")
-        ai_response.stream_type = note.manual_stream_type.upper()
+    ai_response = apply_manual_override(ai_response, note.manual_stream_type)
 
     # 2. Create the Database Object
     new_note = NoteDB(
         user_id=note.user_id,
         raw_text=note.raw_text,
         ai_metadata=ai_response, 
-        created_at=datetime.now(timezone.utc)
+        created_at=created_at
     )
     
     # 3. Save to MongoDB (The "Log") - ALWAYS SAVE HERE
     note_dict = new_note.model_dump(by_alias=True, exclude=["id"])
     result = await notes_collection.insert_one(note_dict)
+    note_dict["_id"] = result.inserted_id
     
     # 4. CONDITIONAL VECTOR STORAGE (The "Vault")
-    should_embed = False
-    
-    # Case 1: Ideas are ALWAYS saved
-    if ai_response.stream_type == "IDEA":
-        should_embed = True
-        print(f"💎 VAULT: Saving Idea to Vector DB: '{note.raw_text[:30]}...'")
-        
-    # Case 2: Rants are saved ONLY if they are significant
-    elif ai_response.stream_type == "RANT" and ai_response.impact_score > 6:
-        should_embed = True
-        print(f"🔥 VAULT: Saving Major Rant (Score {ai_response.impact_score}) to Vector DB.")
-        
-    else:
-        print(f"📉 VAULT: Skipping '{ai_response.stream_type}' (Low Signal/Activity).")
-
-    if should_embed:
+    if should_embed(ai_response.stream_type, ai_response.impact_score):
+        print(f"💎 VAULT: Saving {ai_response.stream_type} to Vector DB: '{note.raw_text[:30]}...'")
         note_id = str(result.inserted_id)
         date_str = new_note.created_at.strftime("%Y-%m-%d")
-        await save_note_to_vector_db(note_id, note.raw_text, note.user_id, date_str)
+        canonical = await remember_note(
+            note_id, note.raw_text, note.user_id, date_str, impact_score=ai_response.impact_score
+        )
+        if canonical:
+            note_dict["duplicate_of"] = canonical # what merge_into() just wrote
+    else:
+        print(f"📉 VAULT: Skipping '{ai_response.stream_type}' (Low Signal/Activity).")
+        await notes_changed(note.user_id) # the vector write bumps memory_version otherwise
     
-    return await notes_collection.find_one({"_id": result.inserted_id})
+    # The inserted dict is the document: no read-back
+    return note_dict
+
+@router.get("/entries/{entry_id}/status")
+async def get_entry_status(entry_id: str):
+    # Lightweight poll target for write-behind entries
+    doc = await notes_collection.find_one(
+        {"_id": ObjectId(entry_id)},
+        {"analysis_status": 1, "analysis_attempts": 1, "analysis_error": 1, "ai_metadata": 1, "version": 1}
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Entry not found")
+
+    status = doc.get("analysis_status", "done")
+    return {
+        "_id": entry_id,
+        "analysis_status": status,
+        "attempts": doc.get("analysis_attempts", 0),
+        "error": doc.get("analysis_error"),
+        "ai_metadata": doc.get("ai_metadata") if status != "pending" else None,
+        "version": doc.get("version", 0), # the worker's patch bumps it; PUT needs the current one
+    }
 
 @router.put("/entries/{entry_id}", response_model=NoteDB)
 async def update_entry(entry_id: str, update: QuickNoteUpdate):
     # 1. Prepare the update data
     update_data = {}
     if update.stream_type:
-        # Update the nested field in MongoDB
-        update_data["ai_metadata.stream_type"] = update.stream_type
+        # Same casing as create_entry ("Idea" -> "IDEA") so the embed rule matches
+        update_data["ai_metadata.stream_type"] = update.stream_type.upper()
+        # Still pending: the ingest worker re-applies it over the AI's type
+        update_data["manual_stream_type"] = update.stream_type.upper()
 
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    # 2. Perform the Update
-    result = await notes_collection.update_one(
-        {"_id": ObjectId(entry_id)},
-        {"$set": update_data}
+    # 2. Perform the Update (we get the old version back to compare)
+    before = await notes_collection.find_one_and_update(
+        {"_id": ObjectId(entry_id), **version_filter(update.version)},
+        {"$set": update_data, **bump_version()}
     )
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Entry not found")
+    if before is None:
+        await raise_missing_or_conflict(notes_collection, entry_id, update.version, "Entry")
+
+    # 3. Keep the Vault in sync with the new type
+    # Legacy entries / insight cards may lack these: same defaults as AIAnalysisResult
+    meta = before.get("ai_metadata") or {}
+    old_type, impact_score = meta.get("stream_type", "Activity"), meta.get("impact_score", 5)
+    new_type = update_data.get("ai_metadata.stream_type", old_type)
+    was_memory = should_embed(old_type, impact_score)
+    is_memory = should_embed(new_type, impact_score)
+    # One memory_version bump per update: by the vector write, or by notes_changed
+    if before.get("analysis_status") == "pending":
+        # Placeholder metadata: the worker decides once the analysis lands
+        await notes_changed(before["user_id"])
+    elif is_memory and not was_memory:
+        await revive_note(entry_id)
+        date_str = before["created_at"].strftime("%Y-%m-%d")
+        await remember_note(
+            entry_id, before["raw_text"], before["user_id"], date_str, impact_score=impact_score,
+            repeats=(before.get("recurrence") or {}).get("count") or 0
+        )
+    elif was_memory and not is_memory:
+        await forget_notes(before["user_id"], [entry_id], bump=False)
+        await forget_fingerprint(entry_id)
+        await unlink_duplicates(before)
+        await notes_changed(before["user_id"], memory_changed=True)
+    else:
+        await notes_changed(before["user_id"])
 
-    # 3. Return the fresh document
-    return await notes_collection.find_one({"_id": ObjectId(entry_id)})
+    # 4. Return the fresh document (the old one + this update, no read-back)
+    before["ai_metadata"] = {**meta, "stream_type": new_type}
+    before["version"] = before.get("version", 0) + 1
+    return before
 
 @router.delete("/entries/{entry_id}")
 async def delete_entry(entry_id: str):
     # Use ObjectId to convert string ID to Mongo ID
-    result = await notes_collection.delete_one({"_id": ObjectId(entry_id)})
-    if result.deleted_count == 1:
+    deleted = await notes_collection.find_one_and_delete(
+        {"_id": ObjectId(entry_id)}, projection={"user_id": 1, "duplicate_of": 1, "recurrence": 1}
+    )
+    if deleted:
+        # Write-through: drop the vector too (also bumps memory_version,
+        # so cached chat answers built from this memory go stale)
+        await forget_notes(deleted["user_id"], [entry_id], bump=False)
+        await forget_fingerprint(entry_id)
+        await unlink_duplicates(deleted)
+        await notes_changed(deleted["user_id"], memory_changed=True)
         return {"status": "deleted"}
     raise HTTPException(status_code=404, detail="Entry not found")
 
@@ -150,6 +260,7 @@ async def trigger_insight(user_id: str):
     
     note_dict = insight_card.model_dump(by_alias=True, exclude=["id"])
     await notes_collection.insert_one(note_dict)
+    await notes_changed(user_id)
     
     # 6. CRITICAL: Update User's Last Insight Date
     await users_collection.update_one(
@@ -239,5 +350,6 @@ async def get_daily_recap(user_id: str):
     
     note_dict = new_recap_note.model_dump(by_alias=True, exclude=["id"])
     await notes_collection.insert_one(note_dict)
+    await notes_changed(user_id)
     
     return {"recap": recap_content}
\ No newline at end of file
@@ -1,51 +1,84 @@
-import re
-from typing import List
-from datetime import datetime, timezone
-from fastapi import APIRouter, Response
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, HTTPException, Query, Response
 from fastapi.responses import RedirectResponse
 from bson import ObjectId
-import dateparser
 
 from app.database import events_collection, users_collection
 from app.models import EventDB, EventCreate
 from app.calendar_service import create_flow, sync_calendar_events
+from app.pagination import fetch_page, lean_response
+from app.event_times import MAX_EVENT_SPAN, event_window, window_fields, parse_bound, zone
+from app.date_parsing import parse_event_date
 
 router = APIRouter()
 
-@router.get("/events", response_model=List[EventDB])
-async def get_events(user_id: str):
-    # 1. Get Today's Date (YYYY-MM-DD)
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    
-    # 2. Query MongoDB
-    cursor = events_collection.find({
+EVENT_LIST_PROJECTION = {
+    "title": 1, "date": 1, "time": 1, "type": 1, "user_id": 1, "created_at": 1,
+    "start": 1, "end": 1, "all_day": 1, "timezone": 1,
+}
+EVENT_DEFAULTS = {"time": None, "all_day": False}
+MAX_RANGE = timedelta(days=366)
+
+def _window_query(user_id: str, window_from: datetime, window_to: datetime) -> dict:
+    # Overlap: starts before the window ends, ends after it starts
+    return {
         "user_id": user_id,
-        "date": {"$gte": today} 
-    }).sort("date", 1).limit(20)
+        "start": {"$gte": window_from - MAX_EVENT_SPAN, "$lt": window_to},
+        "end": {"$gt": window_from},
+    }
+
+@router.get("/events", response_model=List[EventDB])
+async def get_events(user_id: str, limit: int = 20, cursor: Optional[str] = None):
+    # 1. From the start of today (UTC) on, like the old "date >= today"
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
     
-    return await cursor.to_list(length=20)
+    # 2. Query MongoDB (soonest first; next page cursor in the X-Next-Cursor header).
+    # Events whose date string couldn't be read have no start: they are listed
+    # first (null sorts first) so they stay visible and can be fixed.
+    query = {"$or": [
+        _window_query(user_id, today, datetime.max.replace(tzinfo=timezone.utc)),
+        {"user_id": user_id, "start": None, "date": {"$gte": today.strftime("%Y-%m-%d")}},
+    ]}
+    events, next_cursor = await fetch_page(
+        events_collection, query, "start", False, limit, cursor, EVENT_LIST_PROJECTION
+    )
+    return lean_response(events, next_cursor, EVENT_DEFAULTS)
+
+@router.get("/events/range", response_model=List[EventDB])
+async def get_events_in_range(
+    user_id: str,
+    window_from: str = Query(alias="from"),
+    window_to: str = Query(alias="to"),
+    tz: Optional[str] = None,
+    limit: int = 200,
+    cursor: Optional[str] = None,
+):
+    # Week / month views: events overlapping [from, to), by start time.
+    # Bounds are dates or ISO datetimes; naive ones are read in `tz`.
+    try:
+        start, end = parse_bound(window_from, tz), parse_bound(window_to, tz)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from/to must be ISO dates or datetimes")
+    if end <= start or end - start > MAX_RANGE:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from', at most 366 days later")
+
+    events, next_cursor = await fetch_page(
+        events_collection, _window_query(user_id, start, end), "start", False, limit, cursor, EVENT_LIST_PROJECTION
+    )
+    return lean_response(events, next_cursor, EVENT_DEFAULTS)
 
 @router.post("/events", response_model=EventDB)
 async def create_event(event: EventCreate):
     final_date = event.date
     final_time = event.time
     
-    # SMART PARSING LOGIC:
+    # SMART PARSING LOGIC: "tomorrow 10am" -> ("2026-01-16", "10:00 AM")
     if not final_time and event.date:
-        # Convert "11.30" to "11:30" so dateparser understands it
-        clean_date_str = re.sub(r'(\d{1,2})\.(\d{2})', r'\1:\2', event.date)
-        
-        # Use the clean string for parsing
-        parsed_dt = dateparser.parse(clean_date_str, settings={'PREFER_DATES_FROM': 'future'})
-        
-        if parsed_dt:
-            # 1. Standardize Date
-            final_date = parsed_dt.strftime("%Y-%m-%d")
-            
-            # 2. Extract Time
-            input_lower = event.date.lower()
-            if any(x in input_lower for x in ["pm", "am", ":", ".", " at "]):
-                final_time = parsed_dt.strftime("%I:%M %p")
+        # Relative dates are relative to the user's day, not the server's
+        parsed = await parse_event_date(event.date, datetime.now(zone(event.timezone)).replace(tzinfo=None))
+        if parsed:
+            final_date, final_time = parsed
 
     # Create DB Object
     new_event = EventDB(
@@ -54,12 +87,14 @@ async def create_event(event: EventCreate):
         time=final_time,
         type=event.type,
         user_id=event.user_id,
-        created_at=datetime.now(timezone.utc)
+        created_at=datetime.now(timezone.utc),
+        **window_fields(event_window(final_date, final_time, event.timezone), event.timezone)
     )
     
     event_dict = new_event.model_dump(by_alias=True, exclude=["id"])
     result = await events_collection.insert_one(event_dict)
-    return await events_collection.find_one({"_id": result.inserted_id})
+    event_dict["_id"] = result.inserted_id
+    return event_dict
 
 @router.delete("/events/{event_id}")
 async def delete_event(event_id: str):
@@ -1,21 +1,32 @@
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timezone
 from fastapi import APIRouter, HTTPException
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.database import quick_notes_collection
 from app.models import QuickNoteDB, QuickNoteCreate, QuickNoteUpdate
 from app.ai_engine import detect_priority
+from app.pagination import fetch_page, lean_response
+from app.versioning import version_filter, bump_version, raise_missing_or_conflict
 
 # ✅ FIX 1: Add the prefix here
 router = APIRouter(prefix="/quick-notes", tags=["Notes"])
 
 # ✅ FIX 2: Remove "quick-notes" from decorators (it's now in the prefix)
 
+QUICK_NOTE_LIST_PROJECTION = {
+    "content": 1, "priority": 1, "final_priority": 1, "user_id": 1, "workspace": 1, "is_encrypted": 1, "updated_at": 1, "version": 1,
+}
+QUICK_NOTE_DEFAULTS = {"priority": "Medium", "final_priority": "Medium", "workspace": "Main", "is_encrypted": False, "version": 0}
+
 @router.get("/", response_model=List[QuickNoteDB])
-async def get_quick_notes(user_id: str):
-    cursor = quick_notes_collection.find({"user_id": user_id}).sort("updated_at", -1)
-    return await cursor.to_list(length=50)
+async def get_quick_notes(user_id: str, limit: int = 50, cursor: Optional[str] = None):
+    # Most recently edited first; next page cursor in the X-Next-Cursor header
+    notes, next_cursor = await fetch_page(
+        quick_notes_collection, {"user_id": user_id}, "updated_at", True, limit, cursor, QUICK_NOTE_LIST_PROJECTION
+    )
+    return lean_response(notes, next_cursor, QUICK_NOTE_DEFAULTS)
 
 @router.post("/", response_model=QuickNoteDB)
 async def create_quick_note(note: QuickNoteCreate):
@@ -34,9 +45,10 @@ async def create_quick_note(note: QuickNoteCreate):
         is_encrypted=note.is_encrypted 
     )
     
-    result = await quick_notes_collection.insert_one(new_note.model_dump(by_alias=True, exclude=["id"]))
-    created = await quick_notes_collection.find_one({"_id": result.inserted_id})
-    return created
+    note_dict = new_note.model_dump(by_alias=True, exclude=["id"])
+    result = await quick_notes_collection.insert_one(note_dict)
+    note_dict["_id"] = result.inserted_id
+    return note_dict
 
 # ✅ FIX 3: Ensure static routes come BEFORE dynamic ones
 @router.delete("/workspace")
@@ -63,44 +75,50 @@ async def delete_workspace_notes(user_id: str, workspace: str):
 
 @router.put("/{note_id}", response_model=QuickNoteDB)
 async def update_quick_note(note_id: str, note: QuickNoteUpdate):
-    #  Fetch existing note
-    existing = await quick_notes_collection.find_one({"_id": ObjectId(note_id)})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Note not found")
-
     update_data = {"updated_at": datetime.now(timezone.utc)}
     # 1. Handle Encryption Status Change (NEW)
     if note.is_encrypted is not None:
         update_data["is_encrypted"] = note.is_encrypted
     
     #  Handle Content Update
-    current_content = existing["content"]
     if note.content is not None:
         update_data["content"] = note.content
-        current_content = note.content
 
     #  Handle Priority Update
     if note.priority is not None:
         update_data["priority"] = note.priority
         if note.priority == "Auto":
+            # "Auto" needs the content + encryption flag. The app always sends
+            # both; only partial updates pay for reading the stored note first.
+            content, is_encrypted = note.content, note.is_encrypted
+            if content is None or is_encrypted is None:
+                existing = await quick_notes_collection.find_one(
+                    {"_id": ObjectId(note_id)}, {"content": 1, "is_encrypted": 1}
+                )
+                if not existing:
+                    raise HTTPException(status_code=404, detail="Note not found")
+                content = existing["content"] if content is None else content
+                is_encrypted = existing.get("is_encrypted", False) if is_encrypted is None else is_encrypted
             # Only run AI if note is NOT encrypted
-            if existing.get("is_encrypted", False):
+            if is_encrypted:
                 update_data["final_priority"] = "Medium"
             else:
-                update_data["final_priority"] = await detect_priority(current_content)
+                update_data["final_priority"] = await detect_priority(content)
         else:
             update_data["final_priority"] = note.priority
 
-    #  Save to DB
+    #  Save to DB (the updated document comes back in the same round-trip)
     if note.workspace is not None:
         update_data["workspace"] = note.workspace
 
-    await quick_notes_collection.update_one(
-        {"_id": ObjectId(note_id)},
-        {"$set": update_data}
+    updated = await quick_notes_collection.find_one_and_update(
+        {"_id": ObjectId(note_id), **version_filter(note.version)},
+        {"$set": update_data, **bump_version()},
+        return_document=ReturnDocument.AFTER
     )
-    
-    return await quick_notes_collection.find_one({"_id": ObjectId(note_id)})
+    if updated is None:
+        await raise_missing_or_conflict(quick_notes_collection, note_id, note.version, "Note")
+    return updated
 
 @router.delete("/{note_id}")
 async def delete_quick_note(note_id: str):
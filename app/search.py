@@ -0,0 +1,135 @@
+import asyncio
+from typing import Dict, List, Optional, Sequence
+from bson import ObjectId
+from langchain_core.documents import Document
+
+from app import metrics
+from app.database import notes_collection
+from app.config import RETRIEVAL_MODE
+from app.vector_store import search_notes, bump_memory_version
+from app.indexes import ensure_text_index # re-exported for scratch collections (benchmarks)
+
+# --- HYBRID SEARCH (keyword + vector) ---
+# The vector store only holds IDEAs and strong RANTs, so e.g. "when did I go
+# to the dentist" (an ACTIVITY log) can't be found by similarity alone.
+# Hybrid search runs two rankings in parallel and fuses them:
+#   1. MongoDB $text over raw_text + ai_metadata.summary + ai_metadata.tags (every note)
+#   2. vector similarity (search_notes: tombstones, re-ranking, caching)
+# with reciprocal-rank fusion: score(d) = sum over rankings of 1 / (RRF_K + rank).
+
+RRF_K = 60 # the usual constant from the RRF paper; dampens the weight of top ranks
+
+RESULT_PROJECTION = {
+    "raw_text": 1, "created_at": 1, "ai_metadata.stream_type": 1, "ai_metadata.summary": 1, "recurrence.count": 1,
+}
+
+async def notes_changed(user_id: str, memory_changed: bool = False):
+    """
+    Call after a note write that didn't store a vector (those bump on their
+    own). Chat recall in hybrid mode also reads notes that have no vector
+    (ACTIVITY logs, pending notes), so those writes must invalidate cached
+    answers too. memory_changed=True: a vector was deleted with bump=False.
+    """
+    if memory_changed or RETRIEVAL_MODE == "hybrid":
+        await bump_memory_version(user_id)
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[tuple]:
+    """
+    Fuses ranked id lists. Returns [(id, score)] best first.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+async def keyword_search(user_id: str, query: str, limit: int = 20, collection=notes_collection) -> List[dict]:
+    cursor = collection.find(
+        {"user_id": user_id, "$text": {"$search": query}},
+        {**RESULT_PROJECTION, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+    return await cursor.to_list(length=limit)
+
+async def _vector_ids(user_id: str, query: str, limit: int, memory_version: Optional[int],
+                      persona: Optional[str]) -> List[str]:
+    try:
+        docs = await search_notes(user_id, query, k=limit, memory_version=memory_version, persona=persona)
+        return [doc.id for doc in docs]
+    except Exception as e:
+        # Keyword results alone are still useful
+        metrics.incr("search.vector_errors")
+        print(f"⚠️ Hybrid search: vector side failed: {e}")
+        return []
+
+async def _nothing() -> list:
+    return []
+
+async def hybrid_search(user_id: str, query: str, k: int = 10, mode: str = "hybrid",
+                        memory_version: Optional[int] = None, persona: Optional[str] = None) -> List[dict]:
+    """
+    Returns up to k notes (raw_text, created_at, stream_type, summary) with
+    their fused score and which ranking(s) found them.
+    mode: "hybrid" | "keyword" | "vector".
+    """
+    fetch = max(k * 2, 20)
+    with metrics.timed(f"search.{mode}_seconds"):
+        keyword_docs, vector_ids = await asyncio.gather(
+            keyword_search(user_id, query, fetch) if mode != "vector" else _nothing(),
+            _vector_ids(user_id, query, fetch, memory_version, persona) if mode != "keyword" else _nothing(),
+        )
+
+        keyword_ids = [str(doc["_id"]) for doc in keyword_docs]
+        fused = reciprocal_rank_fusion([keyword_ids, vector_ids])[:k]
+
+        # Vector-only hits still need their Mongo document (also drops vectors of deleted notes)
+        by_id = {str(doc["_id"]): doc for doc in keyword_docs}
+        missing = [ObjectId(doc_id) for doc_id, _ in fused if doc_id not in by_id and ObjectId.is_valid(doc_id)]
+        if missing:
+            cursor = notes_collection.find({"_id": {"$in": missing}, "user_id": user_id}, RESULT_PROJECTION)
+            async for doc in cursor:
+                by_id[str(doc["_id"])] = doc
+
+    keyword_set, vector_set = set(keyword_ids), set(vector_ids)
+    results = []
+    for doc_id, score in fused:
+        doc = by_id.get(doc_id)
+        if doc is None:
+            continue
+        meta = doc.get("ai_metadata") or {}
+        repeats = (doc.get("recurrence") or {}).get("count") or 0
+        results.append({
+            "_id": doc_id,
+            "raw_text": doc["raw_text"],
+            "created_at": doc.get("created_at"),
+            "stream_type": meta.get("stream_type"),
+            "summary": meta.get("summary"),
+            "recurring": repeats + 1 if repeats else 0, # as in the vector metadata (dedup.sync_recurrence)
+            "score": round(score, 6),
+            "sources": [name for name, found in (("keyword", keyword_set), ("vector", vector_set)) if doc_id in found],
+        })
+    return results
+
+async def hybrid_documents(user_id: str, question: str, k: int = 5, memory_version: Optional[int] = None,
+                           persona: Optional[str] = None) -> List[Document]:
+    """
+    hybrid_search() shaped like search_notes() output, for retrieve_node.
+    """
+    try:
+        results = await hybrid_search(user_id, question, k=k, memory_version=memory_version, persona=persona)
+    except Exception as e:
+        # e.g. text index missing: fall back to vector-only retrieval
+        metrics.incr("search.keyword_errors")
+        print(f"⚠️ Hybrid search failed, using vector search: {e}")
+        return await search_notes(user_id, question, k=k, memory_version=memory_version, persona=persona)
+    return [
+        Document(
+            id=r["_id"],
+            page_content=r["raw_text"],
+            metadata={
+                "date": r["created_at"].strftime("%Y-%m-%d") if r["created_at"] else "",
+                "type": r["stream_type"],
+                "recurring": r["recurring"],
+            }
+        )
+        for r in results
+    ]
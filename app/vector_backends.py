@@ -0,0 +1,238 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+
+# --- VECTOR BACKENDS ---
+# vector_store.py talks to one of these. Embedding happens in vector_store
+# (so it can be cached/batched); backends only store and search vectors.
+# All methods are blocking and are called from the vector I/O pool.
+
+ScoredDocs = List[Tuple[Document, float]]
+
+def to_document(vector_id: str, metadata: dict) -> Document:
+    # The note text lives in the metadata under "text" (LangChain convention)
+    return Document(id=vector_id, page_content=metadata.get("text", ""), metadata=dict(metadata))
+
+class VectorBackend:
+    name = "base"
+
+    def upsert(self, user_id: str, ids: Sequence[str], vectors: Sequence, metadatas: Sequence[dict]):
+        raise NotImplementedError
+
+    def query(self, user_id: str, vector, k: int = 5, filter: Optional[dict] = None) -> ScoredDocs:
+        raise NotImplementedError
+
+    def query_with_vectors(self, user_id: str, vector, k: int = 5, filter: Optional[dict] = None):
+        # Like query(), but each hit also carries its stored vector: [(Document, score, vector)]
+        raise NotImplementedError
+
+    def delete(self, user_id: str, ids: Sequence[str]):
+        raise NotImplementedError
+
+    def update_metadata(self, user_id: str, vector_id: str, metadata: dict):
+        # Merges `metadata` into the stored metadata of one vector
+        raise NotImplementedError
+
+    def flush(self):
+        # Persist anything buffered (no-op for remote backends)
+        pass
+
+    def list_user_ids(self) -> List[str]:
+        # Users that have at least one vector (for the reconciliation sweep)
+        raise NotImplementedError
+
+    def list_ids(self, user_id: str, batch_size: int = 100) -> Iterator[List[str]]:
+        # Yields this user's vector ids in pages
+        raise NotImplementedError
+
+    def list_legacy_ids(self, batch_size: int = 100) -> Iterator[List[str]]:
+        # Vector ids outside any user's partition (Pinecone's pre-namespace data)
+        return iter(())
+
+    def delete_legacy(self, ids: Sequence[str]):
+        pass
+
+# --- PINECONE ---
+
+LEGACY_NAMESPACE = "" # where every vector lived before per-user namespaces
+
+def user_namespace(user_id: str) -> str:
+    return f"user-{user_id}"
+
+class PineconeBackend(VectorBackend):
+    """
+    One Pinecone namespace per user, so a query only ever scans that user's
+    vectors (instead of the whole index + a user_id metadata filter).
+
+    While `legacy_fallback` is on, queries and deletes also look at the old
+    shared namespace, so nothing disappears while `python -m app.migrate_vectors`
+    is still moving vectors over. The legacy call runs in parallel with the
+    namespaced one, and is skipped altogether once the legacy namespace is
+    empty (re-checked every LEGACY_CHECK_SECONDS). Turn it off once the
+    migration is done.
+    """
+    name = "pinecone"
+    LEGACY_CHECK_SECONDS = 300
+
+    def __init__(self, index_name: str, legacy_fallback: bool = True):
+        self.index_name = index_name
+        self.legacy_fallback = legacy_fallback
+        self._index = None
+        self._lock = threading.Lock()
+        self._legacy_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pinecone-legacy") \
+            if legacy_fallback else None
+        self._legacy_empty = False
+        self._legacy_checked_at = float("-inf")
+
+    @property
+    def index(self):
+        # Lazy: don't hit the network at import time
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    from pinecone import Pinecone
+                    client = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+                    self._index = client.Index(self.index_name)
+        return self._index
+
+    def _legacy_active(self) -> bool:
+        if not self.legacy_fallback:
+            return False
+        now = time.monotonic()
+        if now - self._legacy_checked_at > self.LEGACY_CHECK_SECONDS:
+            self._legacy_checked_at = now
+            try:
+                namespace = self.index.describe_index_stats().namespaces.get(LEGACY_NAMESPACE)
+                self._legacy_empty = not (namespace and namespace.vector_count)
+            except Exception as e:
+                print(f"⚠️ Pinecone legacy namespace check failed: {e}")
+                self._legacy_empty = False
+        return not self._legacy_empty
+
+    def upsert(self, user_id, ids, vectors, metadatas):
+        self.index.upsert(
+            vectors=[
+                {"id": vector_id, "values": list(map(float, vector)), "metadata": {**metadata, "user_id": user_id}}
+                for vector_id, vector, metadata in zip(ids, vectors, metadatas)
+            ],
+            namespace=user_namespace(user_id)
+        )
+
+    def _query(self, vector, k, filter, namespace, include_values=False):
+        response = self.index.query(
+            vector=vector,
+            top_k=k,
+            filter=filter or None,
+            namespace=namespace,
+            include_metadata=True,
+            include_values=include_values
+        )
+        return [
+            (match["id"], match["metadata"] or {}, match["score"], match["values"] if include_values else None)
+            for match in response["matches"]
+        ]
+
+    def _search(self, user_id, vector, k, filter, include_values):
+        vector = list(map(float, vector))
+        filter = {key: value for key, value in (filter or {}).items() if key != "user_id"}
+        if not self._legacy_active():
+            return self._query(vector, k, filter, user_namespace(user_id), include_values)
+
+        # Not migrated yet? The shared namespace still needs the user filter.
+        legacy_future = self._legacy_pool.submit(
+            self._query, vector, k, {**filter, "user_id": user_id}, LEGACY_NAMESPACE, include_values # <--- SECURITY
+        )
+        matches = self._query(vector, k, filter, user_namespace(user_id), include_values)
+        legacy = legacy_future.result()
+        if legacy:
+            seen = {m[0] for m in matches}
+            matches += [m for m in legacy if m[0] not in seen] # the namespaced copy wins
+            matches = sorted(matches, key=lambda m: m[2], reverse=True)[:k]
+        return matches
+
+    def query(self, user_id, vector, k=5, filter=None):
+        return [
+            (to_document(vector_id, metadata), score)
+            for vector_id, metadata, score, _ in self._search(user_id, vector, k, filter, False)
+        ]
+
+    def query_with_vectors(self, user_id, vector, k=5, filter=None):
+        return [
+            (to_document(vector_id, metadata), score, values)
+            for vector_id, metadata, score, values in self._search(user_id, vector, k, filter, True)
+        ]
+
+    def delete(self, user_id, ids):
+        if not ids:
+            return
+        legacy_future = self._legacy_pool.submit(self.delete_legacy, ids) if self._legacy_active() else None
+        self.index.delete(ids=list(ids), namespace=user_namespace(user_id))
+        if legacy_future is not None:
+            legacy_future.result()
+
+    def update_metadata(self, user_id, vector_id, metadata):
+        # Not migrated yet? Update the legacy copy too, or migrate_vectors
+        # would later copy it over with the old metadata.
+        legacy_future = self._legacy_pool.submit(
+            self.index.update, id=vector_id, set_metadata=metadata, namespace=LEGACY_NAMESPACE
+        ) if self._legacy_active() else None
+        self.index.update(id=vector_id, set_metadata=metadata, namespace=user_namespace(user_id))
+        if legacy_future is not None:
+            try:
+                legacy_future.result()
+            except Exception as e:
+                # Usually: already migrated and deleted from the legacy namespace
+                print(f"⚠️ Pinecone legacy metadata update failed for {vector_id}: {e}")
+
+    def list_user_ids(self):
+        stats = self.index.describe_index_stats()
+        prefix = user_namespace("")
+        return [name[len(prefix):] for name in stats.namespaces if name.startswith(prefix)]
+
+    def list_ids(self, user_id, batch_size=100):
+        return self._list_namespace(user_namespace(user_id), batch_size)
+
+    def list_legacy_ids(self, batch_size=100):
+        if not self._legacy_active():
+            return iter(())
+        return self._list_namespace(LEGACY_NAMESPACE, batch_size)
+
+    def delete_legacy(self, ids):
+        if ids:
+            self.index.delete(ids=list(ids), namespace=LEGACY_NAMESPACE)
+
+    def _list_namespace(self, namespace, batch_size):
+        token = None
+        while True:
+            page = self.index.list_paginated(
+                namespace=namespace, limit=batch_size, pagination_token=token
+            )
+            ids = [v.id for v in page.vectors]
+            if ids:
+                yield ids
+            token = page.pagination.next if page.pagination else None
+            if not token:
+                return
+
+def create_backend(name: str) -> VectorBackend:
+    if name == "local":
+        from app.local_index import LocalVectorIndex
+        from app.config import (
+            LOCAL_VECTOR_DIR,
+            LOCAL_VECTOR_HOT_USERS,
+            LOCAL_VECTOR_IVF_THRESHOLD,
+            LOCAL_VECTOR_NPROBE,
+        )
+        return LocalVectorIndex(
+            LOCAL_VECTOR_DIR,
+            hot_users=LOCAL_VECTOR_HOT_USERS,
+            ivf_threshold=LOCAL_VECTOR_IVF_THRESHOLD,
+            nprobe=LOCAL_VECTOR_NPROBE
+        )
+    if name == "pinecone":
+        from app.config import PINECONE_INDEX, PINECONE_LEGACY_FALLBACK
+        return PineconeBackend(PINECONE_INDEX, legacy_fallback=PINECONE_LEGACY_FALLBACK)
+    raise ValueError(f"Unknown VECTOR_BACKEND '{name}' (expected 'pinecone' or 'local')")
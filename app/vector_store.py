@@ -1,55 +1,380 @@
 import os
+import json
+import asyncio
+import hashlib
+import time
+import functools
+from collections import defaultdict
+import numpy as np
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
+from langchain_core.runnables import RunnableLambda
+from bson import ObjectId
+from app.config import (
+    VECTOR_BACKEND,
+    VECTOR_IO_WORKERS,
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE_SIZE,
+    RETRIEVAL_CACHE_SIZE,
+    RETRIEVAL_CACHE_TTL_SECONDS,
+    EMBED_BATCH_SIZE,
+    EMBED_BATCH_DELAY_SECONDS,
+    RERANK_ENABLED,
+)
+from app.cache import TTLCache, hash_text
+from app.vector_backends import create_backend
+from app.rerank import rerank, profile_for
+from app import metrics
+from app.database import users_collection, vector_tombstones_collection
+from app.answer_cache import answer_cache
 
 # 1. SETUP ENV VARS (LangChain looks for these automatically)
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# 2. SETUP EMBEDDINGS
+embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
 
-index_name = "shadow-memory"
+# 3. INITIALIZE VECTOR BACKEND
+# Pinecone (default) or the embedded local index, chosen by VECTOR_BACKEND.
+# We initialize it once here so we can import it elsewhere.
+backend = create_backend(VECTOR_BACKEND)
 
-# 2. SETUP EMBEDDINGS
-embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-
-# 3. INITIALIZE VECTOR STORE
-# We initialize it once here so we can import it elsewhere
-# Note: We don't need to manually create the index every time; 
-# LangChain assumes it exists or we can check separately.
-vectorstore = PineconeVectorStore(
-    index_name=index_name,
-    embedding=embeddings
+# 4. DEDICATED I/O POOL
+# The embedding + Pinecone clients are blocking (HTTP under the hood).
+# Every call goes through this bounded pool so one slow round-trip never
+# freezes the event loop, and a burst of writes can't eat FastAPI's default
+# executor either.
+_vector_pool = ThreadPoolExecutor(
+    max_workers=VECTOR_IO_WORKERS,
+    thread_name_prefix="vector-io"
 )
 
-async def save_note_to_vector_db(note_id: str, text: str, user_id: str, created_at: str):
+async def run_in_vector_pool(fn, *args, **kwargs):
+    """
+    Runs a blocking vector-store call on the vector I/O pool and awaits it.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_vector_pool, functools.partial(fn, *args, **kwargs))
+
+def close_vector_pool():
+    """
+    Blocking: waits for in-flight vector writes, then flushes the backend.
+    For CLIs; the API awaits shutdown_vector_pool() instead.
+    """
+    _vector_pool.shutdown(wait=True)
+    backend.flush()
+
+async def shutdown_vector_pool():
+    await asyncio.to_thread(close_vector_pool)
+
+def note_metadata(user_id: str, created_at: str, text: str, impact_score: Optional[int] = None,
+                  repeats: int = 0) -> dict:
+    # "date" + "impact" feed the re-ranker (recency decay / impact boost)
+    metadata = {"user_id": user_id, "date": created_at, "text": text}
+    if impact_score is not None:
+        metadata["impact"] = impact_score
+    if repeats:
+        # The note's recurrence.count (dedup.py); an upsert replaces all metadata
+        metadata["recurring"] = repeats + 1
+    return metadata
+
+async def save_note_to_vector_db(note_id: str, text: str, user_id: str, created_at: str,
+                                 raise_errors: bool = False, impact_score: Optional[int] = None,
+                                 repeats: int = 0):
     """
-    LangChain handles the embedding conversion automatically.
+    Embeds the note and upserts it into the vector backend. Returns True on success.
+    Goes through the write buffer when it's running (batched with other notes).
+    raise_errors=True lets callers with their own retry logic see failures.
     """
+    metadata = note_metadata(user_id, created_at, text, impact_score, repeats)
     try:
-        # We use add_texts directly
-        vectorstore.add_texts(
-            texts=[text],
-            metadatas=[{
-                "user_id": user_id,
-                "date": created_at,
-                "text": text
-            }],
-            ids=[note_id] # We keep the MongoDB ID as the Vector ID
+        if write_buffer.running:
+            await write_buffer.submit(note_id, text, user_id, metadata)
+            return True
+        # Embedding + upsert both run off the event loop
+        vectors = await run_in_vector_pool(embeddings.embed_documents, [text])
+        await run_in_vector_pool(
+            backend.upsert,
+            user_id,
+            [note_id], # We keep the MongoDB ID as the Vector ID
+            vectors,
+            [metadata]
         )
-        print(f"🧠 Note stored in Pinecone via LangChain: {note_id}")
+        print(f"🧠 Note stored in {backend.name}: {note_id}")
+        await bump_memory_version(user_id)
+        return True
     except Exception as e:
         print(f"⚠️ Vector DB Save Error: {e}")
+        if raise_errors:
+            raise
+        return False
+
+async def update_note_metadata(user_id: str, note_id: str, metadata: dict):
+    await run_in_vector_pool(backend.update_metadata, user_id, note_id, metadata)
+    await bump_memory_version(user_id)
+
+# 5. PER-USER MEMORY VERSION
+# Incremented on every memory write/delete. Anything cached from a user's
+# memories (answers, retrieval results) is keyed by it, so a new memory
+# invalidates those caches on every replica at once.
+
+async def bump_memory_version(user_id: str):
+    answer_cache.invalidate(user_id)
+    if not ObjectId.is_valid(user_id):
+        return
+    try:
+        await users_collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"memory_version": 1}}
+        )
+    except Exception as e:
+        print(f"⚠️ Memory version bump failed for {user_id}: {e}")
+
+# 6. DELETES + TOMBSTONES
+# A tombstone marks a note whose vector must not be returned any more (note
+# deleted / reclassified). It is written before the vector delete, so even if
+# that delete fails or races with a buffered upsert, retrieval filters the
+# note out until the reconciliation sweep (vector_sweep.py) has purged it.
+
+async def forget_notes(user_id: str, note_ids, bump: bool = True):
+    """
+    Write-through delete: tombstones the notes, then removes their vectors.
+    bump=False: the caller bumps memory_version itself (search.notes_changed).
+    """
+    note_ids = [str(note_id) for note_id in note_ids]
+    if not note_ids:
+        return
+    now = datetime.now(timezone.utc)
+    try:
+        await vector_tombstones_collection.bulk_write([
+            UpdateOne({"_id": note_id}, {"$set": {"user_id": user_id, "created_at": now}}, upsert=True)
+            for note_id in note_ids
+        ], ordered=False)
+    except Exception as e:
+        print(f"⚠️ Tombstone write failed for {note_ids}: {e}")
+    try:
+        await run_in_vector_pool(backend.delete, user_id, note_ids)
+        metrics.incr("vector_store.deletes", len(note_ids))
+    except Exception as e:
+        # Tombstone hides it meanwhile; the next sweep retries the delete
+        metrics.incr("vector_store.delete_errors")
+        print(f"⚠️ Vector delete failed for {note_ids}: {e}")
+    if bump:
+        await bump_memory_version(user_id)
+
+async def revive_note(note_id: str):
+    # A note that qualifies again (reclassified back) must not stay hidden
+    await vector_tombstones_collection.delete_one({"_id": str(note_id)})
+
+async def tombstoned_ids(user_id: str, limit: int = 100) -> set:
+    try:
+        cursor = vector_tombstones_collection.find({"user_id": user_id}, {"_id": 1}).limit(limit)
+        return {doc["_id"] async for doc in cursor}
+    except Exception as e:
+        print(f"⚠️ Tombstone lookup failed for {user_id}: {e}")
+        return set()
+
+# 7. QUERY CACHES
+# Level 1: question text -> embedding (follow-up turns / answer-cache lookups
+#          re-use the vector instead of calling the embedding API again).
+# Level 2: (user, embedding, k, filter, memory_version) -> top-k documents.
+#          The memory_version makes stale results unreachable after a write.
+embedding_cache = TTLCache(maxsize=EMBEDDING_CACHE_SIZE)
+retrieval_cache = TTLCache(maxsize=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL_SECONDS)
 
-def get_retriever(user_id: str):
+async def embed_query(text: str):
     """
-    Returns a 'Retriever' object specifically filtered for THIS user.
+    Embeds a question (off the event loop), with an LRU in front.
+    """
+    key = hash_text(text.strip())
+    vector = embedding_cache.get(key)
+    if vector is not None:
+        metrics.incr("embedding_cache.hits")
+        return vector
+
+    metrics.incr("embedding_cache.misses")
+    vector = await run_in_vector_pool(embeddings.embed_query, text)
+    embedding_cache.set(key, vector)
+    return vector
+
+def get_retriever(user_id: str, k: int = 5):
+    """
+    Returns a 'Retriever' runnable specifically filtered for THIS user.
     This is the magic of LangChain - we pass this retriever into the AI chain.
     """
-    return vectorstore.as_retriever(
-        search_type="similarity",
-        search_kwargs={
-            "k": 5,
-            "filter": {"user_id": user_id} # <--- SECURITY: Only search my notes
-        }
-    )
\ No newline at end of file
+    async def retrieve(question: str):
+        return await search_notes(user_id, question, k=k)
+    return RunnableLambda(retrieve)
+
+async def search_notes(user_id: str, question: str, k: int = 5, memory_version: Optional[int] = None,
+                       persona: Optional[str] = None):
+    """
+    Async similarity search over THIS user's memories.
+    Embedding + backend query run on the vector I/O pool. Results are only
+    cached when the caller knows the user's current memory_version.
+    With RERANK_ENABLED, over-fetches candidates and re-ranks them for the
+    persona (MMR + recency + impact, see rerank.py).
+    """
+    search_filter = {"user_id": user_id} # <--- SECURITY: Only search my notes
+    vector = await embed_query(question)
+    reranked = RERANK_ENABLED
+
+    cache_key = None
+    if memory_version is not None:
+        vector_hash = hashlib.sha1(np.asarray(vector, dtype=np.float32).tobytes()).hexdigest()
+        cache_key = (user_id, vector_hash, k, json.dumps(search_filter, sort_keys=True), memory_version,
+                     persona if reranked else None)
+        docs = retrieval_cache.get(cache_key)
+        if docs is not None:
+            metrics.incr("retrieval_cache.hits")
+            return list(docs)
+        metrics.incr("retrieval_cache.misses")
+
+    # Over-fetch by the number of tombstones so dead memories don't eat top-k slots
+    tombstoned = await tombstoned_ids(user_id)
+    if reranked:
+        fetch_k = max(k, profile_for(persona)["fetch_k"])
+        candidates = await run_in_vector_pool(
+            backend.query_with_vectors, user_id, vector, fetch_k + len(tombstoned), search_filter
+        )
+        candidates = [c for c in candidates if c[0].id not in tombstoned]
+        with metrics.timed("retrieval.rerank_seconds"):
+            docs = rerank(vector, candidates, k, persona)
+    else:
+        scored = await run_in_vector_pool(backend.query, user_id, vector, k + len(tombstoned), search_filter)
+        docs = [doc for doc, _ in scored if doc.id not in tombstoned][:k]
+    if cache_key is not None:
+        retrieval_cache.set(cache_key, docs)
+    return list(docs)
+
+# 8. EMBEDDING WRITE BUFFER
+# Instead of one embedding request + one upsert per note, pending notes (from
+# any user) are coalesced: one embed_documents call per batch, then one bulk
+# upsert per user in it. A batch is flushed when it reaches `max_batch` notes
+# or `max_delay` seconds after its first note arrived, whichever comes first.
+# Each caller still awaits its own note, so errors reach its retry logic.
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+class EmbeddingWriteBuffer:
+    def __init__(self, max_batch: int, max_delay: float):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        print(f"📦 Embedding write buffer: batches of {self.max_batch}, max wait {self.max_delay}s")
+
+    async def stop(self):
+        """
+        Flushes everything still buffered, then stops the flush loop.
+        """
+        if self._task is None:
+            return
+        task, self._task = self._task, None # new writes go direct from here on
+        self._stopping = True
+        await self._queue.put(None) # wakes the loop up if it's idle
+        self._full.set()
+        await task
+
+    async def submit(self, note_id: str, text: str, user_id: str, metadata: dict):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put({
+            "note_id": note_id,
+            "text": text,
+            "user_id": user_id,
+            "metadata": metadata,
+            "future": future,
+            "queued_at": time.perf_counter(),
+        })
+        if self._queue.qsize() >= self.max_batch:
+            self._full.set()
+        await future
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is not None and self._queue.qsize() + 1 < self.max_batch:
+                # Wait for the batch to fill up, but never longer than max_delay
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+
+            batch = [first] if first is not None else []
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None:
+                    batch.append(item)
+
+            if batch:
+                await self._flush(batch)
+            if self._stopping and self._queue.empty():
+                return
+            if self._queue.qsize() >= self.max_batch:
+                self._full.set()
+
+    async def _flush(self, batch):
+        now = time.perf_counter()
+        metrics.observe("embed_buffer.batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+        for item in batch:
+            metrics.observe("embed_buffer.wait_seconds", now - item["queued_at"])
+
+        try:
+            with metrics.timed("embed_buffer.embed_seconds"):
+                vectors = await run_in_vector_pool(embeddings.embed_documents, [item["text"] for item in batch])
+        except Exception as e:
+            metrics.incr("embed_buffer.embed_errors")
+            for item in batch:
+                if not item["future"].done():
+                    item["future"].set_exception(e)
+            return
+
+        by_user = defaultdict(list)
+        for item, vector in zip(batch, vectors):
+            by_user[item["user_id"]].append((item, vector))
+
+        for user_id, rows in by_user.items():
+            try:
+                with metrics.timed("embed_buffer.upsert_seconds"):
+                    await run_in_vector_pool(
+                        backend.upsert,
+                        user_id,
+                        [item["note_id"] for item, _ in rows],
+                        [vector for _, vector in rows],
+                        [item["metadata"] for item, _ in rows]
+                    )
+                await bump_memory_version(user_id)
+                outcome = None
+            except Exception as e:
+                metrics.incr("embed_buffer.upsert_errors")
+                outcome = e
+            for item, _ in rows:
+                if item["future"].done():
+                    continue
+                if outcome is None:
+                    item["future"].set_result(None)
+                else:
+                    item["future"].set_exception(outcome)
+
+        metrics.incr("embed_buffer.notes", len(batch))
+        print(f"🧠 Stored {len(batch)} notes ({len(by_user)} users) in {backend.name}")
+
+write_buffer = EmbeddingWriteBuffer(max_batch=EMBED_BATCH_SIZE, max_delay=EMBED_BATCH_DELAY_SECONDS)
@@ -0,0 +1,127 @@
+"""
+Reconciliation sweep: purges vectors whose note no longer exists in MongoDB
+(or no longer qualifies as a memory), then clears the tombstones it covered.
+
+Runs periodically inside the API (VECTOR_SWEEP_INTERVAL_SECONDS) and can be
+run by hand:
+    python -m app.vector_sweep [--batch-size 100] [--dry-run]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from bson import ObjectId
+
+from app import metrics
+from app.config import VECTOR_SWEEP_INTERVAL_SECONDS
+from app.database import notes_collection, vector_tombstones_collection
+from app.ingest import embed_filter
+from app.vector_store import backend, run_in_vector_pool, bump_memory_version
+
+_task: Optional[asyncio.Task] = None
+
+def _keep_filter(object_ids) -> dict:
+    # Keep vectors of notes that qualify, and of notes still being analyzed
+    # (their vector can land a moment before analysis_status flips to "done").
+    return {
+        "_id": {"$in": object_ids},
+        "$or": [{"analysis_status": "pending"}, embed_filter()],
+    }
+
+async def _orphans(user_id: Optional[str], ids) -> list:
+    """
+    user_id=None: ids from the shared legacy namespace (any owner).
+    """
+    valid = [vector_id for vector_id in ids if ObjectId.is_valid(vector_id)] # not ours otherwise
+    if not valid:
+        return []
+    query = _keep_filter([ObjectId(v) for v in valid])
+    if user_id is not None:
+        query["user_id"] = user_id
+    cursor = notes_collection.find(query, {"_id": 1})
+    keep = {str(doc["_id"]) async for doc in cursor}
+    return [vector_id for vector_id in valid if vector_id not in keep]
+
+async def sweep(batch_size: int = 100, dry_run: bool = False) -> dict:
+    """
+    Diffs every user's vector ids against Mongo, one page at a time.
+    """
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    scanned = purged = 0
+
+    user_ids = await run_in_vector_pool(backend.list_user_ids)
+    for user_id in user_ids:
+        pages = backend.list_ids(user_id, batch_size)
+        user_purged = 0
+        while True:
+            ids = await run_in_vector_pool(next, pages, None)
+            if ids is None:
+                break
+            scanned += len(ids)
+            orphans = await _orphans(user_id, ids)
+            if orphans and not dry_run:
+                await run_in_vector_pool(backend.delete, user_id, orphans)
+            user_purged += len(orphans)
+        if user_purged and not dry_run:
+            await bump_memory_version(user_id)
+        purged += user_purged
+
+    # Pinecone's pre-namespace vectors (while PINECONE_LEGACY_FALLBACK still reads them)
+    pages = backend.list_legacy_ids(batch_size)
+    while True:
+        ids = await run_in_vector_pool(next, pages, None)
+        if ids is None:
+            break
+        scanned += len(ids)
+        orphans = await _orphans(None, ids)
+        if orphans and not dry_run:
+            await run_in_vector_pool(backend.delete_legacy, orphans)
+        purged += len(orphans)
+
+    if not dry_run:
+        # Everything tombstoned before this sweep started has now been purged
+        await vector_tombstones_collection.delete_many({"created_at": {"$lt": started_at}})
+
+    elapsed = time.perf_counter() - started
+    metrics.incr("vector_sweep.runs")
+    metrics.incr("vector_sweep.scanned", scanned)
+    metrics.incr("vector_sweep.purged", purged)
+    metrics.observe("vector_sweep.seconds", elapsed)
+    result = {"users": len(user_ids), "scanned": scanned, "purged": purged,
+              "seconds": round(elapsed, 2), "dry_run": dry_run}
+    print(f"🧹 VECTOR SWEEP: {result}")
+    return result
+
+async def _loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sweep()
+        except Exception as e:
+            metrics.incr("vector_sweep.errors")
+            print(f"❌ VECTOR SWEEP failed: {e}")
+
+async def start_vector_sweep():
+    global _task
+    if VECTOR_SWEEP_INTERVAL_SECONDS > 0:
+        _task = asyncio.create_task(_loop(VECTOR_SWEEP_INTERVAL_SECONDS))
+
+async def stop_vector_sweep():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.vector_sweep", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting them")
+    args = parser.parse_args()
+    asyncio.run(sweep(args.batch_size, args.dry_run))
+
+if __name__ == "__main__":
+    main()
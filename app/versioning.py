@@ -0,0 +1,40 @@
+from typing import Optional
+from bson import ObjectId
+from fastapi import HTTPException
+
+# --- OPTIMISTIC CONCURRENCY ---
+# Editable documents (entries, quick notes) carry a `version` that every
+# update increments. A client that sends the version it last saw only
+# updates that exact version: if someone else saved in between, the write
+# matches nothing and the client gets 409 instead of silently clobbering
+# the other edit. Clients that send no version keep last-write-wins.
+
+VERSION_FIELD = "version"
+
+def version_filter(expected: Optional[int]) -> dict:
+    if expected is None:
+        return {}
+    if expected == 0:
+        # Documents written before versioning have no field at all
+        return {VERSION_FIELD: {"$in": [0, None]}}
+    return {VERSION_FIELD: expected}
+
+def bump_version() -> dict:
+    return {"$inc": {VERSION_FIELD: 1}}
+
+async def raise_missing_or_conflict(collection, doc_id: str, expected: Optional[int], label: str = "Document"):
+    """
+    Called after a versioned write matched nothing. Only this failure path
+    pays the extra lookup needed to tell 404 from 409.
+    """
+    if expected is not None:
+        current = await collection.find_one({"_id": ObjectId(doc_id)}, {VERSION_FIELD: 1})
+        if current is not None:
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "message": f"{label} was modified by someone else",
+                    "current_version": current.get(VERSION_FIELD, 0),
+                }
+            )
+    raise HTTPException(status_code=404, detail=f"{label} not found")
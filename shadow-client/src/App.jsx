@@ -17,6 +17,7 @@ function App() {
   const [mode, setMode] = useState("Professional");
   const [shadowType, setShadowType] = useState("Career Mode");
   const [cards, setCards] = useState([]);
+  const [entriesCursor, setEntriesCursor] = useState(null); // X-Next-Cursor of /entries
   const [events, setEvents] = useState([]);
   const [quickNotes, setQuickNotes] = useState([]);
   const [sortByPriority, setSortByPriority] = useState(true);
@@ -70,6 +71,20 @@ function App() {
     }
   }, [token]);
 
+  const loadOlderEntries = async () => {
+    if (!entriesCursor || !user) return;
+    try {
+      const res = await axios.get(`${API_BASE}/entries`, {
+        params: { user_id: user.id, cursor: entriesCursor },
+      });
+      setCards((prev) => [...prev, ...res.data]);
+      setEntriesCursor(res.headers["x-next-cursor"] || null);
+    } catch (e) {
+      console.error(e);
+      addToast("Failed to load older entries", "Error", "error");
+    }
+  };
+
   const fetchData = async (userId) => {
     try {
       const [res1, res2, res3, res4] = await Promise.all([
@@ -80,6 +95,7 @@ function App() {
       ]);
 
       setCards(res1.data);
+      setEntriesCursor(res1.headers["x-next-cursor"] || null);
       setEvents(res2.data);
       setQuickNotes(res3.data);
 
@@ -130,6 +146,7 @@ function App() {
     setToken(null);
     setUser(null);
     setCards([]);
+    setEntriesCursor(null);
     setEvents([]);
     setQuickNotes([]);
     setChatHistory([]);
@@ -261,6 +278,8 @@ function App() {
               accentColor={accentColor}
               isSidebarOpen={true}
               showInsights={showInsights}
+              hasMore={!!entriesCursor}
+              onLoadMore={loadOlderEntries}
             />
           </div>
           {/* Events */}
@@ -12,7 +12,6 @@ import {
   Mic,
   MicOff,
 } from "lucide-react";
-import axios from "axios";
 import { motion, AnimatePresence } from "framer-motion";
 import { API_BASE } from "../config";
 import MarkdownView from "./MarkdownView";
@@ -34,8 +33,15 @@ export default function ChatOverlay({
   const [selectedImage, setSelectedImage] = useState(null);
   const scrollRef = useRef(null);
   const fileInputRef = useRef(null);
+  const abortRef = useRef(null);
   const [isListening, setIsListening] = useState(false);
 
+  // Closing the overlay (or unmounting) cancels an in-flight answer
+  useEffect(() => {
+    if (!isOpen && abortRef.current) abortRef.current.abort();
+  }, [isOpen]);
+  useEffect(() => () => abortRef.current?.abort(), []);
+
   // --- AUTO-SCROLL ---
   useEffect(() => {
     if (scrollRef.current) {
@@ -108,34 +114,69 @@ export default function ChatOverlay({
     setSelectedImage(null); // Clear image after sending
     setLoading(true);
 
-    try {
-      // 3. SEND TO BACKEND (Fixed Payload Structure)
-      const res = await axios.post(`${API_BASE}/chat`, {
-        user_id: user.id, // <--- Required by Backend
-        message: newMessage.content, // <--- Required by Backend
-        history: chatHistory, // <--- Required by Backend
-        image: newMessage.image, // <--- Optional
+    // Bot bubble is created on the first token and filled in as tokens stream
+    const updateBotMessage = (fn) =>
+      setChatHistory((prev) => {
+        const last = prev[prev.length - 1];
+        if (last?.role === "model" && last.streaming) {
+          return [...prev.slice(0, -1), { ...last, content: fn(last.content) }];
+        }
+        return [...prev, { role: "model", content: fn(""), streaming: true }];
       });
 
-      const botMessage = {
-        role: "model",
-        content: res.data.response,
-      };
-      setChatHistory((prev) => [...prev, botMessage]);
-      if (
-        res.data.response.includes("✅") ||
-        res.data.response.includes("scheduled")
-      ) {
-        console.log("📅 Event detected! Refreshing calendar...");
-        if (onEventCreated) onEventCreated();
+    const controller = new AbortController();
+    abortRef.current = controller;
+
+    try {
+      // 3. STREAM FROM BACKEND (Server-Sent Events)
+      const res = await fetch(`${API_BASE}/chat/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        signal: controller.signal,
+        body: JSON.stringify({
+          user_id: user.id, // <--- Required by Backend
+          message: newMessage.content, // <--- Required by Backend
+          history: chatHistory, // <--- Required by Backend
+          image: newMessage.image, // <--- Optional
+        }),
+      });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE frames are separated by a blank line
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] || "{}");
+
+          if (event === "token") {
+            setLoading(false);
+            updateBotMessage((text) => text + data.text);
+          } else if (event === "event_created") {
+            console.log("📅 Event created! Refreshing calendar...", data);
+            if (onEventCreated) onEventCreated();
+          } else if (event === "done") {
+            updateBotMessage(() => data.response);
+          } else if (event === "error") {
+            updateBotMessage(() => data.message);
+          }
+        }
       }
     } catch (error) {
+      if (error.name === "AbortError") return;
       console.error(error);
-      setChatHistory((prev) => [
-        ...prev,
-        { role: "model", content: "⚠️ Error connecting to server." },
-      ]);
+      updateBotMessage(() => "⚠️ Error connecting to server.");
     } finally {
+      abortRef.current = null;
       setLoading(false);
     }
   };
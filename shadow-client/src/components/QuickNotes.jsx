@@ -233,6 +233,7 @@ export default function QuickNotes({
         finalContent = await encryptData(tempNoteContent, vaultKey);
       }
 
+      const seenVersion = notes.find((n) => n._id === id)?.version;
       const optimisticPriority =
         tempNotePriority === "Auto" ? "Medium" : tempNotePriority;
 
@@ -261,6 +262,7 @@ export default function QuickNotes({
         priority: tempNotePriority,
         workspace: activeWorkspace,
         is_encrypted: finalIsEncrypted,
+        version: seenVersion, // 409 if the note was saved elsewhere meanwhile
       });
 
       // 4. Sync with Backend Response
@@ -274,6 +276,11 @@ export default function QuickNotes({
       await onRefresh();
     } catch (e) {
       console.error(e);
+      if (e.response?.status === 409) {
+        alert("This note was changed somewhere else. Reloading the latest version.");
+        await onRefresh();
+        return;
+      }
       alert("Failed to update note.");
     }
   };
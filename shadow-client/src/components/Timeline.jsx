@@ -95,6 +95,8 @@ export default function Timeline({
   panelColor,
   accentColor,
   showInsights,
+  hasMore,
+  onLoadMore,
 }) {
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
@@ -191,6 +193,9 @@ export default function Timeline({
         manual_stream_type: manualType !== "Auto" ? manualType : null,
       });
       setCards((prev) => prev.map((c) => (c._id === tempId ? res.data : c)));
+      if (res.data.analysis_status === "pending") {
+        pollAnalysis(res.data._id);
+      }
     } catch (err) {
       console.error(err);
       setCards((prev) => prev.filter((c) => c._id !== tempId));
@@ -199,6 +204,32 @@ export default function Timeline({
     }
   };
 
+  // Entries are analyzed in the background; poll until the AI metadata lands
+  const pollAnalysis = async (id, attempt = 0) => {
+    if (attempt >= 20) return;
+    await new Promise((r) => setTimeout(r, Math.min(1000 * (attempt + 1), 5000)));
+    try {
+      const res = await axios.get(`${API_BASE}/entries/${id}/status`);
+      if (res.data.analysis_status === "pending") {
+        return pollAnalysis(id, attempt + 1);
+      }
+      setCards((prev) =>
+        prev.map((c) =>
+          c._id === id
+            ? {
+                ...c,
+                analysis_status: res.data.analysis_status,
+                ai_metadata: res.data.ai_metadata || c.ai_metadata,
+                version: res.data.version,
+              }
+            : c,
+        ),
+      );
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
   const handleDelete = async (id) => {
     try {
       await axios.delete(`${API_BASE}/entries/${id}`);
@@ -231,6 +262,7 @@ export default function Timeline({
   });
 
   const handleUpdateType = async (id, newType) => {
+    const original = cards.find((c) => c._id === id);
     setCards((prev) =>
       prev.map((c) =>
         c._id === id
@@ -239,8 +271,20 @@ export default function Timeline({
       ),
     );
     try {
-      await axios.put(`${API_BASE}/entries/${id}`, { stream_type: newType });
-    } catch (err) {}
+      // Send the version we saw: the server answers 409 if it changed meanwhile
+      const res = await axios.put(`${API_BASE}/entries/${id}`, {
+        stream_type: newType,
+        version: original?.version,
+      });
+      setCards((prev) =>
+        prev.map((c) => (c._id === id ? { ...c, version: res.data.version } : c)),
+      );
+    } catch (err) {
+      if (err.response?.status === 409 && original) {
+        // Someone else edited it: undo the optimistic change
+        setCards((prev) => prev.map((c) => (c._id === id ? original : c)));
+      }
+    }
   };
 
   const getTypeIcon = (t) => {
@@ -352,6 +396,14 @@ export default function Timeline({
             ))}
           </AnimatePresence>
         )}
+        {hasMore && (
+          <button
+            onClick={onLoadMore}
+            className="w-full py-2 text-[10px] uppercase tracking-wider opacity-50 hover:opacity-100 transition-opacity"
+          >
+            Load older
+          </button>
+        )}
       </div>
 
       {/* 3. INTERACTIVE INPUT AREA */}
@@ -33,6 +33,9 @@ export default function UpcomingEvents({
     .filter((event) => {
       if (!event.date) return false;
 
+      // Events with a stored window: keep until they have ended
+      if (event.end) return new Date(event.end) >= new Date();
+
       const now = new Date();
       // Reset "now" seconds to 0 to avoid minor mismatches
       now.setSeconds(0, 0);
@@ -71,6 +74,7 @@ export default function UpcomingEvents({
       }
     })
     .sort((a, b) => {
+      if (a.start && b.start) return new Date(a.start) - new Date(b.start);
       const timeA = a.time === "All Day" || !a.time ? "00:00" : a.time;
       const timeB = b.time === "All Day" || !b.time ? "00:00" : b.time;
       // Simple string sort for date + time usually works if format is consistent
@@ -96,6 +100,7 @@ export default function UpcomingEvents({
         time: null,
         location: null,
         type: newEvent.type,
+        timezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
         user_id: user.id,
       });
 
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Offline defaults, set before any app module reads its config
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ.setdefault("LOCAL_VECTOR_DIR", tempfile.mkdtemp(prefix="shadow-vectors-"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
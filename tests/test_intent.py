@@ -0,0 +1,19 @@
+import pytest
+
+from app.intent import classify_intent_heuristic
+
+@pytest.mark.parametrize("question, intent", [
+    ("schedule a dentist appointment tomorrow at 3pm", "schedule"),
+    ("Can you book a table for friday at 7pm?", "schedule"),
+    ("remind me to call mom tonight", "schedule"),
+    ("add lunch with Sam to my calendar on monday", "schedule"),
+    # Lookups mention the calendar and a day, but must not bind the create-event tool
+    ("did I schedule anything tomorrow?", "memory"),
+    ("what is on my calendar tomorrow?", "memory"),
+    ("remind me what I said about the project today", "memory"),
+    ("what did I rant about last week?", "memory"),
+    ("thanks!", "smalltalk"),
+    ("the weather is nice", None),
+])
+def test_classify_intent_heuristic(question, intent):
+    assert classify_intent_heuristic(question) == intent
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+
+from app.local_index import LocalVectorIndex
+
+DIM = 16
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+def _ids(results):
+    return [doc.id for doc, _ in results]
+
+def test_upsert_and_search_returns_nearest_first(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    vectors = _vectors(20)
+    index.upsert("u1", [f"n{i}" for i in range(20)], vectors, [{"text": f"note {i}"} for i in range(20)])
+
+    results = index.query("u1", vectors[7], k=3)
+    assert _ids(results)[0] == "n7"
+    assert results[0][1] > results[1][1] >= results[2][1]
+    assert results[0][0].page_content == "note 7"
+
+def test_users_are_isolated(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    vectors = _vectors(2)
+    index.upsert("u1", ["a"], vectors[:1], [{"text": "mine"}])
+    index.upsert("u2", ["b"], vectors[1:], [{"text": "theirs"}])
+    assert _ids(index.query("u1", vectors[1], k=5)) == ["a"]
+
+def test_delete_and_metadata_update(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    vectors = _vectors(3)
+    index.upsert("u1", ["a", "b", "c"], vectors, [{"text": t} for t in "abc"])
+    index.delete("u1", ["a"])
+    index.update_metadata("u1", "b", {"impact": 9})
+
+    results = index.query("u1", vectors[0], k=5)
+    assert sorted(_ids(results)) == ["b", "c"]
+    assert next(doc for doc, _ in results if doc.id == "b").metadata["impact"] == 9
+
+def test_writes_append_to_the_log_instead_of_rewriting_the_snapshot(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    vectors = _vectors(5)
+    index.upsert("u1", ["a", "b"], vectors[:2], [{"text": "a"}, {"text": "b"}])
+    index.upsert("u1", ["c"], vectors[2:3], [{"text": "c"}])
+
+    directory = os.path.join(str(tmp_path), "u1")
+    assert os.path.exists(os.path.join(directory, "log.jsonl"))
+    assert not os.path.exists(os.path.join(directory, "vectors.npy"))
+
+def test_persistence_round_trip_replays_the_log_over_the_snapshot(tmp_path):
+    vectors = _vectors(6)
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert("u1", ["a", "b", "c"], vectors[:3], [{"text": t} for t in "abc"])
+    index.flush() # snapshot: a, b, c
+    index.upsert("u1", ["d"], vectors[3:4], [{"text": "d"}])
+    index.delete("u1", ["b"])
+    index.update_metadata("u1", "a", {"impact": 7})
+
+    reopened = LocalVectorIndex(str(tmp_path))
+    results = reopened.query("u1", vectors[3], k=10)
+    assert _ids(results)[0] == "d"
+    assert sorted(_ids(results)) == ["a", "c", "d"]
+    assert next(doc for doc, _ in results if doc.id == "a").metadata["impact"] == 7
+    assert sorted(reopened.list_user_ids()) == ["u1"]
+
+def test_flush_compacts_the_log(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert("u1", ["a"], _vectors(1), [{"text": "a"}])
+    index.flush()
+
+    directory = os.path.join(str(tmp_path), "u1")
+    assert not os.path.exists(os.path.join(directory, "log.jsonl"))
+    assert _ids(LocalVectorIndex(str(tmp_path)).query("u1", _vectors(1)[0], k=1)) == ["a"]
+
+def test_ivf_search_finds_exact_matches(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), ivf_threshold=100, nprobe=4)
+    vectors = _vectors(400, seed=3)
+    index.upsert("u1", [f"n{i}" for i in range(400)], vectors, [{"text": str(i)} for i in range(400)])
+    hits = sum(_ids(index.query("u1", vectors[i], k=1)) == [f"n{i}"] for i in range(0, 400, 20))
+    assert hits >= 18
+
+def test_ivf_lists_are_patched_on_edits_and_deletes(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), ivf_threshold=100, nprobe=4)
+    vectors = _vectors(400, seed=5)
+    index.upsert("u1", [f"n{i}" for i in range(400)], vectors, [{"text": str(i)} for i in range(400)])
+    index.query("u1", vectors[0], k=1) # builds the IVF
+    ivf = index._partitions["u1"].ivf
+
+    moved = _vectors(10, seed=6)
+    index.upsert("u1", [f"n{i}" for i in range(10)], moved, [{"text": "moved"}] * 10)
+    index.delete("u1", [f"n{i}" for i in range(10, 60)])
+    index.upsert("u1", ["new"], _vectors(1, seed=7), [{"text": "new"}])
+
+    partition = index._partitions["u1"]
+    assert partition.ivf is ivf, "edits must not throw the IVF away"
+    # Every row is in exactly one list, the one it is assigned to
+    rows = np.sort(np.concatenate(ivf.lists))
+    assert rows.tolist() == list(range(partition.n))
+    assert all(row in ivf.lists[c] for row, c in enumerate(ivf.assign))
+
+    assert _ids(index.query("u1", moved[3], k=1)) == ["n3"]
+    assert _ids(index.query("u1", _vectors(1, seed=7)[0], k=1)) == ["new"]
+    assert "n20" not in _ids(index.query("u1", vectors[20], k=5))
+
+def test_delete_query_then_eviction_keeps_one_partition_per_user(tmp_path):
+    vectors = _vectors(4)
+    index = LocalVectorIndex(str(tmp_path), hot_users=1)
+    index.upsert("u1", ["a", "b"], vectors[:2], [{"text": "a"}, {"text": "b"}])
+    index.delete("u1", ["a"])
+    assert _ids(index.query("u1", vectors[0], k=5)) == ["b"]
+
+    with index._use("u1") as in_flight:
+        # Another user's write would evict u1, but a caller still holds it
+        index.upsert("u2", ["c"], vectors[2:3], [{"text": "c"}])
+        assert index._partitions["u1"] is in_flight
+        index.upsert("u1", ["d"], vectors[3:4], [{"text": "d"}])
+        assert index._partitions["u1"] is in_flight
+
+    # Released: now it can go (flushed to its snapshot on the way out)
+    index.upsert("u2", ["e"], vectors[:1], [{"text": "e"}])
+    assert list(index._partitions) == ["u2"]
+    assert sorted(_ids(index.query("u1", vectors[3], k=5))) == ["b", "d"]
+    assert sorted(_ids(LocalVectorIndex(str(tmp_path)).query("u1", vectors[3], k=5))) == ["b", "d"]
@@ -0,0 +1,20 @@
+import json
+
+from app.models import NoteDB
+from app.routers.entries import ENTRY_DEFAULTS
+from app.pagination import lean_response
+
+LEGACY_NOTES = [
+    {"_id": "65b3f2000000000000000001", "user_id": "u1", "raw_text": "no analysis at all"},
+    {"_id": "65b3f2000000000000000002", "user_id": "u1", "raw_text": "partial",
+     "ai_metadata": {"stream_type": "RANT"}},
+]
+
+def test_lean_entries_match_the_model_for_legacy_notes():
+    body = json.loads(lean_response([dict(n) for n in LEGACY_NOTES], None, ENTRY_DEFAULTS).body)
+    for lean, note in zip(body, LEGACY_NOTES):
+        expected = NoteDB.model_validate({"ai_metadata": {}, **note}).model_dump(mode="json", by_alias=True)
+        del expected["created_at"] # the model would invent one; list queries always project it
+        assert {key: lean.get(key) for key in expected} == expected
+    assert body[1]["ai_metadata"]["stream_type"] == "RANT"
+    assert body[1]["ai_metadata"]["summary"] == "Legacy Entry"
@@ -0,0 +1,26 @@
+import asyncio
+from datetime import datetime, timezone
+
+from app import ai_graph, search
+
+async def _keyword_hits(user_id, query, limit=20, collection=None):
+    return [{
+        "_id": "65b3f2000000000000000001",
+        "raw_text": "my landlord ignored the leak again",
+        "created_at": datetime(2026, 1, 16, tzinfo=timezone.utc),
+        "ai_metadata": {"stream_type": "RANT", "summary": "Leak"},
+        "recurrence": {"count": 2},
+    }]
+
+async def _no_vector_hits(user_id, query, limit, memory_version, persona):
+    return []
+
+def test_hybrid_retrieval_shows_the_recurrence_count(monkeypatch):
+    monkeypatch.setattr(ai_graph, "RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setattr(search, "keyword_search", _keyword_hits)
+    monkeypatch.setattr(search, "_vector_ids", _no_vector_hits)
+
+    state = asyncio.run(ai_graph.retrieve_node({"question": "landlord", "user_id": "test-user"}))
+
+    # The first log counts too: 2 repeats = logged 3 times
+    assert state["context"] == "- [2026-01-16] my landlord ignored the leak again (logged 3 times)"
@@ -0,0 +1,76 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app import vector_store
+from app.main import app
+
+SLOW_CALL_SECONDS = 0.5
+
+def _slow_upsert(user_id, ids, vectors, metadatas):
+    time.sleep(SLOW_CALL_SECONDS) # a slow Pinecone round-trip
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[0.1] * 8 for _ in texts]
+
+def test_requests_are_served_while_a_vector_write_is_in_flight(monkeypatch):
+    monkeypatch.setattr(vector_store.backend, "upsert", _slow_upsert)
+    monkeypatch.setattr(vector_store, "embeddings", FakeEmbeddings())
+
+    async def scenario():
+        # Not an ObjectId: the memory_version bump skips MongoDB
+        save = asyncio.create_task(vector_store.save_note_to_vector_db(
+            "note-1", "went for a run", "test-user", "2026-01-16T10:00:00+00:00"
+        ))
+        await asyncio.sleep(0.05) # upsert is now blocking a pool thread
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            response = await client.get("/")
+            elapsed = time.perf_counter() - started
+
+        assert response.status_code == 200
+        assert not save.done(), "the slow write should still be running"
+        assert elapsed < SLOW_CALL_SECONDS / 2
+        assert await save is True
+
+    asyncio.run(scenario())
+
+def test_shutdown_vector_pool_does_not_block_the_loop(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(vector_store, "_vector_pool", pool)
+    monkeypatch.setattr(vector_store.backend, "flush", lambda: None)
+
+    async def scenario():
+        pool.submit(time.sleep, SLOW_CALL_SECONDS) # in-flight write
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        tick = asyncio.create_task(ticker())
+        await vector_store.shutdown_vector_pool()
+        tick.cancel()
+        # The loop kept running while the pool drained
+        assert ticks >= 10
+
+    asyncio.run(scenario())
+
+def test_reembedding_keeps_the_recurrence_count(monkeypatch):
+    monkeypatch.setattr(vector_store, "embeddings", FakeEmbeddings())
+    user_id = "recurring-user"
+
+    async def scenario():
+        await vector_store.save_note_to_vector_db("note-2", "landlord again", user_id, "2026-01-16")
+        await vector_store.update_note_metadata(user_id, "note-2", {"recurring": 3})
+        # A later full upsert (backfill, reclassification) must not drop it
+        await vector_store.save_note_to_vector_db("note-2", "landlord again", user_id, "2026-01-16", repeats=2)
+
+    asyncio.run(scenario())
+    [(doc, _)] = vector_store.backend.query(user_id, [0.1] * 8, 1, {"user_id": user_id})
+    assert doc.metadata["recurring"] == 3